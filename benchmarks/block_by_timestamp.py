@@ -0,0 +1,151 @@
+"""
+Count block fetches per timestamp -> block resolution.
+
+Compares the interpolation resolver in lambda_source/evm_blocks.py against the
+bisection from block 0 it replaced, on simulated chains or against a live RPC.
+The anchored column reuses every block fetched by earlier resolutions, the way
+the lambdas do through their block anchor store.
+
+    python benchmarks/block_by_timestamp.py
+    python benchmarks/block_by_timestamp.py --rpc-url https://... --days 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_source'))
+
+import evm_blocks
+
+DAY = 86_400
+
+# Simulated chains as segments of (first_block, first_timestamp, seconds_per_block).
+# Timestamps are floored to whole seconds, so sub-second chains have runs of equal timestamps.
+SIMULATED_CHAINS = {
+    'Ethereum (13.3s PoW, then 12s PoS)': [(0, 1_438_269_973, 13.3), (15_537_394, 1_663_224_179, 12)],
+    'Arbitrum (0.25s blocks)': [(0, 1_622_240_000, 0.25)],
+    'Optimism (2s blocks)': [(0, 1_636_665_386, 2)],
+    'BNB Smart Chain (3s, then 0.75s)': [(0, 1_598_671_449, 3), (47_000_000, 1_739_671_449, 0.75)],
+    'Sidechain with a 3 day halt': [(0, 1_650_000_000, 5), (2_000_000, 1_660_259_200, 5)],
+}
+CHAIN_HEIGHT = {
+    'Ethereum (13.3s PoW, then 12s PoS)': 23_300_000,
+    'Arbitrum (0.25s blocks)': 390_000_000,
+    'Optimism (2s blocks)': 142_000_000,
+    'BNB Smart Chain (3s, then 0.75s)': 65_000_000,
+    'Sidechain with a 3 day halt': 4_000_000,
+}
+
+# Block timestamp on a simulated chain
+def simulated_timestamp(segments, block_number):
+    for first_block, first_timestamp, seconds_per_block in reversed(segments):
+        if block_number >= first_block:
+            return first_timestamp + int((block_number - first_block) * seconds_per_block)
+
+# Wrap a fetch_block function so it counts how many blocks were fetched
+# and optionally remembers each block in a shared dict of known blocks
+class CountingFetcher:
+    def __init__(self, fetch_block, known_blocks=None):
+        self.fetch_block = fetch_block
+        self.known_blocks = known_blocks
+        self.calls = 0
+
+    def __call__(self, block_identifier):
+        self.calls += 1
+        block = self.fetch_block(block_identifier)
+        if self.known_blocks is not None:
+            self.known_blocks[block[0]] = block[1]
+        return block
+
+# The resolver the network lambdas used before: eth_blockNumber, then bisection from block 0
+def bisect_from_genesis(timestamp, fetch_block):
+    lower_bound = 0
+    upper_bound = fetch_block('latest')[0]
+    while lower_bound <= upper_bound:
+        mid_point = (lower_bound + upper_bound) // 2
+        block_timestamp = fetch_block(mid_point)[1]
+        if block_timestamp < timestamp:
+            lower_bound = mid_point + 1
+        elif block_timestamp > timestamp:
+            upper_bound = mid_point - 1
+        else:
+            return mid_point
+    return upper_bound
+
+# Timestamps the lambdas actually resolve: now, the end of recent days, and older backfill days
+def sample_timestamps(latest_timestamp, days, rng):
+    end_of_today = latest_timestamp - latest_timestamp % DAY + DAY - 1
+    timestamps = [latest_timestamp - rng.randint(0, 4 * 3600)]
+    timestamps += [end_of_today - DAY * day for day in range(1, days + 1)]
+    timestamps += [latest_timestamp - rng.randint(days * DAY, 365 * DAY) for _ in range(days)]
+    return timestamps
+
+def run(name, fetch_block, timestamps, check=None):
+    new_calls, anchored_calls, old_calls = [], [], []
+    known_blocks = {}
+    for timestamp in timestamps:
+        new = CountingFetcher(fetch_block)
+        anchored = CountingFetcher(fetch_block, known_blocks)
+        old = CountingFetcher(fetch_block)
+        block_number = evm_blocks.find_block_by_timestamp(timestamp, new)
+        anchored_block_number = evm_blocks.find_block_by_timestamp(timestamp, anchored, known_blocks=list(known_blocks.items()))
+        bisect_from_genesis(timestamp, old)
+        if check and block_number != check(timestamp):
+            raise AssertionError(f"{name}: resolved {block_number} for {timestamp}, expected {check(timestamp)}")
+        if anchored_block_number != block_number:
+            raise AssertionError(f"{name}: anchored search resolved {anchored_block_number} for {timestamp}, expected {block_number}")
+        new_calls.append(new.calls)
+        anchored_calls.append(anchored.calls)
+        old_calls.append(old.calls)
+
+    new_calls.sort()
+    print(f"{name:<40} resolutions={len(timestamps):<4} "
+          f"interpolation mean={sum(new_calls) / len(new_calls):5.2f} median={new_calls[len(new_calls) // 2]} max={new_calls[-1]:<3} "
+          f"anchored mean={sum(anchored_calls) / len(anchored_calls):5.2f} "
+          f"bisection mean={sum(old_calls) / len(old_calls):5.2f}")
+
+def benchmark_simulated(days, seed):
+    for name, segments in SIMULATED_CHAINS.items():
+        height = CHAIN_HEIGHT[name]
+
+        def fetch_block(block_identifier, segments=segments, height=height):
+            block_number = height if block_identifier == 'latest' else block_identifier
+            return block_number, simulated_timestamp(segments, block_number)
+
+        # Ground truth: last block at or before the timestamp
+        def expected(timestamp, segments=segments, height=height):
+            if simulated_timestamp(segments, 0) > timestamp:
+                return None
+            lower, upper = 0, height
+            while lower < upper:
+                mid_point = (lower + upper + 1) // 2
+                if simulated_timestamp(segments, mid_point) <= timestamp:
+                    lower = mid_point
+                else:
+                    upper = mid_point - 1
+            return lower
+
+        latest_timestamp = simulated_timestamp(segments, height)
+        run(name, fetch_block, sample_timestamps(latest_timestamp, days, random.Random(seed)), check=expected)
+
+def benchmark_rpc(rpc_url, days, seed):
+    def fetch_block(block_identifier):
+        return evm_blocks.fetch_block(block_identifier, rpc_url)
+
+    started = time.monotonic()
+    run(rpc_url.split('/')[2], fetch_block, sample_timestamps(fetch_block('latest')[1], days, random.Random(seed)))
+    print(f"elapsed {time.monotonic() - started:.1f}s")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rpc-url', help='benchmark against a live EVM JSON-RPC endpoint instead of simulated chains')
+    parser.add_argument('--days', type=int, default=30, help='number of day-boundary and backfill timestamps to resolve')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.rpc_url:
+        benchmark_rpc(args.rpc_url, args.days, args.seed)
+    else:
+        benchmark_simulated(args.days, args.seed)
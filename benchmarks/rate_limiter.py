@@ -0,0 +1,63 @@
+"""
+Check that the adaptive per-host rate limiter in lambda_source/rate_limit.py keeps letting requests through.
+
+Drives a host that starts at 5 req/s through repeated 429s, past the point where its adapted rate drops below
+1 req/s, and checks acquire() still returns within the time one token takes to refill at that rate. Before the
+bucket held at least one whole token, acquire() waited forever once a host's rate fell below 1 req/s.
+
+    python benchmarks/rate_limiter.py
+    python benchmarks/rate_limiter.py --host blockstream.info --throttles 10
+
+Exits with status 1 if acquire() blocks for longer than expected.
+"""
+import argparse
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda_source'))
+
+import rate_limit
+
+# Seconds allowed on top of one token's refill time before acquire() counts as stuck
+SLACK_SECONDS = 2
+
+def acquire_within(limiter, seconds):
+    acquired = threading.Event()
+
+    def run():
+        limiter.acquire()
+        acquired.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return acquired.wait(seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='tronscanapi.com', help='host whose starting limits to use')
+    parser.add_argument('--throttles', type=int, default=6, help='429s to report, one per decrease')
+    args = parser.parse_args()
+
+    limiter = rate_limit.HostLimiter(args.host, *rate_limit.get_provider_limits(args.host))
+    print(f"{args.host}: starting at {limiter.rate:.3f} req/s")
+
+    # Each round answers the slot acquired in the round before with a 429
+    limiter.acquire()
+    failures = 0
+    for throttle in range(1, args.throttles + 1):
+        # Let every 429 count as its own decrease instead of waiting out the cooldown
+        limiter.last_decrease = float('-inf')
+        limiter.release(0.1, throttled=True)
+
+        limit = 1 / limiter.rate + SLACK_SECONDS
+        returned = acquire_within(limiter, limit)
+        failures += not returned
+        print(f"{'ok  ' if returned else 'FAIL'} after {throttle} 429s at {limiter.rate:.3f} req/s: "
+              f"acquire() {'returned' if returned else f'still blocked after {limit:.1f}s'}")
+        if not returned:
+            break
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
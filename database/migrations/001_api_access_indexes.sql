@@ -0,0 +1,21 @@
+-- Indexes for the API access patterns on an existing database
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so run this file statement by statement
+-- (e.g. psql -f) rather than wrapped in BEGIN/COMMIT. The same indexes are in the table definitions.
+
+-- Latest balance per token implementation, answered from the index alone
+CREATE INDEX CONCURRENTLY IF NOT EXISTS token_balances_token_implementation_date_idx ON public.token_balances USING btree (token_implementation, date DESC) INCLUDE (balance);
+
+-- Per-date scans across all implementations; rows arrive in date order, so a BRIN index stays tiny
+CREATE INDEX CONCURRENTLY IF NOT EXISTS token_balances_date_brin_idx ON public.token_balances USING brin (date);
+
+-- Latest reserve balance per derivative token, e.g. mezo's fallback lookup
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reserve_balances_derivative_token_date_idx ON public.reserve_balances USING btree (derivative_token, date DESC) INCLUDE (balance);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS reserve_balances_date_brin_idx ON public.reserve_balances USING brin (date);
+
+-- Tokens counted by the supply views; depegged lives on tokens, so this is where a partial index can apply
+CREATE INDEX CONCURRENTLY IF NOT EXISTS tokens_not_depegged_idx ON public.tokens USING btree (slug) INCLUDE (type) WHERE (depegged = false);
+
+ANALYZE public.token_balances;
+ANALYZE public.reserve_balances;
+ANALYZE public.tokens;
\ No newline at end of file
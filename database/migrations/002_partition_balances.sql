@@ -0,0 +1,293 @@
+-- Move token_balances and reserve_balances to tables partitioned by month
+-- Run with psql (psql -f database/migrations/002_partition_balances.sql). The partition function and the views to
+-- rebind are copied in as ../tables and ../views defined them at this step; later migrations bring them up to date.
+-- Everything runs in one transaction; writers and readers of the two tables wait until it commits, so run it between
+-- ingestion runs.
+
+BEGIN;
+
+-- Keep the current tables under another name until their rows are copied. Their index names are freed for the
+-- partitioned tables, and the id sequence is detached so dropping the old table does not drop it.
+
+ALTER TABLE public.token_balances RENAME TO token_balances_unpartitioned;
+ALTER INDEX public.token_balances_pkey RENAME TO token_balances_unpartitioned_pkey;
+ALTER INDEX public.token_balances_token_implementation_date_key RENAME TO token_balances_unpartitioned_token_implementation_date_key;
+ALTER INDEX IF EXISTS public.token_balances_token_implementation_date_idx RENAME TO token_balances_unpartitioned_token_implementation_date_idx;
+ALTER INDEX IF EXISTS public.token_balances_date_brin_idx RENAME TO token_balances_unpartitioned_date_brin_idx;
+DROP TRIGGER IF EXISTS sync_token_balances_latest ON public.token_balances_unpartitioned;
+ALTER SEQUENCE public.token_balances_id_seq OWNED BY NONE;
+
+ALTER TABLE public.reserve_balances RENAME TO reserve_balances_unpartitioned;
+ALTER INDEX public.unique_reserve_balance_entry RENAME TO reserve_balances_unpartitioned_unique_entry;
+ALTER INDEX IF EXISTS public.reserve_balances_derivative_token_date_idx RENAME TO reserve_balances_unpartitioned_derivative_token_date_idx;
+ALTER INDEX IF EXISTS public.reserve_balances_date_brin_idx RENAME TO reserve_balances_unpartitioned_date_brin_idx;
+DROP TRIGGER IF EXISTS sync_reserve_balances_latest ON public.reserve_balances_unpartitioned;
+
+-- Partitioned tables as in ../tables/token_balances.sql and ../tables/reserve_balances.sql, with token_balances.id
+-- continuing from the existing sequence
+
+CREATE TABLE public.token_balances (
+	"date" date NOT NULL,
+	token_implementation varchar(255) NULL,
+	balance numeric(20, 8) NOT NULL,
+	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	id int4 DEFAULT nextval('public.token_balances_id_seq'::regclass) NOT NULL,
+	CONSTRAINT token_balances_pkey PRIMARY KEY (id, date),
+	CONSTRAINT token_balances_token_implementation_date_key UNIQUE (token_implementation, date),
+	CONSTRAINT token_balances_token_implementation_fkey FOREIGN KEY (token_implementation) REFERENCES public.token_implementations(slug) ON DELETE CASCADE
+) PARTITION BY RANGE ("date");
+
+ALTER SEQUENCE public.token_balances_id_seq OWNED BY public.token_balances.id;
+
+CREATE INDEX token_balances_token_implementation_date_idx ON public.token_balances USING btree (token_implementation, date DESC) INCLUDE (balance);
+CREATE INDEX token_balances_date_brin_idx ON public.token_balances USING brin (date);
+
+CREATE TABLE public.reserve_balances (
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	reserve_implementation_id int4 NULL,
+	reserve_network varchar(255) NULL,
+	collateral_token varchar(255) NULL,
+	derivative_token varchar(255) NULL,
+	reserve_address varchar(255) NOT NULL,
+	CONSTRAINT unique_reserve_balance_entry UNIQUE (date, reserve_network, reserve_address, collateral_token, derivative_token),
+	CONSTRAINT reserve_balances_reserve_implementation_fkey FOREIGN KEY (reserve_implementation_id) REFERENCES public.reserve_implementations(id) ON DELETE CASCADE
+) PARTITION BY RANGE ("date");
+
+CREATE INDEX reserve_balances_derivative_token_date_idx ON public.reserve_balances USING btree (derivative_token, date DESC) INCLUDE (balance);
+CREATE INDEX reserve_balances_date_brin_idx ON public.reserve_balances USING brin (date);
+
+-- create_balance_partitions, and partitions from the earliest stored month through the months ahead
+
+-- Monthly partitions of public.token_balances and public.reserve_balances
+
+-- Partitions are named <table>_YYYY_MM and cover one calendar month each. There is no default partition, so a
+-- date without a partition fails to insert instead of landing in a catch-all table that would have to be split
+-- later. The ingestion lambdas call create_balance_partitions for the date they write, which keeps p_months_ahead
+-- months of empty partitions ready; for a backfill, call it with the earliest date first.
+
+-- Create any missing partitions from the month of p_from (or the current month, if earlier) through
+-- p_months_ahead months past the current month, returning how many were created
+
+CREATE OR REPLACE FUNCTION public.create_balance_partitions(p_from date DEFAULT CURRENT_DATE, p_months_ahead integer DEFAULT 3)
+ RETURNS integer
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	month_start date := date_trunc('month', LEAST(p_from, CURRENT_DATE))::date;
+	last_month date := (date_trunc('month', GREATEST(p_from, CURRENT_DATE)) + make_interval(months => p_months_ahead))::date;
+	parent text;
+	partition_name text;
+	created_count integer := 0;
+BEGIN
+	WHILE month_start <= last_month LOOP
+		FOREACH parent IN ARRAY ARRAY['token_balances', 'reserve_balances'] LOOP
+			partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+			CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+
+			-- SHARE UPDATE EXCLUSIVE serializes concurrent callers without blocking reads or writes of the parent;
+			-- checking again after taking it sees a partition another caller has just committed
+			EXECUTE format('LOCK TABLE public.%I IN SHARE UPDATE EXCLUSIVE MODE', parent);
+			CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+
+			-- Attaching an empty table needs a weaker lock on the parent than CREATE TABLE ... PARTITION OF.
+			-- The parent's indexes (including the BRIN index on date), constraints and triggers are added on attach.
+			EXECUTE format('CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS)', partition_name, parent);
+			EXECUTE format(
+				'ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+				parent, partition_name, month_start, (month_start + interval '1 month')::date
+			);
+			created_count := created_count + 1;
+		END LOOP;
+		month_start := (month_start + interval '1 month')::date;
+	END LOOP;
+
+	RETURN created_count;
+END;
+$function$;
+
+-- Partitions for the current month and the months ahead
+
+SELECT public.create_balance_partitions();
+
+SELECT public.create_balance_partitions(least(
+	(SELECT min("date") FROM public.token_balances_unpartitioned),
+	(SELECT min("date") FROM public.reserve_balances_unpartitioned),
+	CURRENT_DATE
+));
+
+-- Copy in date order, which keeps the BRIN ranges of each partition tight. The sync triggers are only recreated
+-- afterwards: token_balances_latest and reserve_balances_latest already hold the latest rows.
+
+INSERT INTO public.token_balances ("date", token_implementation, balance, created_at, id)
+SELECT "date", token_implementation, balance, created_at, id
+FROM public.token_balances_unpartitioned
+ORDER BY "date", token_implementation;
+
+INSERT INTO public.reserve_balances ("date", balance, created_at, reserve_implementation_id, reserve_network, collateral_token, derivative_token, reserve_address)
+SELECT "date", balance, created_at, reserve_implementation_id, reserve_network, collateral_token, derivative_token, reserve_address
+FROM public.reserve_balances_unpartitioned
+ORDER BY "date", derivative_token;
+
+create trigger sync_token_balances_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.token_balances for each row execute function sync_token_balances_latest();
+
+create trigger sync_reserve_balances_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.reserve_balances for each row execute function sync_reserve_balances_latest();
+
+-- Views still bound to the old tables; CREATE OR REPLACE VIEW binds them to the partitioned ones
+
+-- public.helper_reserves_summed source
+
+CREATE OR REPLACE VIEW public.helper_reserves_summed
+AS SELECT date,
+    derivative_token,
+    sum(balance) AS total_balance,
+    collateral_token
+   FROM reserve_balances
+  GROUP BY date, reserve_network, collateral_token, derivative_token;
+
+-- public.top_gainers_by_tokenimpl source
+
+CREATE OR REPLACE VIEW public.top_gainers_by_tokenimpl
+AS WITH recent_balances AS (
+         SELECT tb.token_implementation,
+            tb.balance,
+            tb.date
+           FROM token_balances_latest tb
+             JOIN token_implementations ti_1 ON tb.token_implementation::text = ti_1.slug::text
+             JOIN tokens nt_1 ON ti_1.token::text = nt_1.slug::text
+          WHERE nt_1.depegged = false
+        ), past_balances AS (
+         SELECT tb.token_implementation,
+            tb.balance,
+            tb.date,
+                CASE
+                    WHEN tb.date = (CURRENT_DATE - '1 day'::interval) THEN 'daily'::text
+                    WHEN tb.date = (CURRENT_DATE - '7 days'::interval) THEN 'weekly'::text
+                    WHEN tb.date = (CURRENT_DATE - '1 mon'::interval) THEN 'monthly'::text
+                    WHEN tb.date = (CURRENT_DATE - '1 year'::interval) THEN 'yearly'::text
+                    ELSE NULL::text
+                END AS period
+           FROM token_balances tb
+          WHERE tb.date = ANY (ARRAY[CURRENT_DATE - '1 day'::interval, CURRENT_DATE - '7 days'::interval, CURRENT_DATE - '1 mon'::interval, CURRENT_DATE - '1 year'::interval])
+        ), percent_changes AS (
+         SELECT r.token_implementation,
+            r.balance AS recent_balance,
+            p.balance AS past_balance,
+            COALESCE(round((r.balance - p.balance) / NULLIF(p.balance, 0::numeric) * 100::numeric, 2), 0::numeric) AS percent_change,
+            r.date,
+            p.period
+           FROM recent_balances r
+             LEFT JOIN past_balances p ON r.token_implementation::text = p.token_implementation::text
+        )
+ SELECT pc.token_implementation,
+    pc.recent_balance,
+    pc.past_balance,
+    pc.percent_change,
+    pc.period,
+    pc.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (PARTITION BY pc.period ORDER BY pc.percent_change DESC) AS rank
+   FROM percent_changes pc
+     JOIN token_implementations ti ON pc.token_implementation::text = ti.slug::text
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  WHERE pc.percent_change IS NOT NULL
+  ORDER BY pc.period, pc.percent_change DESC;
+
+-- public.top_gainers_by_tokenimpl_absolute source
+
+CREATE OR REPLACE VIEW public.top_gainers_by_tokenimpl_absolute
+AS WITH periods AS (
+         SELECT 'daily'::text AS period,
+            CURRENT_DATE - '1 day'::interval AS date
+        UNION ALL
+         SELECT 'weekly'::text AS period,
+            CURRENT_DATE - '7 days'::interval AS date
+        UNION ALL
+         SELECT 'monthly'::text AS period,
+            CURRENT_DATE - '1 mon'::interval AS date
+        UNION ALL
+         SELECT 'yearly'::text AS period,
+            CURRENT_DATE - '1 year'::interval AS date
+        ), token_periods AS (
+         SELECT ti_1.slug AS token_implementation,
+            p.period,
+            p.date
+           FROM token_implementations ti_1
+             CROSS JOIN periods p
+        ), recent_balances AS (
+         SELECT tb.token_implementation,
+            tb.balance,
+            tb.date
+           FROM token_balances_latest tb
+             JOIN token_implementations ti_1 ON tb.token_implementation::text = ti_1.slug::text
+             JOIN tokens nt_1 ON ti_1.token::text = nt_1.slug::text
+          WHERE nt_1.depegged = false
+        ), past_balances AS (
+         SELECT tp.token_implementation,
+            tp.period,
+            tp.date,
+            COALESCE(tb.balance, 0::numeric) AS balance
+           FROM token_periods tp
+             LEFT JOIN token_balances tb ON tp.token_implementation::text = tb.token_implementation::text AND tb.date = tp.date
+        ), supply_changes AS (
+         SELECT r.token_implementation,
+            r.balance AS recent_balance,
+            COALESCE(p.balance, 0::numeric) AS past_balance,
+            r.balance - COALESCE(p.balance, 0::numeric) AS supply_change,
+            p.period,
+            r.date
+           FROM recent_balances r
+             LEFT JOIN past_balances p ON r.token_implementation::text = p.token_implementation::text
+        )
+ SELECT sc.token_implementation,
+    sc.recent_balance,
+    sc.past_balance,
+    sc.supply_change,
+    sc.period,
+    sc.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (PARTITION BY sc.period ORDER BY sc.supply_change DESC) AS rank
+   FROM supply_changes sc
+     JOIN token_implementations ti ON sc.token_implementation::text = ti.slug::text
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  ORDER BY sc.period, sc.supply_change DESC;
+
+-- Fails if anything else still depends on the old tables
+DROP TABLE public.token_balances_unpartitioned;
+DROP TABLE public.reserve_balances_unpartitioned;
+
+COMMIT;
+
+ANALYZE public.token_balances;
+ANALYZE public.reserve_balances;
\ No newline at end of file
@@ -0,0 +1,1099 @@
+-- Key the balance tables by integer ids of token implementations and networks instead of their slugs
+-- Run with psql (psql -f database/migrations/003_integer_ids.sql) after 002_partition_balances.sql. The derived tables
+-- and views it rebuilds are copied in as ../tables and ../views defined them at this step; later migrations bring
+-- them up to date. Everything runs in one transaction, so run it between ingestion runs; the views read as before
+-- once it commits.
+
+BEGIN;
+
+-- Integer ids on the config tables; the slugs stay their primary keys
+
+ALTER TABLE public.networks ADD COLUMN id serial4 NOT NULL;
+ALTER TABLE public.networks ADD CONSTRAINT networks_id_key UNIQUE (id);
+
+ALTER TABLE public.token_implementations ADD COLUMN id serial4 NOT NULL;
+ALTER TABLE public.token_implementations ADD CONSTRAINT token_implementations_id_key UNIQUE (id);
+
+-- The views and the tables derived from the balances are dropped and rebuilt below.
+-- Privileges granted on them (e.g. to the API role) are kept here and granted again afterwards.
+
+CREATE TEMP TABLE migration_grants ON COMMIT DROP AS
+SELECT format(
+	'GRANT %s ON public.%I TO %s',
+	acl.privilege_type,
+	c.relname,
+	CASE WHEN acl.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(acl.grantee)) END
+) AS statement
+FROM pg_class c
+	CROSS JOIN LATERAL aclexplode(c.relacl) acl
+WHERE c.relnamespace = 'public'::regnamespace
+	AND acl.grantee <> c.relowner
+	AND c.relname IN (
+		'helper_dependencies_bridges',
+		'helper_reserves_summed',
+		'helper_token_balances_adjusted',
+		'helper_current_supplies_by_tokenimpl_raw',
+		'current_supplies_by_tokenimpl',
+		'current_reserves_by_tokenimpl',
+		'current_by_tokenimpl',
+		'current_supplies_by_network',
+		'current_supplies_by_tokenproject',
+		'historical_supplies_by_network',
+		'historical_supplies_by_tokenproject',
+		'historical_supplies_by_staking',
+		'historical_supplies_by_liquidstaking',
+		'historical_supplies_by_tokenimpl',
+		'top_gainers_by_tokenimpl',
+		'top_gainers_by_tokenimpl_absolute',
+		'bridge_edges',
+		'historical_supplies_by_network_materialized',
+		'historical_supplies_by_tokenproject_materialized',
+		'historical_supplies_by_staking_materialized',
+		'historical_supplies_by_liquidstaking_materialized',
+		'reserve_balances_latest',
+		'token_balances_adjusted',
+		'token_balances_latest'
+	);
+
+DROP VIEW
+	public.top_gainers_by_tokenimpl_absolute,
+	public.top_gainers_by_tokenimpl,
+	public.historical_supplies_by_tokenimpl,
+	public.historical_supplies_by_liquidstaking,
+	public.historical_supplies_by_staking,
+	public.historical_supplies_by_tokenproject,
+	public.historical_supplies_by_network,
+	public.current_supplies_by_tokenproject,
+	public.current_supplies_by_network,
+	public.current_by_tokenimpl,
+	public.current_reserves_by_tokenimpl,
+	public.current_supplies_by_tokenimpl,
+	public.helper_current_supplies_by_tokenimpl_raw,
+	public.helper_token_balances_adjusted,
+	public.helper_reserves_summed,
+	public.helper_dependencies_bridges;
+
+DROP TRIGGER sync_bridge_edges ON public.token_implementations;
+DROP TRIGGER sync_bridge_edges ON public.tokens;
+DROP TRIGGER sync_token_balances_latest ON public.token_balances;
+DROP TRIGGER sync_reserve_balances_latest ON public.reserve_balances;
+
+DROP TABLE
+	public.bridge_edges,
+	public.historical_supplies_by_network_materialized,
+	public.historical_supplies_by_tokenproject_materialized,
+	public.historical_supplies_by_staking_materialized,
+	public.historical_supplies_by_liquidstaking_materialized,
+	public.reserve_balances_latest,
+	public.token_balances_adjusted,
+	public.token_balances_latest;
+
+-- token_balances: token_implementation -> token_implementation_id. Rows without a token implementation were never
+-- read by any view and are dropped.
+
+ALTER TABLE public.token_balances ADD COLUMN token_implementation_id int4;
+
+UPDATE public.token_balances tb
+SET token_implementation_id = ti.id
+FROM public.token_implementations ti
+WHERE ti.slug = tb.token_implementation;
+
+DELETE FROM public.token_balances WHERE token_implementation_id IS NULL;
+
+ALTER TABLE public.token_balances DROP CONSTRAINT token_balances_token_implementation_date_key;
+ALTER TABLE public.token_balances DROP CONSTRAINT token_balances_token_implementation_fkey;
+DROP INDEX public.token_balances_token_implementation_date_idx;
+ALTER TABLE public.token_balances DROP COLUMN token_implementation;
+
+ALTER TABLE public.token_balances ALTER COLUMN token_implementation_id SET NOT NULL;
+ALTER TABLE public.token_balances ADD CONSTRAINT token_balances_token_implementation_id_date_key UNIQUE (token_implementation_id, date);
+ALTER TABLE public.token_balances ADD CONSTRAINT token_balances_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE;
+CREATE INDEX token_balances_token_implementation_id_date_idx ON public.token_balances USING btree (token_implementation_id, date DESC) INCLUDE (balance);
+
+-- reserve_balances: reserve_network, collateral_token, derivative_token -> *_id
+
+ALTER TABLE public.reserve_balances ADD COLUMN reserve_network_id int4;
+ALTER TABLE public.reserve_balances ADD COLUMN collateral_token_id int4;
+ALTER TABLE public.reserve_balances ADD COLUMN derivative_token_id int4;
+
+UPDATE public.reserve_balances rb
+SET reserve_network_id = (SELECT n.id FROM public.networks n WHERE n.slug = rb.reserve_network),
+	collateral_token_id = (SELECT ti.id FROM public.token_implementations ti WHERE ti.slug = rb.collateral_token),
+	derivative_token_id = (SELECT ti.id FROM public.token_implementations ti WHERE ti.slug = rb.derivative_token);
+
+ALTER TABLE public.reserve_balances DROP CONSTRAINT unique_reserve_balance_entry;
+DROP INDEX public.reserve_balances_derivative_token_date_idx;
+ALTER TABLE public.reserve_balances DROP COLUMN reserve_network;
+ALTER TABLE public.reserve_balances DROP COLUMN collateral_token;
+ALTER TABLE public.reserve_balances DROP COLUMN derivative_token;
+
+ALTER TABLE public.reserve_balances ADD CONSTRAINT unique_reserve_balance_entry UNIQUE (date, reserve_network_id, reserve_address, collateral_token_id, derivative_token_id);
+ALTER TABLE public.reserve_balances ADD CONSTRAINT reserve_balances_reserve_network_id_fkey FOREIGN KEY (reserve_network_id) REFERENCES public.networks(id) ON DELETE CASCADE;
+ALTER TABLE public.reserve_balances ADD CONSTRAINT reserve_balances_collateral_token_id_fkey FOREIGN KEY (collateral_token_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE;
+ALTER TABLE public.reserve_balances ADD CONSTRAINT reserve_balances_derivative_token_id_fkey FOREIGN KEY (derivative_token_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE;
+CREATE INDEX reserve_balances_derivative_token_id_date_idx ON public.reserve_balances USING btree (derivative_token_id, date DESC) INCLUDE (balance);
+
+-- Derived tables, their triggers and backfills
+
+-- public.bridge_edges definition
+
+-- Drop table
+
+-- DROP TABLE public.bridge_edges;
+
+-- Bridge dependency graph: each bridged token implementation (non-native origin, token_address starting with a
+-- digit, token not depegged) and the implementation on its origin network whose supply it double counts.
+-- Rebuilt by statement triggers whenever token_implementations or tokens change, instead of being derived with a
+-- regex and array_agg inside every query. Edges are keyed by token implementation id; origin_implementation_id is
+-- NULL when the origin network has no implementation of the token, leaving nothing to subtract the supply from.
+
+CREATE TABLE public.bridge_edges (
+	bridged_implementation_id int4 NOT NULL,
+	origin_implementation varchar(255) NOT NULL,
+	origin_implementation_id int4 NULL,
+	"token" varchar(255) NOT NULL,
+	origin_network varchar(255) NOT NULL,
+	CONSTRAINT bridge_edges_pkey PRIMARY KEY (bridged_implementation_id)
+);
+
+CREATE INDEX bridge_edges_origin_implementation_id_idx ON public.bridge_edges USING btree (origin_implementation_id);
+
+-- Bring bridge_edges in line with token_implementations, returning whether any edge changed
+
+CREATE OR REPLACE FUNCTION public.rebuild_bridge_edges()
+ RETURNS boolean
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	deleted_count int;
+	upserted_count int;
+BEGIN
+	DELETE FROM public.bridge_edges be
+	WHERE NOT EXISTS (
+		SELECT 1
+		FROM public.token_implementations ti
+			JOIN public.tokens nt ON ti.token::text = nt.slug::text
+		WHERE ti.id = be.bridged_implementation_id
+			AND ti.network_origin IS NOT NULL AND ti.network_origin::text <> 'native'::text AND ti.token_address::text ~ '^[0-9].*'::text
+			AND nt.depegged = false
+	);
+	GET DIAGNOSTICS deleted_count = ROW_COUNT;
+
+	INSERT INTO public.bridge_edges (bridged_implementation_id, origin_implementation, origin_implementation_id, "token", origin_network)
+	SELECT ti.id,
+		concat(ti.token, '_', ti.network_origin),
+		oi.id,
+		ti.token,
+		ti.network_origin
+	FROM public.token_implementations ti
+		JOIN public.tokens nt ON ti.token::text = nt.slug::text
+		LEFT JOIN public.token_implementations oi ON oi.slug::text = concat(ti.token, '_', ti.network_origin)
+	WHERE ti.network_origin IS NOT NULL AND ti.network_origin::text <> 'native'::text AND ti.token_address::text ~ '^[0-9].*'::text
+		AND nt.depegged = false
+	ON CONFLICT (bridged_implementation_id) DO UPDATE
+	SET origin_implementation = EXCLUDED.origin_implementation,
+		origin_implementation_id = EXCLUDED.origin_implementation_id,
+		"token" = EXCLUDED.token,
+		origin_network = EXCLUDED.origin_network
+	WHERE (bridge_edges.origin_implementation, bridge_edges.origin_implementation_id, bridge_edges.token, bridge_edges.origin_network)
+		IS DISTINCT FROM (EXCLUDED.origin_implementation, EXCLUDED.origin_implementation_id, EXCLUDED.token, EXCLUDED.origin_network);
+	GET DIAGNOSTICS upserted_count = ROW_COUNT;
+
+	RETURN deleted_count + upserted_count > 0;
+END;
+$function$;
+
+-- Adjusted balances depend on the graph for every date, so a changed graph rebuilds the historical tables
+
+CREATE OR REPLACE FUNCTION public.sync_bridge_edges()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	IF public.rebuild_bridge_edges() THEN
+		PERFORM public.refresh_historical_supplies();
+	END IF;
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_bridge_edges after
+insert
+    or
+update
+    or
+delete
+    or
+truncate
+    on
+    public.token_implementations for each statement execute function sync_bridge_edges();
+
+create trigger sync_bridge_edges after
+insert
+    or
+update
+    or
+delete
+    or
+truncate
+    on
+    public.tokens for each statement execute function sync_bridge_edges();
+
+-- Backfill from existing token implementations
+
+SELECT public.rebuild_bridge_edges();
+
+-- Materialized historical supply aggregates
+
+-- Drop tables
+
+-- DROP TABLE public.historical_supplies_by_network_materialized;
+-- DROP TABLE public.historical_supplies_by_tokenproject_materialized;
+-- DROP TABLE public.historical_supplies_by_staking_materialized;
+-- DROP TABLE public.historical_supplies_by_liquidstaking_materialized;
+
+-- Per-date results of the historical_supplies_by_* views, which read from these tables. Every date is aggregated
+-- independently, so refresh_historical_supplies() recomputes only the dates it is given, in one transaction
+-- that readers never wait on. Run SELECT refresh_historical_supplies(); to rebuild every date, e.g. after
+-- creating these tables or changing bridge dependencies.
+
+CREATE TABLE public.historical_supplies_by_network_materialized (
+	network_slug varchar(255) NOT NULL,
+	network_name varchar(255) NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	tokens varchar[] NULL,
+	token_names text[] NULL,
+	CONSTRAINT historical_supplies_by_network_materialized_pkey PRIMARY KEY (date, network_slug)
+);
+
+CREATE TABLE public.historical_supplies_by_tokenproject_materialized (
+	token_slug varchar(255) NOT NULL,
+	token_name text NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	networks varchar[] NULL,
+	network_names varchar[] NULL,
+	token_addresses varchar[] NULL,
+	"rank" int8 NULL,
+	CONSTRAINT historical_supplies_by_tokenproject_materialized_pkey PRIMARY KEY (date, token_slug)
+);
+
+CREATE TABLE public.historical_supplies_by_staking_materialized (
+	token_slug varchar(255) NOT NULL,
+	token_name text NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	networks varchar[] NULL,
+	network_names varchar[] NULL,
+	token_addresses varchar[] NULL,
+	"rank" int8 NULL,
+	CONSTRAINT historical_supplies_by_staking_materialized_pkey PRIMARY KEY (date, token_slug)
+);
+
+CREATE TABLE public.historical_supplies_by_liquidstaking_materialized (
+	token_slug varchar(255) NOT NULL,
+	token_name text NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	networks varchar[] NULL,
+	network_names varchar[] NULL,
+	token_addresses varchar[] NULL,
+	"rank" int8 NULL,
+	CONSTRAINT historical_supplies_by_liquidstaking_materialized_pkey PRIMARY KEY (date, token_slug)
+);
+
+-- Recompute the given dates, or every date when p_dates is NULL
+
+CREATE OR REPLACE FUNCTION public.refresh_historical_supplies(p_dates date[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- Lambdas finishing at the same time refresh one after another rather than racing on the same dates
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	-- The aggregates are built on the bridge-adjusted balances, so bring those up to date first
+	PERFORM public.refresh_token_balances_adjusted(p_dates);
+
+	DELETE FROM public.historical_supplies_by_network_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_network_materialized (network_slug, network_name, total_balance, "date", tokens, token_names)
+	SELECT n.slug AS network_slug,
+		n.name AS network_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT ti.token) AS tokens,
+		array_agg(DISTINCT nt.name) AS token_names
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, n.slug, n.name;
+
+	DELETE FROM public.historical_supplies_by_tokenproject_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_tokenproject_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_staking_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_staking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_liquidstaking_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_liquidstaking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'liquid_staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, ti.token, nt.name;
+END;
+$function$;
+
+-- public.reserve_balances_latest definition
+
+-- Drop table
+
+-- DROP TABLE public.reserve_balances_latest;
+
+-- Most recent balance of each reserve (one row per unique reserve_balances key without the date), kept current
+-- by triggers on reserve_balances. Rows missing part of the key are not tracked; the ingestion path always sets it.
+
+CREATE TABLE public.reserve_balances_latest (
+	reserve_network_id int4 NOT NULL,
+	reserve_address varchar(255) NOT NULL,
+	collateral_token_id int4 NOT NULL,
+	derivative_token_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	reserve_implementation_id int4 NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT reserve_balances_latest_pkey PRIMARY KEY (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id),
+	CONSTRAINT reserve_balances_latest_reserve_implementation_fkey FOREIGN KEY (reserve_implementation_id) REFERENCES public.reserve_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX reserve_balances_latest_derivative_token_id_idx ON public.reserve_balances_latest USING btree (derivative_token_id, date DESC);
+
+CREATE OR REPLACE FUNCTION public.sync_reserve_balances_latest()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- A removed or moved row may have been the latest one: recompute it from the remaining history
+	IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.date, OLD.reserve_network_id, OLD.reserve_address, OLD.collateral_token_id, OLD.derivative_token_id)
+		IS DISTINCT FROM (NEW.date, NEW.reserve_network_id, NEW.reserve_address, NEW.collateral_token_id, NEW.derivative_token_id)) THEN
+		DELETE FROM public.reserve_balances_latest
+		WHERE reserve_network_id = OLD.reserve_network_id
+			AND reserve_address = OLD.reserve_address
+			AND collateral_token_id = OLD.collateral_token_id
+			AND derivative_token_id = OLD.derivative_token_id
+			AND "date" = OLD.date;
+
+		INSERT INTO public.reserve_balances_latest (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id)
+		SELECT rb.reserve_network_id, rb.reserve_address, rb.collateral_token_id, rb.derivative_token_id, rb.date, rb.balance, rb.reserve_implementation_id
+		FROM public.reserve_balances rb
+		WHERE rb.reserve_network_id = OLD.reserve_network_id
+			AND rb.reserve_address = OLD.reserve_address
+			AND rb.collateral_token_id = OLD.collateral_token_id
+			AND rb.derivative_token_id = OLD.derivative_token_id
+			-- Skip when the reserve implementation itself is being deleted and its history cascades away
+			AND (rb.reserve_implementation_id IS NULL OR EXISTS (SELECT 1 FROM public.reserve_implementations ri WHERE ri.id = rb.reserve_implementation_id))
+		ORDER BY rb.date DESC
+		LIMIT 1
+		ON CONFLICT (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id) DO NOTHING;
+	END IF;
+
+	IF TG_OP = 'DELETE' OR NEW.reserve_network_id IS NULL OR NEW.collateral_token_id IS NULL OR NEW.derivative_token_id IS NULL THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO public.reserve_balances_latest (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id)
+	VALUES (NEW.reserve_network_id, NEW.reserve_address, NEW.collateral_token_id, NEW.derivative_token_id, NEW.date, NEW.balance, NEW.reserve_implementation_id)
+	ON CONFLICT (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id) DO UPDATE
+	SET "date" = EXCLUDED.date,
+		balance = EXCLUDED.balance,
+		reserve_implementation_id = EXCLUDED.reserve_implementation_id,
+		updated_at = CURRENT_TIMESTAMP
+	WHERE reserve_balances_latest.date <= EXCLUDED.date
+		AND (reserve_balances_latest.date, reserve_balances_latest.balance, reserve_balances_latest.reserve_implementation_id)
+		IS DISTINCT FROM (EXCLUDED.date, EXCLUDED.balance, EXCLUDED.reserve_implementation_id);
+
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_reserve_balances_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.reserve_balances for each row execute function sync_reserve_balances_latest();
+
+-- Backfill from existing history
+
+INSERT INTO public.reserve_balances_latest (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id)
+SELECT DISTINCT ON (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id)
+	reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id
+FROM public.reserve_balances
+WHERE reserve_network_id IS NOT NULL AND collateral_token_id IS NOT NULL AND derivative_token_id IS NOT NULL
+ORDER BY reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date" DESC
+ON CONFLICT (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id) DO NOTHING;
+
+-- public.token_balances_adjusted definition
+
+-- Drop table
+
+-- DROP TABLE public.token_balances_adjusted;
+
+-- Daily token balances with bridged supply subtracted from the implementation on the origin network, so the
+-- historical views read indexed rows instead of joining the full history against the bridge graph.
+-- Maintained per date by refresh_token_balances_adjusted(), which refresh_historical_supplies() calls for the
+-- dates ingestion touched. Run SELECT refresh_historical_supplies(); once to fill it for every date.
+
+CREATE TABLE public.token_balances_adjusted (
+	token_implementation_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	created_at timestamp NULL,
+	id int4 NULL,
+	CONSTRAINT token_balances_adjusted_pkey PRIMARY KEY (token_implementation_id, date),
+	CONSTRAINT token_balances_adjusted_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX token_balances_adjusted_date_idx ON public.token_balances_adjusted USING btree (date);
+
+-- Recompute the given dates, or every date when p_dates is NULL
+
+CREATE OR REPLACE FUNCTION public.refresh_token_balances_adjusted(p_dates date[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	DELETE FROM public.token_balances_adjusted
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.token_balances_adjusted (token_implementation_id, "date", balance, created_at, id)
+	WITH adjustments AS (
+		SELECT be.origin_implementation_id,
+			tb.date,
+			sum(tb.balance) AS total_to_subtract
+		FROM bridge_edges be
+			JOIN token_balances tb ON tb.token_implementation_id = be.bridged_implementation_id
+		WHERE be.origin_implementation_id IS NOT NULL
+			AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		GROUP BY be.origin_implementation_id, tb.date
+	)
+	SELECT tb.token_implementation_id,
+		tb.date,
+		(tb.balance - COALESCE(adj.total_to_subtract, 0::numeric))::numeric(20,8) AS balance,
+		tb.created_at,
+		tb.id
+	FROM token_balances tb
+		-- Skips implementations being deleted: their balances only cascade away after the bridge_edges trigger has run this
+		JOIN token_implementations ti ON ti.id = tb.token_implementation_id
+		LEFT JOIN adjustments adj ON tb.token_implementation_id = adj.origin_implementation_id AND tb.date = adj.date
+	WHERE p_dates IS NULL OR tb.date = ANY (p_dates);
+END;
+$function$;
+
+-- public.token_balances_latest definition
+
+-- Drop table
+
+-- DROP TABLE public.token_balances_latest;
+
+-- Most recent balance of each token implementation, kept current by triggers on token_balances so the
+-- "current" views read one row per token implementation instead of searching the full history
+
+CREATE TABLE public.token_balances_latest (
+	token_implementation_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT token_balances_latest_pkey PRIMARY KEY (token_implementation_id),
+	CONSTRAINT token_balances_latest_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION public.sync_token_balances_latest()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- A removed or moved row may have been the latest one: recompute it from the remaining history
+	IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.token_implementation_id, OLD.date) IS DISTINCT FROM (NEW.token_implementation_id, NEW.date)) THEN
+		DELETE FROM public.token_balances_latest
+		WHERE token_implementation_id = OLD.token_implementation_id AND "date" = OLD.date;
+
+		INSERT INTO public.token_balances_latest (token_implementation_id, "date", balance)
+		SELECT tb.token_implementation_id, tb.date, tb.balance
+		FROM public.token_balances tb
+		WHERE tb.token_implementation_id = OLD.token_implementation_id
+			-- Skip when the token implementation itself is being deleted and its history cascades away
+			AND EXISTS (SELECT 1 FROM public.token_implementations ti WHERE ti.id = OLD.token_implementation_id)
+		ORDER BY tb.date DESC
+		LIMIT 1
+		ON CONFLICT (token_implementation_id) DO NOTHING;
+	END IF;
+
+	IF TG_OP = 'DELETE' THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO public.token_balances_latest (token_implementation_id, "date", balance)
+	VALUES (NEW.token_implementation_id, NEW.date, NEW.balance)
+	ON CONFLICT (token_implementation_id) DO UPDATE
+	SET "date" = EXCLUDED.date, balance = EXCLUDED.balance, updated_at = CURRENT_TIMESTAMP
+	WHERE token_balances_latest.date <= EXCLUDED.date
+		AND (token_balances_latest.date, token_balances_latest.balance) IS DISTINCT FROM (EXCLUDED.date, EXCLUDED.balance);
+
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_token_balances_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.token_balances for each row execute function sync_token_balances_latest();
+
+-- Backfill from existing history
+
+INSERT INTO public.token_balances_latest (token_implementation_id, "date", balance)
+SELECT DISTINCT ON (token_implementation_id) token_implementation_id, "date", balance
+FROM public.token_balances
+ORDER BY token_implementation_id, "date" DESC
+ON CONFLICT (token_implementation_id) DO NOTHING;
+
+SELECT public.refresh_historical_supplies();
+
+-- Views, in dependency order
+
+-- public.helper_dependencies_bridges source
+-- Show bridge dependencies for each token implementation in order to adjust for double counting
+-- The graph itself is kept in bridge_edges, rebuilt whenever token_implementations or tokens change
+
+CREATE OR REPLACE VIEW public.helper_dependencies_bridges
+AS SELECT nt.slug AS token_slug,
+    be.origin_implementation::text AS token_implementation,
+    nt.token_name,
+    nt.type AS token_type,
+    be.origin_network,
+    array_agg(bi.slug ORDER BY bi.slug) AS tokens_to_subtract
+   FROM bridge_edges be
+     JOIN token_implementations bi ON be.bridged_implementation_id = bi.id
+     JOIN tokens nt ON be.token::text = nt.slug::text
+  GROUP BY nt.slug, be.origin_implementation, nt.token_name, nt.type, be.origin_network;
+
+-- public.helper_reserves_summed source
+
+CREATE OR REPLACE VIEW public.helper_reserves_summed
+AS SELECT rs.date,
+    dt.slug AS derivative_token,
+    rs.total_balance,
+    ct.slug AS collateral_token
+   FROM ( SELECT reserve_balances.date,
+            reserve_balances.collateral_token_id,
+            reserve_balances.derivative_token_id,
+            sum(reserve_balances.balance) AS total_balance
+           FROM reserve_balances
+          GROUP BY reserve_balances.date, reserve_balances.reserve_network_id, reserve_balances.collateral_token_id, reserve_balances.derivative_token_id) rs
+     LEFT JOIN token_implementations dt ON rs.derivative_token_id = dt.id
+     LEFT JOIN token_implementations ct ON rs.collateral_token_id = ct.id;
+
+-- public.helper_token_balances_adjusted source
+-- Kept for existing readers; the adjusted balances are maintained in the token_balances_adjusted table
+
+CREATE OR REPLACE VIEW public.helper_token_balances_adjusted
+AS SELECT tb.date,
+    ti.slug AS token_implementation,
+    tb.balance,
+    tb.created_at,
+    tb.id
+   FROM token_balances_adjusted tb
+     JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+  ORDER BY tb.date DESC, ti.slug;
+
+-- public.helper_current_supplies_by_tokenimpl_raw source
+-- Raw values for tokenimpl, without adjusting for double count from bridging or other
+
+CREATE OR REPLACE VIEW public.helper_current_supplies_by_tokenimpl_raw
+AS WITH recent_balances AS (
+         SELECT tb.token_implementation_id,
+            tb.balance,
+            tb.date
+           FROM token_balances_latest tb
+        )
+ SELECT ti.slug AS token_implementation,
+    rb.balance,
+    rb.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (ORDER BY rb.balance DESC) AS rank
+   FROM recent_balances rb
+     JOIN token_implementations ti ON rb.token_implementation_id = ti.id
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  ORDER BY rb.balance DESC;
+
+-- public.current_supplies_by_tokenimpl source
+
+CREATE OR REPLACE VIEW public.current_supplies_by_tokenimpl
+AS WITH recent_balances AS (
+         SELECT tb.token_implementation_id,
+            tb.balance,
+            tb.date
+           FROM token_balances_latest tb
+             JOIN token_implementations ti_1 ON tb.token_implementation_id = ti_1.id
+             JOIN tokens nt_1 ON ti_1.token::text = nt_1.slug::text
+          WHERE nt_1.depegged = false
+        ), adjustments AS (
+         SELECT be.origin_implementation_id,
+            sum(rb.balance) AS total_to_subtract
+           FROM bridge_edges be
+             JOIN recent_balances rb ON rb.token_implementation_id = be.bridged_implementation_id
+          WHERE be.origin_implementation_id IS NOT NULL
+          GROUP BY be.origin_implementation_id
+        ), adjusted_balances AS (
+         SELECT rb.token_implementation_id,
+                CASE
+                    WHEN adj.total_to_subtract IS NOT NULL THEN
+                    CASE
+                        WHEN rb.token_implementation_id = adj.origin_implementation_id THEN rb.balance - adj.total_to_subtract
+                        ELSE rb.balance
+                    END
+                    ELSE rb.balance
+                END AS balance,
+            rb.date
+           FROM recent_balances rb
+             LEFT JOIN adjustments adj ON rb.token_implementation_id = adj.origin_implementation_id
+        )
+ SELECT ti.slug AS token_implementation,
+    ab.balance,
+    ab.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (ORDER BY ab.balance DESC) AS rank
+   FROM adjusted_balances ab
+     JOIN token_implementations ti ON ab.token_implementation_id = ti.id
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  ORDER BY ab.balance DESC;
+
+-- public.current_reserves_by_tokenimpl source
+
+CREATE OR REPLACE VIEW public.current_reserves_by_tokenimpl
+AS WITH recent_reserves AS (
+         SELECT rbl.derivative_token_id AS token_implementation_id,
+            sum(rbl.balance) AS balance,
+            rbl.date
+           FROM ( SELECT reserve_balances_latest.reserve_network_id,
+                    reserve_balances_latest.collateral_token_id,
+                    reserve_balances_latest.derivative_token_id,
+                    reserve_balances_latest.balance,
+                    reserve_balances_latest.date,
+                    max(reserve_balances_latest.date) OVER (PARTITION BY reserve_balances_latest.derivative_token_id) AS latest_date
+                   FROM reserve_balances_latest) rbl
+          WHERE rbl.date = rbl.latest_date
+          GROUP BY rbl.date, rbl.reserve_network_id, rbl.collateral_token_id, rbl.derivative_token_id
+        ), adjustments AS (
+         SELECT be.origin_implementation_id,
+            sum(rr.balance) AS total_to_subtract
+           FROM bridge_edges be
+             JOIN recent_reserves rr ON rr.token_implementation_id = be.bridged_implementation_id
+          WHERE be.origin_implementation_id IS NOT NULL
+          GROUP BY be.origin_implementation_id
+        ), adjusted_reserves AS (
+         SELECT rr.token_implementation_id,
+                CASE
+                    WHEN adj.total_to_subtract IS NOT NULL THEN
+                    CASE
+                        WHEN rr.token_implementation_id = adj.origin_implementation_id THEN rr.balance - adj.total_to_subtract
+                        ELSE rr.balance
+                    END
+                    ELSE rr.balance
+                END AS balance,
+            rr.date
+           FROM recent_reserves rr
+             LEFT JOIN adjustments adj ON rr.token_implementation_id = adj.origin_implementation_id
+        )
+ SELECT ti.slug AS token_implementation,
+    ar.balance,
+    ar.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (ORDER BY ar.balance DESC) AS rank
+   FROM adjusted_reserves ar
+     JOIN token_implementations ti ON ar.token_implementation_id = ti.id
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  ORDER BY ar.balance DESC;
+
+-- public.current_by_tokenimpl source
+-- Create a view with the current supply and reserve balances for each token implementation
+
+CREATE OR REPLACE VIEW public.current_by_tokenimpl
+AS WITH supply_data AS (
+         SELECT cs.token_implementation,
+            cs.balance AS supply_balance,
+            cs.date AS supply_date,
+            cs.network,
+            cs.network_slug,
+            cs.network_origin,
+            cs.network_name,
+            cs.token_slug,
+            cs.token_name,
+            cs.token_address,
+            cs.explorer
+           FROM helper_current_supplies_by_tokenimpl_raw cs
+        ), reserve_data AS (
+         SELECT cr.token_implementation,
+            cr.balance AS reserve_balance,
+            cr.date AS reserve_date
+           FROM current_reserves_by_tokenimpl cr
+        )
+ SELECT sd.token_implementation,
+    sd.supply_balance,
+    rd.reserve_balance,
+    sd.supply_balance - COALESCE(rd.reserve_balance, 0::numeric) AS balance_difference,
+    GREATEST(sd.supply_date, rd.reserve_date) AS latest_date,
+    sd.network,
+    sd.network_slug,
+    sd.network_origin,
+    sd.network_name,
+    sd.token_slug,
+    sd.token_name,
+    sd.token_address,
+    sd.explorer,
+    rank() OVER (ORDER BY sd.supply_balance DESC) AS rank
+   FROM supply_data sd
+     LEFT JOIN reserve_data rd ON sd.token_implementation::text = rd.token_implementation::text
+  ORDER BY sd.supply_balance DESC;
+
+-- public.current_supplies_by_network source
+
+CREATE OR REPLACE VIEW public.current_supplies_by_network
+AS SELECT network_slug,
+    network_name,
+    sum(balance) AS total_balance,
+    max(date) AS latest_date,
+    array_agg(DISTINCT token_slug) AS tokens,
+    array_agg(DISTINCT token_name) AS token_names,
+    array_agg(DISTINCT token_address) AS token_addresses,
+    rank() OVER (ORDER BY (sum(balance)) DESC) AS rank
+   FROM current_supplies_by_tokenimpl
+  GROUP BY network_slug, network_name
+  ORDER BY (sum(balance)) DESC;
+
+-- public.current_supplies_by_tokenproject source
+
+CREATE OR REPLACE VIEW public.current_supplies_by_tokenproject
+AS SELECT token_slug,
+    token_name,
+    sum(balance) AS total_balance,
+    max(date) AS latest_date,
+    array_agg(DISTINCT network_slug) AS networks,
+    array_agg(DISTINCT network_name) AS network_names,
+    array_agg(DISTINCT token_address) AS token_addresses,
+    rank() OVER (ORDER BY (sum(balance)) DESC) AS rank
+   FROM current_supplies_by_tokenimpl
+  GROUP BY token_slug, token_name
+  ORDER BY (sum(balance)) DESC;
+
+-- public.historical_supplies_by_network source
+-- Per-date aggregates are kept in historical_supplies_by_network_materialized by refresh_historical_supplies()
+
+CREATE OR REPLACE VIEW public.historical_supplies_by_network
+AS SELECT network_slug,
+    network_name,
+    total_balance,
+    date,
+    tokens,
+    token_names
+   FROM historical_supplies_by_network_materialized
+  ORDER BY date DESC, total_balance DESC;
+
+-- public.historical_supplies_by_tokenproject source
+-- Per-date aggregates are kept in historical_supplies_by_tokenproject_materialized by refresh_historical_supplies()
+
+CREATE OR REPLACE VIEW public.historical_supplies_by_tokenproject
+AS SELECT token_slug,
+    token_name,
+    total_balance,
+    date,
+    networks,
+    network_names,
+    token_addresses,
+    rank
+   FROM historical_supplies_by_tokenproject_materialized
+  ORDER BY date DESC, total_balance DESC;
+
+-- public.historical_supplies_by_staking source
+-- Per-date aggregates are kept in historical_supplies_by_staking_materialized by refresh_historical_supplies()
+
+CREATE OR REPLACE VIEW public.historical_supplies_by_staking
+AS SELECT token_slug,
+    token_name,
+    total_balance,
+    date,
+    networks,
+    network_names,
+    token_addresses,
+    rank
+   FROM historical_supplies_by_staking_materialized
+  ORDER BY date DESC, total_balance DESC;
+
+-- public.historical_supplies_by_liquidstaking source
+-- Per-date aggregates are kept in historical_supplies_by_liquidstaking_materialized by refresh_historical_supplies()
+
+CREATE OR REPLACE VIEW public.historical_supplies_by_liquidstaking
+AS SELECT token_slug,
+    token_name,
+    total_balance,
+    date,
+    networks,
+    network_names,
+    token_addresses,
+    rank
+   FROM historical_supplies_by_liquidstaking_materialized
+  ORDER BY date DESC, total_balance DESC;
+
+-- public.historical_supplies_by_tokenimpl source
+
+CREATE OR REPLACE VIEW public.historical_supplies_by_tokenimpl
+AS SELECT n.name AS network_name,
+    n.slug AS network_slug,
+    nt.name AS token_name,
+    concat(n.slug, '_', ti.token) AS identifier,
+    tb.balance AS amount,
+    tb.date,
+    nt.slug AS infra_slug,
+    COALESCE(cs.rank, 0::bigint) AS network_rank,
+    COALESCE(cp.rank, 0::bigint) AS project_rank
+   FROM token_balances_adjusted tb
+     LEFT JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+     LEFT JOIN networks n ON ti.network::text = n.slug::text
+     LEFT JOIN tokens nt ON ti.token::text = nt.slug::text
+     LEFT JOIN current_supplies_by_network cs ON n.slug::text = cs.network_slug::text
+     LEFT JOIN current_supplies_by_tokenproject cp ON ti.token::text = cp.token_slug::text
+  WHERE nt.depegged = false
+  ORDER BY cp.rank DESC NULLS LAST, cs.rank DESC NULLS LAST, tb.date DESC;
+
+-- public.top_gainers_by_tokenimpl source
+
+CREATE OR REPLACE VIEW public.top_gainers_by_tokenimpl
+AS WITH recent_balances AS (
+         SELECT tb.token_implementation_id,
+            tb.balance,
+            tb.date
+           FROM token_balances_latest tb
+             JOIN token_implementations ti_1 ON tb.token_implementation_id = ti_1.id
+             JOIN tokens nt_1 ON ti_1.token::text = nt_1.slug::text
+          WHERE nt_1.depegged = false
+        ), past_balances AS (
+         SELECT tb.token_implementation_id,
+            tb.balance,
+            tb.date,
+                CASE
+                    WHEN tb.date = (CURRENT_DATE - '1 day'::interval) THEN 'daily'::text
+                    WHEN tb.date = (CURRENT_DATE - '7 days'::interval) THEN 'weekly'::text
+                    WHEN tb.date = (CURRENT_DATE - '1 mon'::interval) THEN 'monthly'::text
+                    WHEN tb.date = (CURRENT_DATE - '1 year'::interval) THEN 'yearly'::text
+                    ELSE NULL::text
+                END AS period
+           FROM token_balances tb
+          WHERE tb.date = ANY (ARRAY[CURRENT_DATE - '1 day'::interval, CURRENT_DATE - '7 days'::interval, CURRENT_DATE - '1 mon'::interval, CURRENT_DATE - '1 year'::interval])
+        ), percent_changes AS (
+         SELECT r.token_implementation_id,
+            r.balance AS recent_balance,
+            p.balance AS past_balance,
+            COALESCE(round((r.balance - p.balance) / NULLIF(p.balance, 0::numeric) * 100::numeric, 2), 0::numeric) AS percent_change,
+            r.date,
+            p.period
+           FROM recent_balances r
+             LEFT JOIN past_balances p ON r.token_implementation_id = p.token_implementation_id
+        )
+ SELECT ti.slug AS token_implementation,
+    pc.recent_balance,
+    pc.past_balance,
+    pc.percent_change,
+    pc.period,
+    pc.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (PARTITION BY pc.period ORDER BY pc.percent_change DESC) AS rank
+   FROM percent_changes pc
+     JOIN token_implementations ti ON pc.token_implementation_id = ti.id
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  WHERE pc.percent_change IS NOT NULL
+  ORDER BY pc.period, pc.percent_change DESC;
+
+-- public.top_gainers_by_tokenimpl_absolute source
+
+CREATE OR REPLACE VIEW public.top_gainers_by_tokenimpl_absolute
+AS WITH periods AS (
+         SELECT 'daily'::text AS period,
+            CURRENT_DATE - '1 day'::interval AS date
+        UNION ALL
+         SELECT 'weekly'::text AS period,
+            CURRENT_DATE - '7 days'::interval AS date
+        UNION ALL
+         SELECT 'monthly'::text AS period,
+            CURRENT_DATE - '1 mon'::interval AS date
+        UNION ALL
+         SELECT 'yearly'::text AS period,
+            CURRENT_DATE - '1 year'::interval AS date
+        ), token_periods AS (
+         SELECT ti_1.id AS token_implementation_id,
+            p.period,
+            p.date
+           FROM token_implementations ti_1
+             CROSS JOIN periods p
+        ), recent_balances AS (
+         SELECT tb.token_implementation_id,
+            tb.balance,
+            tb.date
+           FROM token_balances_latest tb
+             JOIN token_implementations ti_1 ON tb.token_implementation_id = ti_1.id
+             JOIN tokens nt_1 ON ti_1.token::text = nt_1.slug::text
+          WHERE nt_1.depegged = false
+        ), past_balances AS (
+         SELECT tp.token_implementation_id,
+            tp.period,
+            tp.date,
+            COALESCE(tb.balance, 0::numeric) AS balance
+           FROM token_periods tp
+             LEFT JOIN token_balances tb ON tp.token_implementation_id = tb.token_implementation_id AND tb.date = tp.date
+        ), supply_changes AS (
+         SELECT r.token_implementation_id,
+            r.balance AS recent_balance,
+            COALESCE(p.balance, 0::numeric) AS past_balance,
+            r.balance - COALESCE(p.balance, 0::numeric) AS supply_change,
+            p.period,
+            r.date
+           FROM recent_balances r
+             LEFT JOIN past_balances p ON r.token_implementation_id = p.token_implementation_id
+        )
+ SELECT ti.slug AS token_implementation,
+    sc.recent_balance,
+    sc.past_balance,
+    sc.supply_change,
+    sc.period,
+    sc.date,
+    ti.network,
+    n.slug AS network_slug,
+    ti.network_origin,
+    n.name AS network_name,
+    ti.token AS token_slug,
+    nt.name AS token_name,
+    ti.token_address,
+    n.explorer,
+    rank() OVER (PARTITION BY sc.period ORDER BY sc.supply_change DESC) AS rank
+   FROM supply_changes sc
+     JOIN token_implementations ti ON sc.token_implementation_id = ti.id
+     JOIN networks n ON ti.network::text = n.slug::text
+     JOIN tokens nt ON ti.token::text = nt.slug::text
+  ORDER BY sc.period, sc.supply_change DESC;
+
+DO $$
+DECLARE
+	grant_statement text;
+BEGIN
+	FOR grant_statement IN SELECT statement FROM migration_grants LOOP
+		EXECUTE grant_statement;
+	END LOOP;
+END;
+$$;
+
+-- Cached network configs predate the ids; a new version makes every lambda reload it
+
+UPDATE public.config_version SET "version" = "version" + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+
+COMMIT;
+
+-- The updates above rewrote every balance row
+VACUUM ANALYZE public.token_balances;
+VACUUM ANALYZE public.reserve_balances;
\ No newline at end of file
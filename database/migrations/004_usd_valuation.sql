@@ -0,0 +1,334 @@
+-- USD valuation: price_latest behind current_prices and the daily USD values in token_balances_usd
+-- Run with psql (psql -f database/migrations/004_usd_valuation.sql) after 003_integer_ids.sql. The new tables and the
+-- view are copied in as ../other and ../tables defined them at this step. Everything runs in one transaction.
+
+BEGIN;
+
+-- Last price on or before a date, looked up for every balance valued in USD
+CREATE INDEX IF NOT EXISTS price_token_slug_date_idx ON public.price USING btree (token_slug, date DESC) INCLUDE (price_usd);
+
+-- public.price_latest definition
+
+-- Drop table
+
+-- DROP TABLE public.price_latest;
+
+-- Most recent price of each token, kept current by triggers on price so current_prices reads one row per token
+-- instead of ranking the full price history
+
+CREATE TABLE public.price_latest (
+	token_slug varchar(255) NOT NULL,
+	token_name varchar(255) NULL,
+	price_usd numeric(18, 8) NULL,
+	"date" date NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT price_latest_pkey PRIMARY KEY (token_slug)
+);
+
+CREATE OR REPLACE FUNCTION public.sync_price_latest()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	IF TG_OP = 'TRUNCATE' THEN
+		DELETE FROM public.price_latest;
+		RETURN NULL;
+	END IF;
+
+	-- A removed or moved row may have been the latest one: recompute it from the remaining history
+	IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.token_slug, OLD.date) IS DISTINCT FROM (NEW.token_slug, NEW.date)) THEN
+		DELETE FROM public.price_latest
+		WHERE token_slug = OLD.token_slug AND "date" = OLD.date;
+
+		INSERT INTO public.price_latest (token_slug, token_name, price_usd, "date")
+		SELECT p.token_slug, p.token_name, p.price_usd, p.date
+		FROM public.price p
+		WHERE p.token_slug = OLD.token_slug AND p.date IS NOT NULL
+		ORDER BY p.date DESC
+		LIMIT 1
+		ON CONFLICT (token_slug) DO NOTHING;
+	END IF;
+
+	IF TG_OP = 'DELETE' OR NEW.token_slug IS NULL OR NEW.date IS NULL THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO public.price_latest (token_slug, token_name, price_usd, "date")
+	VALUES (NEW.token_slug, NEW.token_name, NEW.price_usd, NEW.date)
+	ON CONFLICT (token_slug) DO UPDATE
+	SET token_name = EXCLUDED.token_name, price_usd = EXCLUDED.price_usd, "date" = EXCLUDED.date, updated_at = CURRENT_TIMESTAMP
+	WHERE price_latest.date <= EXCLUDED.date
+		AND (price_latest.token_name, price_latest.price_usd, price_latest.date) IS DISTINCT FROM (EXCLUDED.token_name, EXCLUDED.price_usd, EXCLUDED.date);
+
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_price_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.price for each row execute function sync_price_latest();
+
+create trigger sync_price_latest_truncate after
+truncate
+    on
+    public.price for each statement execute function sync_price_latest();
+
+-- Backfill from existing history
+
+INSERT INTO public.price_latest (token_slug, token_name, price_usd, "date")
+SELECT DISTINCT ON (token_slug) token_slug, token_name, price_usd, "date"
+FROM public.price
+WHERE token_slug IS NOT NULL AND "date" IS NOT NULL
+ORDER BY token_slug, "date" DESC
+ON CONFLICT (token_slug) DO NOTHING;
+
+-- public.current_prices source
+-- Latest prices are kept in price_latest by triggers on price
+
+CREATE OR REPLACE VIEW public.current_prices
+AS SELECT token_slug,
+    token_name,
+    price_usd,
+    date AS most_recent_date
+   FROM price_latest
+  ORDER BY token_slug;
+
+-- public.token_balances_usd definition
+
+-- Drop table
+
+-- DROP TABLE public.token_balances_usd;
+
+-- Daily bridge-adjusted balances valued in USD, so USD dashboards read indexed rows instead of ranking the price
+-- history for every balance. Each implementation is valued at the last price on or before the date of its token's
+-- token_slug in price (see database/other/price.sql); price_usd, price_date and balance_usd are NULL when there is
+-- none. Maintained per date by refresh_token_balances_usd(): refresh_historical_supplies() calls it for the dates
+-- ingestion touched, and triggers on price call it for the dates a changed price applies to. Run
+-- SELECT refresh_token_balances_usd(); after changing a token's token_slug.
+
+CREATE TABLE public.token_balances_usd (
+	token_implementation_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	price_usd numeric(18, 8) NULL,
+	price_date date NULL,
+	balance_usd numeric NULL,
+	CONSTRAINT token_balances_usd_pkey PRIMARY KEY (token_implementation_id, date),
+	CONSTRAINT token_balances_usd_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX token_balances_usd_date_idx ON public.token_balances_usd USING btree (date);
+
+-- Recompute the given dates, or every date when p_dates is NULL, for the tokens priced under the given price
+-- token slugs, or for every token when p_token_slugs is NULL, limited to the given token implementations, or
+-- covering all of them when p_implementation_ids is NULL
+
+CREATE OR REPLACE FUNCTION public.refresh_token_balances_usd(p_dates date[] DEFAULT NULL, p_token_slugs varchar[] DEFAULT NULL, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	DELETE FROM public.token_balances_usd tu
+	USING public.token_implementations ti
+		JOIN public.tokens nt ON ti.token::text = nt.slug::text
+	WHERE ti.id = tu.token_implementation_id
+		AND (p_dates IS NULL OR tu.date = ANY (p_dates))
+		AND (p_token_slugs IS NULL OR nt.token_slug = ANY (p_token_slugs))
+		AND (p_implementation_ids IS NULL OR tu.token_implementation_id = ANY (p_implementation_ids));
+
+	INSERT INTO public.token_balances_usd (token_implementation_id, "date", balance, price_usd, price_date, balance_usd)
+	SELECT tb.token_implementation_id,
+		tb.date,
+		tb.balance,
+		p.price_usd,
+		p.date,
+		tb.balance * p.price_usd
+	FROM public.token_balances_adjusted tb
+		JOIN public.token_implementations ti ON ti.id = tb.token_implementation_id
+		JOIN public.tokens nt ON ti.token::text = nt.slug::text
+		-- A backward scan of price_token_slug_date_idx stopping at the first row
+		LEFT JOIN LATERAL (
+			SELECT pr.date, pr.price_usd
+			FROM public.price pr
+			WHERE pr.token_slug::text = nt.token_slug::text AND pr.date <= tb.date
+			ORDER BY pr.date DESC
+			LIMIT 1
+		) p ON true
+	WHERE (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (p_token_slugs IS NULL OR nt.token_slug = ANY (p_token_slugs))
+		AND (p_implementation_ids IS NULL OR tb.token_implementation_id = ANY (p_implementation_ids));
+END;
+$function$;
+
+-- A changed price applies from its date until the token's next price, so revalue every date from the earliest
+-- changed one for the tokens whose prices changed. Daily prices only revalue their own date.
+
+CREATE OR REPLACE FUNCTION public.sync_token_balances_usd()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	changed record;
+	token_slugs varchar[] := '{}';
+	dates date[] := '{}';
+BEGIN
+	IF TG_OP = 'TRUNCATE' THEN
+		PERFORM public.refresh_token_balances_usd();
+		RETURN NULL;
+	END IF;
+
+	-- Transition tables only exist for the events that have them
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		SELECT token_slugs || array_agg(token_slug), dates || array_agg("date") INTO token_slugs, dates FROM new_rows;
+	END IF;
+	IF TG_OP IN ('UPDATE', 'DELETE') THEN
+		SELECT token_slugs || array_agg(token_slug), dates || array_agg("date") INTO token_slugs, dates FROM old_rows;
+	END IF;
+
+	FOR changed IN
+		SELECT c.token_slug, min(c.date) AS from_date
+		FROM unnest(token_slugs, dates) c(token_slug, "date")
+		WHERE c.token_slug IS NOT NULL AND c.date IS NOT NULL
+		GROUP BY c.token_slug
+	LOOP
+		PERFORM public.refresh_token_balances_usd(
+			ARRAY(SELECT DISTINCT tb.date FROM public.token_balances_adjusted tb WHERE tb.date >= changed.from_date),
+			ARRAY[changed.token_slug]
+		);
+	END LOOP;
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_token_balances_usd_insert after
+insert
+    on
+    public.price referencing new table as new_rows for each statement execute function sync_token_balances_usd();
+
+create trigger sync_token_balances_usd_update after
+update
+    on
+    public.price referencing old table as old_rows new table as new_rows for each statement execute function sync_token_balances_usd();
+
+create trigger sync_token_balances_usd_delete after
+delete
+    on
+    public.price referencing old table as old_rows for each statement execute function sync_token_balances_usd();
+
+create trigger sync_token_balances_usd_truncate after
+truncate
+    on
+    public.price for each statement execute function sync_token_balances_usd();
+
+-- refresh_historical_supplies() now also revalues the dates it refreshes, as defined in
+-- ../tables/historical_supplies_materialized.sql, whose tables already exist here
+
+CREATE OR REPLACE FUNCTION public.refresh_historical_supplies(p_dates date[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- Lambdas finishing at the same time refresh one after another rather than racing on the same dates
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	-- The aggregates are built on the bridge-adjusted balances, so bring those up to date first
+	PERFORM public.refresh_token_balances_adjusted(p_dates);
+
+	-- USD values are the adjusted balances times prices, see token_balances_usd.sql
+	PERFORM public.refresh_token_balances_usd(p_dates);
+
+	DELETE FROM public.historical_supplies_by_network_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_network_materialized (network_slug, network_name, total_balance, "date", tokens, token_names)
+	SELECT n.slug AS network_slug,
+		n.name AS network_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT ti.token) AS tokens,
+		array_agg(DISTINCT nt.name) AS token_names
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, n.slug, n.name;
+
+	DELETE FROM public.historical_supplies_by_tokenproject_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_tokenproject_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_staking_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_staking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_liquidstaking_materialized
+	WHERE p_dates IS NULL OR "date" = ANY (p_dates);
+
+	INSERT INTO public.historical_supplies_by_liquidstaking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'liquid_staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+	GROUP BY tb.date, ti.token, nt.name;
+END;
+$function$;
+
+-- Backfill every date from the adjusted balances
+SELECT public.refresh_token_balances_usd();
+
+COMMIT;
\ No newline at end of file
@@ -0,0 +1,197 @@
+-- Narrow the historical supply refresh to the networks and token projects a write changed
+-- Run with psql (psql -f database/migrations/005_narrow_history_refresh.sql) after 004_usd_valuation.sql, before
+-- deploying lambdas that pass implementation ids. The functions are as defined in ../tables; the old single-argument
+-- versions are dropped so calls without ids keep resolving to one function.
+
+BEGIN;
+
+DROP FUNCTION IF EXISTS public.refresh_historical_supplies(date[]);
+DROP FUNCTION IF EXISTS public.refresh_token_balances_adjusted(date[]);
+
+CREATE OR REPLACE FUNCTION public.refresh_token_balances_adjusted(p_dates date[] DEFAULT NULL, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	DELETE FROM public.token_balances_adjusted
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (p_implementation_ids IS NULL OR token_implementation_id = ANY (p_implementation_ids));
+
+	INSERT INTO public.token_balances_adjusted (token_implementation_id, "date", balance, created_at, id)
+	WITH adjustments AS (
+		SELECT be.origin_implementation_id,
+			tb.date,
+			sum(tb.balance) AS total_to_subtract
+		FROM bridge_edges be
+			JOIN token_balances tb ON tb.token_implementation_id = be.bridged_implementation_id
+		WHERE be.origin_implementation_id IS NOT NULL
+			AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+			AND (p_implementation_ids IS NULL OR be.origin_implementation_id = ANY (p_implementation_ids))
+		GROUP BY be.origin_implementation_id, tb.date
+	)
+	SELECT tb.token_implementation_id,
+		tb.date,
+		(tb.balance - COALESCE(adj.total_to_subtract, 0::numeric))::numeric(20,8) AS balance,
+		tb.created_at,
+		tb.id
+	FROM token_balances tb
+		-- Skips implementations being deleted: their balances only cascade away after the bridge_edges trigger has run this
+		JOIN token_implementations ti ON ti.id = tb.token_implementation_id
+		LEFT JOIN adjustments adj ON tb.token_implementation_id = adj.origin_implementation_id AND tb.date = adj.date
+	WHERE (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (p_implementation_ids IS NULL OR tb.token_implementation_id = ANY (p_implementation_ids));
+END;
+$function$;
+
+CREATE OR REPLACE FUNCTION public.refresh_historical_supplies(p_dates date[] DEFAULT NULL, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	affected_ids int4[];
+	affected_networks varchar[];
+	affected_tokens varchar[];
+BEGIN
+	-- Lambdas finishing at the same time refresh one after another rather than racing on the same dates
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	-- A bridged implementation's balance is subtracted from its origin implementation, which may be on another network
+	IF p_implementation_ids IS NOT NULL THEN
+		affected_ids := ARRAY(
+			SELECT unnest(p_implementation_ids)
+			UNION
+			SELECT be.origin_implementation_id
+			FROM bridge_edges be
+			WHERE be.bridged_implementation_id = ANY (p_implementation_ids) AND be.origin_implementation_id IS NOT NULL
+		);
+		affected_networks := ARRAY(SELECT DISTINCT ti.network FROM token_implementations ti WHERE ti.id = ANY (affected_ids));
+		affected_tokens := ARRAY(SELECT DISTINCT ti.token FROM token_implementations ti WHERE ti.id = ANY (affected_ids));
+	END IF;
+
+	-- The aggregates are built on the bridge-adjusted balances, so bring those up to date first
+	PERFORM public.refresh_token_balances_adjusted(p_dates, affected_ids);
+
+	-- USD values are the adjusted balances times prices, see token_balances_usd.sql
+	PERFORM public.refresh_token_balances_usd(p_dates, p_implementation_ids => affected_ids);
+
+	DELETE FROM public.historical_supplies_by_network_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_networks IS NULL OR network_slug = ANY (affected_networks));
+
+	INSERT INTO public.historical_supplies_by_network_materialized (network_slug, network_name, total_balance, "date", tokens, token_names)
+	SELECT n.slug AS network_slug,
+		n.name AS network_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT ti.token) AS tokens,
+		array_agg(DISTINCT nt.name) AS token_names
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_networks IS NULL OR n.slug = ANY (affected_networks))
+	GROUP BY tb.date, n.slug, n.name;
+
+	DELETE FROM public.historical_supplies_by_tokenproject_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_tokens IS NULL OR token_slug = ANY (affected_tokens));
+
+	INSERT INTO public.historical_supplies_by_tokenproject_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_tokens IS NULL OR ti.token = ANY (affected_tokens))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_staking_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_tokens IS NULL OR token_slug = ANY (affected_tokens));
+
+	INSERT INTO public.historical_supplies_by_staking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_tokens IS NULL OR ti.token = ANY (affected_tokens))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_liquidstaking_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_tokens IS NULL OR token_slug = ANY (affected_tokens));
+
+	INSERT INTO public.historical_supplies_by_liquidstaking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'liquid_staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_tokens IS NULL OR ti.token = ANY (affected_tokens))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	-- The projects recomputed above were only ranked among themselves; rank them against the rest of their dates
+	IF affected_tokens IS NOT NULL THEN
+		UPDATE public.historical_supplies_by_tokenproject_materialized m
+		SET "rank" = ranked.rank
+		FROM (
+			SELECT token_slug, "date", rank() OVER (PARTITION BY "date" ORDER BY total_balance DESC) AS rank
+			FROM public.historical_supplies_by_tokenproject_materialized
+			WHERE p_dates IS NULL OR "date" = ANY (p_dates)
+		) ranked
+		WHERE m.token_slug = ranked.token_slug AND m.date = ranked.date AND m.rank IS DISTINCT FROM ranked.rank;
+
+		UPDATE public.historical_supplies_by_staking_materialized m
+		SET "rank" = ranked.rank
+		FROM (
+			SELECT token_slug, "date", rank() OVER (PARTITION BY "date" ORDER BY total_balance DESC) AS rank
+			FROM public.historical_supplies_by_staking_materialized
+			WHERE p_dates IS NULL OR "date" = ANY (p_dates)
+		) ranked
+		WHERE m.token_slug = ranked.token_slug AND m.date = ranked.date AND m.rank IS DISTINCT FROM ranked.rank;
+
+		UPDATE public.historical_supplies_by_liquidstaking_materialized m
+		SET "rank" = ranked.rank
+		FROM (
+			SELECT token_slug, "date", rank() OVER (PARTITION BY "date" ORDER BY total_balance DESC) AS rank
+			FROM public.historical_supplies_by_liquidstaking_materialized
+			WHERE p_dates IS NULL OR "date" = ANY (p_dates)
+		) ranked
+		WHERE m.token_slug = ranked.token_slug AND m.date = ranked.date AND m.rank IS DISTINCT FROM ranked.rank;
+	END IF;
+END;
+$function$;
+
+COMMIT;
\ No newline at end of file
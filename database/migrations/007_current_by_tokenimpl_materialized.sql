@@ -0,0 +1,199 @@
+-- Current supply and reserve reconciliation, kept in current_by_tokenimpl_materialized behind current_by_tokenimpl
+-- Run with psql (psql -f database/migrations/007_current_by_tokenimpl_materialized.sql) after 003_integer_ids.sql,
+-- before deploying lambdas that call refresh_current_by_tokenimpl. The table and the view are copied in as ../tables
+-- and ../views defined them at this step. Everything runs in one transaction.
+
+BEGIN;
+
+-- public.current_by_tokenimpl_materialized definition
+
+-- Drop table
+
+-- DROP TABLE public.current_by_tokenimpl_materialized;
+
+-- Reconciliation of each token implementation's current supply against its current reserves, read by the
+-- current_by_tokenimpl view. The supply is the latest raw balance; the reserve is the sum of the derivative's
+-- reserves on their latest date, less the reserves of implementations bridged from it. Maintained by
+-- refresh_current_by_tokenimpl(): ingestion runs that changed balances reconcile the implementations they wrote,
+-- and final runs rebuild every row. Rows are only rewritten when something in them changed.
+
+CREATE TABLE public.current_by_tokenimpl_materialized (
+	token_implementation_id int4 NOT NULL,
+	token_implementation varchar(255) NOT NULL,
+	supply_balance numeric(20, 8) NOT NULL,
+	supply_date date NOT NULL,
+	reserve_balance numeric NULL,
+	reserve_date date NULL,
+	balance_difference numeric NOT NULL,
+	coverage_ratio numeric NULL,
+	latest_date date NOT NULL,
+	network varchar(255) NULL,
+	network_slug varchar(255) NULL,
+	network_origin varchar(255) NULL,
+	network_name varchar(255) NULL,
+	token_slug varchar(255) NULL,
+	token_name text NULL,
+	token_address varchar(255) NULL,
+	explorer varchar(255) NULL,
+	"rank" int8 NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT current_by_tokenimpl_materialized_pkey PRIMARY KEY (token_implementation_id),
+	CONSTRAINT current_by_tokenimpl_materialized_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX current_by_tokenimpl_materialized_supply_balance_idx ON public.current_by_tokenimpl_materialized USING btree (supply_balance DESC);
+
+-- Reconcile the given token implementations, or rebuild every row when p_implementation_ids is NULL
+
+CREATE OR REPLACE FUNCTION public.refresh_current_by_tokenimpl(p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	affected_ids int4[];
+BEGIN
+	-- Lambdas finishing at the same time rebuild one after another rather than racing on the same rows
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_current_by_tokenimpl'));
+
+	-- A bridged implementation's reserves are subtracted from its origin implementation's
+	IF p_implementation_ids IS NOT NULL THEN
+		affected_ids := ARRAY(
+			SELECT unnest(p_implementation_ids)
+			UNION
+			SELECT be.origin_implementation_id
+			FROM public.bridge_edges be
+			WHERE be.bridged_implementation_id = ANY (p_implementation_ids) AND be.origin_implementation_id IS NOT NULL
+		);
+	END IF;
+
+	-- Only rows that differ from the stored ones are written, so a run that changed nothing leaves no dead tuples.
+	-- Reconciling some implementations keeps their stored ranks here; they are ranked against the rest below.
+	WITH recent_reserves AS (
+		SELECT rbl.derivative_token_id AS token_implementation_id,
+			sum(rbl.balance) AS balance,
+			rbl.date
+		FROM (
+			SELECT derivative_token_id,
+				balance,
+				"date",
+				max("date") OVER (PARTITION BY derivative_token_id) AS latest_date
+			FROM public.reserve_balances_latest
+		) rbl
+		WHERE rbl.date = rbl.latest_date
+		GROUP BY rbl.derivative_token_id, rbl.date
+	), adjustments AS (
+		SELECT be.origin_implementation_id,
+			sum(rr.balance) AS total_to_subtract
+		FROM public.bridge_edges be
+			JOIN recent_reserves rr ON rr.token_implementation_id = be.bridged_implementation_id
+		WHERE be.origin_implementation_id IS NOT NULL
+		GROUP BY be.origin_implementation_id
+	), reserves AS (
+		SELECT rr.token_implementation_id,
+			rr.balance - COALESCE(adj.total_to_subtract, 0::numeric) AS balance,
+			rr.date
+		FROM recent_reserves rr
+			LEFT JOIN adjustments adj ON rr.token_implementation_id = adj.origin_implementation_id
+	), staged AS (
+		SELECT ti.id AS token_implementation_id,
+			ti.slug AS token_implementation,
+			tb.balance AS supply_balance,
+			tb.date AS supply_date,
+			r.balance AS reserve_balance,
+			r.date AS reserve_date,
+			tb.balance - COALESCE(r.balance, 0::numeric) AS balance_difference,
+			r.balance / NULLIF(tb.balance, 0::numeric) AS coverage_ratio,
+			GREATEST(tb.date, r.date) AS latest_date,
+			ti.network,
+			n.slug AS network_slug,
+			ti.network_origin,
+			n.name AS network_name,
+			ti.token AS token_slug,
+			nt.name AS token_name,
+			ti.token_address,
+			n.explorer,
+			CASE
+				WHEN affected_ids IS NULL THEN rank() OVER (ORDER BY tb.balance DESC)
+				ELSE COALESCE(cm.rank, 0)
+			END AS rank
+		FROM public.token_balances_latest tb
+			JOIN public.token_implementations ti ON tb.token_implementation_id = ti.id
+			JOIN public.networks n ON ti.network::text = n.slug::text
+			JOIN public.tokens nt ON ti.token::text = nt.slug::text
+			LEFT JOIN reserves r ON r.token_implementation_id = ti.id
+			LEFT JOIN public.current_by_tokenimpl_materialized cm ON cm.token_implementation_id = ti.id
+		WHERE affected_ids IS NULL OR ti.id = ANY (affected_ids)
+	), removed AS (
+		DELETE FROM public.current_by_tokenimpl_materialized cm
+		WHERE (affected_ids IS NULL OR cm.token_implementation_id = ANY (affected_ids))
+			AND NOT EXISTS (SELECT 1 FROM staged s WHERE s.token_implementation_id = cm.token_implementation_id)
+	)
+	INSERT INTO public.current_by_tokenimpl_materialized (token_implementation_id, token_implementation, supply_balance, supply_date, reserve_balance, reserve_date, balance_difference, coverage_ratio, latest_date, network, network_slug, network_origin, network_name, token_slug, token_name, token_address, explorer, "rank")
+	SELECT token_implementation_id, token_implementation, supply_balance, supply_date, reserve_balance, reserve_date, balance_difference, coverage_ratio, latest_date, network, network_slug, network_origin, network_name, token_slug, token_name, token_address, explorer, "rank"
+	FROM staged
+	EXCEPT
+	SELECT token_implementation_id, token_implementation, supply_balance, supply_date, reserve_balance, reserve_date, balance_difference, coverage_ratio, latest_date, network, network_slug, network_origin, network_name, token_slug, token_name, token_address, explorer, "rank"
+	FROM public.current_by_tokenimpl_materialized
+	ON CONFLICT (token_implementation_id) DO UPDATE
+	SET token_implementation = EXCLUDED.token_implementation,
+		supply_balance = EXCLUDED.supply_balance,
+		supply_date = EXCLUDED.supply_date,
+		reserve_balance = EXCLUDED.reserve_balance,
+		reserve_date = EXCLUDED.reserve_date,
+		balance_difference = EXCLUDED.balance_difference,
+		coverage_ratio = EXCLUDED.coverage_ratio,
+		latest_date = EXCLUDED.latest_date,
+		network = EXCLUDED.network,
+		network_slug = EXCLUDED.network_slug,
+		network_origin = EXCLUDED.network_origin,
+		network_name = EXCLUDED.network_name,
+		token_slug = EXCLUDED.token_slug,
+		token_name = EXCLUDED.token_name,
+		token_address = EXCLUDED.token_address,
+		explorer = EXCLUDED.explorer,
+		"rank" = EXCLUDED.rank,
+		updated_at = CURRENT_TIMESTAMP;
+
+	IF affected_ids IS NOT NULL THEN
+		UPDATE public.current_by_tokenimpl_materialized cm
+		SET "rank" = ranked.rank,
+			updated_at = CURRENT_TIMESTAMP
+		FROM (
+			SELECT token_implementation_id, rank() OVER (ORDER BY supply_balance DESC) AS rank
+			FROM public.current_by_tokenimpl_materialized
+		) ranked
+		WHERE cm.token_implementation_id = ranked.token_implementation_id AND cm.rank IS DISTINCT FROM ranked.rank;
+	END IF;
+END;
+$function$;
+
+-- Backfill from the current balances
+
+SELECT public.refresh_current_by_tokenimpl();
+
+-- CREATE OR REPLACE VIEW keeps the privileges granted on the view; coverage_ratio is added as its last column
+
+-- public.current_by_tokenimpl source
+-- Current supply and reserve balances for each token implementation, reconciled in
+-- current_by_tokenimpl_materialized by refresh_current_by_tokenimpl()
+
+CREATE OR REPLACE VIEW public.current_by_tokenimpl
+AS SELECT token_implementation,
+    supply_balance,
+    reserve_balance,
+    balance_difference,
+    latest_date,
+    network,
+    network_slug,
+    network_origin,
+    network_name,
+    token_slug,
+    token_name,
+    token_address,
+    explorer,
+    rank,
+    coverage_ratio
+   FROM current_by_tokenimpl_materialized
+  ORDER BY supply_balance DESC;
+
+COMMIT;
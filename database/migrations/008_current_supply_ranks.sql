@@ -0,0 +1,89 @@
+-- Current supply ranks of networks and token projects, kept in current_supply_ranks for historical_supplies_by_tokenimpl
+-- Run with psql (psql -f database/migrations/008_current_supply_ranks.sql) after 003_integer_ids.sql, before deploying
+-- lambdas that call refresh_current_supply_ranks. The table and the view are copied in as ../tables and ../views
+-- defined them at this step. Everything runs in one transaction.
+
+BEGIN;
+
+-- public.current_supply_ranks definition
+
+-- Drop table
+
+-- DROP TABLE public.current_supply_ranks;
+
+-- Current rank of every network (kind 'network', slug networks.slug) and token project (kind 'tokenproject', slug
+-- tokens.slug) by supply, as ranked by the current_supplies_by_network and current_supplies_by_tokenproject views.
+-- historical_supplies_by_tokenimpl joins these by key instead of ranking the current state for every read.
+-- Rebuilt by refresh_current_supply_ranks(), which the ingestion lambdas call at the end of every run. Run
+-- SELECT refresh_current_supply_ranks(); once to fill it after creating the views.
+
+CREATE TABLE public.current_supply_ranks (
+	kind varchar(32) NOT NULL,
+	slug varchar(255) NOT NULL,
+	"rank" int8 NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT current_supply_ranks_pkey PRIMARY KEY (kind, slug)
+);
+
+CREATE OR REPLACE FUNCTION public.refresh_current_supply_ranks()
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- Lambdas finishing at the same time rebuild one after another rather than racing on the same rows
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_current_supply_ranks'));
+
+	-- Only ranks that moved are written
+	WITH staged AS (
+		SELECT 'network'::varchar AS kind, network_slug AS slug, "rank"
+		FROM public.current_supplies_by_network
+		WHERE network_slug IS NOT NULL
+		UNION ALL
+		SELECT 'tokenproject'::varchar, token_slug, "rank"
+		FROM public.current_supplies_by_tokenproject
+		WHERE token_slug IS NOT NULL
+	), removed AS (
+		DELETE FROM public.current_supply_ranks r
+		WHERE NOT EXISTS (SELECT 1 FROM staged s WHERE s.kind = r.kind AND s.slug = r.slug)
+	)
+	INSERT INTO public.current_supply_ranks (kind, slug, "rank")
+	SELECT kind, slug, "rank"
+	FROM staged
+	EXCEPT
+	SELECT kind, slug, "rank"
+	FROM public.current_supply_ranks
+	ON CONFLICT (kind, slug) DO UPDATE
+	SET "rank" = EXCLUDED.rank,
+		updated_at = CURRENT_TIMESTAMP;
+END;
+$function$;
+
+-- Rank from the current supply views before the view below starts reading the table
+
+SELECT public.refresh_current_supply_ranks();
+
+-- CREATE OR REPLACE VIEW keeps the privileges granted on the view
+
+-- public.historical_supplies_by_tokenimpl source
+-- Current network and project ranks are kept in current_supply_ranks by refresh_current_supply_ranks()
+
+CREATE OR REPLACE VIEW public.historical_supplies_by_tokenimpl
+AS SELECT n.name AS network_name,
+    n.slug AS network_slug,
+    nt.name AS token_name,
+    concat(n.slug, '_', ti.token) AS identifier,
+    tb.balance AS amount,
+    tb.date,
+    nt.slug AS infra_slug,
+    COALESCE(cs.rank, 0::bigint) AS network_rank,
+    COALESCE(cp.rank, 0::bigint) AS project_rank
+   FROM token_balances_adjusted tb
+     LEFT JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+     LEFT JOIN networks n ON ti.network::text = n.slug::text
+     LEFT JOIN tokens nt ON ti.token::text = nt.slug::text
+     LEFT JOIN current_supply_ranks cs ON cs.kind::text = 'network'::text AND n.slug::text = cs.slug::text
+     LEFT JOIN current_supply_ranks cp ON cp.kind::text = 'tokenproject'::text AND ti.token::text = cp.slug::text
+  WHERE nt.depegged = false
+  ORDER BY cp.rank DESC NULLS LAST, cs.rank DESC NULLS LAST, tb.date DESC;
+
+COMMIT;
@@ -12,4 +12,6 @@ CREATE TABLE public.price (
 	price_usd numeric(18, 8) NULL,
 	CONSTRAINT price_pkey PRIMARY KEY (id),
 	CONSTRAINT unique_date_token_slug UNIQUE (date, token_slug)
-);
\ No newline at end of file
+);
+
+CREATE INDEX price_token_slug_date_idx ON public.price USING btree (token_slug, date DESC) INCLUDE (price_usd);
\ No newline at end of file
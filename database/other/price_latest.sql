@@ -0,0 +1,81 @@
+-- public.price_latest definition
+
+-- Drop table
+
+-- DROP TABLE public.price_latest;
+
+-- Most recent price of each token, kept current by triggers on price so current_prices reads one row per token
+-- instead of ranking the full price history
+
+CREATE TABLE public.price_latest (
+	token_slug varchar(255) NOT NULL,
+	token_name varchar(255) NULL,
+	price_usd numeric(18, 8) NULL,
+	"date" date NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT price_latest_pkey PRIMARY KEY (token_slug)
+);
+
+CREATE OR REPLACE FUNCTION public.sync_price_latest()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	IF TG_OP = 'TRUNCATE' THEN
+		DELETE FROM public.price_latest;
+		RETURN NULL;
+	END IF;
+
+	-- A removed or moved row may have been the latest one: recompute it from the remaining history
+	IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.token_slug, OLD.date) IS DISTINCT FROM (NEW.token_slug, NEW.date)) THEN
+		DELETE FROM public.price_latest
+		WHERE token_slug = OLD.token_slug AND "date" = OLD.date;
+
+		INSERT INTO public.price_latest (token_slug, token_name, price_usd, "date")
+		SELECT p.token_slug, p.token_name, p.price_usd, p.date
+		FROM public.price p
+		WHERE p.token_slug = OLD.token_slug AND p.date IS NOT NULL
+		ORDER BY p.date DESC
+		LIMIT 1
+		ON CONFLICT (token_slug) DO NOTHING;
+	END IF;
+
+	IF TG_OP = 'DELETE' OR NEW.token_slug IS NULL OR NEW.date IS NULL THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO public.price_latest (token_slug, token_name, price_usd, "date")
+	VALUES (NEW.token_slug, NEW.token_name, NEW.price_usd, NEW.date)
+	ON CONFLICT (token_slug) DO UPDATE
+	SET token_name = EXCLUDED.token_name, price_usd = EXCLUDED.price_usd, "date" = EXCLUDED.date, updated_at = CURRENT_TIMESTAMP
+	WHERE price_latest.date <= EXCLUDED.date
+		AND (price_latest.token_name, price_latest.price_usd, price_latest.date) IS DISTINCT FROM (EXCLUDED.token_name, EXCLUDED.price_usd, EXCLUDED.date);
+
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_price_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.price for each row execute function sync_price_latest();
+
+create trigger sync_price_latest_truncate after
+truncate
+    on
+    public.price for each statement execute function sync_price_latest();
+
+-- Backfill from existing history
+
+INSERT INTO public.price_latest (token_slug, token_name, price_usd, "date")
+SELECT DISTINCT ON (token_slug) token_slug, token_name, price_usd, "date"
+FROM public.price
+WHERE token_slug IS NOT NULL AND "date" IS NOT NULL
+ORDER BY token_slug, "date" DESC
+ON CONFLICT (token_slug) DO NOTHING;
\ No newline at end of file
@@ -0,0 +1,50 @@
+-- Monthly partitions of public.token_balances and public.reserve_balances
+
+-- Partitions are named <table>_YYYY_MM and cover one calendar month each. There is no default partition, so a
+-- date without a partition fails to insert instead of landing in a catch-all table that would have to be split
+-- later. The ingestion lambdas call create_balance_partitions for the date they write, which keeps p_months_ahead
+-- months of empty partitions ready; for a backfill, call it with the earliest date first.
+
+-- Create any missing partitions from the month of p_from (or the current month, if earlier) through
+-- p_months_ahead months past the current month, returning how many were created
+
+CREATE OR REPLACE FUNCTION public.create_balance_partitions(p_from date DEFAULT CURRENT_DATE, p_months_ahead integer DEFAULT 3)
+ RETURNS integer
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	month_start date := date_trunc('month', LEAST(p_from, CURRENT_DATE))::date;
+	last_month date := (date_trunc('month', GREATEST(p_from, CURRENT_DATE)) + make_interval(months => p_months_ahead))::date;
+	parent text;
+	partition_name text;
+	created_count integer := 0;
+BEGIN
+	WHILE month_start <= last_month LOOP
+		FOREACH parent IN ARRAY ARRAY['token_balances', 'reserve_balances'] LOOP
+			partition_name := parent || '_' || to_char(month_start, 'YYYY_MM');
+			CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+
+			-- SHARE UPDATE EXCLUSIVE serializes concurrent callers without blocking reads or writes of the parent;
+			-- checking again after taking it sees a partition another caller has just committed
+			EXECUTE format('LOCK TABLE public.%I IN SHARE UPDATE EXCLUSIVE MODE', parent);
+			CONTINUE WHEN to_regclass('public.' || partition_name) IS NOT NULL;
+
+			-- Attaching an empty table needs a weaker lock on the parent than CREATE TABLE ... PARTITION OF.
+			-- The parent's indexes (including the BRIN index on date), constraints and triggers are added on attach.
+			EXECUTE format('CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS)', partition_name, parent);
+			EXECUTE format(
+				'ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+				parent, partition_name, month_start, (month_start + interval '1 month')::date
+			);
+			created_count := created_count + 1;
+		END LOOP;
+		month_start := (month_start + interval '1 month')::date;
+	END LOOP;
+
+	RETURN created_count;
+END;
+$function$;
+
+-- Partitions for the current month and the months ahead
+
+SELECT public.create_balance_partitions();
\ No newline at end of file
@@ -0,0 +1,13 @@
+-- public.block_anchors definition
+
+-- Drop table
+
+-- DROP TABLE public.block_anchors;
+
+CREATE TABLE public.block_anchors (
+	network varchar(255) NOT NULL,
+	"timestamp" int8 NOT NULL,
+	block_number int8 NOT NULL,
+	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT block_anchors_pkey PRIMARY KEY (network, "timestamp")
+);
\ No newline at end of file
@@ -0,0 +1,109 @@
+-- public.bridge_edges definition
+
+-- Drop table
+
+-- DROP TABLE public.bridge_edges;
+
+-- Bridge dependency graph: each bridged token implementation (non-native origin, token_address starting with a
+-- digit, token not depegged) and the implementation on its origin network whose supply it double counts.
+-- Rebuilt by statement triggers whenever token_implementations or tokens change, instead of being derived with a
+-- regex and array_agg inside every query. Edges are keyed by token implementation id; origin_implementation_id is
+-- NULL when the origin network has no implementation of the token, leaving nothing to subtract the supply from.
+
+CREATE TABLE public.bridge_edges (
+	bridged_implementation_id int4 NOT NULL,
+	origin_implementation varchar(255) NOT NULL,
+	origin_implementation_id int4 NULL,
+	"token" varchar(255) NOT NULL,
+	origin_network varchar(255) NOT NULL,
+	CONSTRAINT bridge_edges_pkey PRIMARY KEY (bridged_implementation_id)
+);
+
+CREATE INDEX bridge_edges_origin_implementation_id_idx ON public.bridge_edges USING btree (origin_implementation_id);
+
+-- Bring bridge_edges in line with token_implementations, returning whether any edge changed
+
+CREATE OR REPLACE FUNCTION public.rebuild_bridge_edges()
+ RETURNS boolean
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	deleted_count int;
+	upserted_count int;
+BEGIN
+	DELETE FROM public.bridge_edges be
+	WHERE NOT EXISTS (
+		SELECT 1
+		FROM public.token_implementations ti
+			JOIN public.tokens nt ON ti.token::text = nt.slug::text
+		WHERE ti.id = be.bridged_implementation_id
+			AND ti.network_origin IS NOT NULL AND ti.network_origin::text <> 'native'::text AND ti.token_address::text ~ '^[0-9].*'::text
+			AND nt.depegged = false
+	);
+	GET DIAGNOSTICS deleted_count = ROW_COUNT;
+
+	INSERT INTO public.bridge_edges (bridged_implementation_id, origin_implementation, origin_implementation_id, "token", origin_network)
+	SELECT ti.id,
+		concat(ti.token, '_', ti.network_origin),
+		oi.id,
+		ti.token,
+		ti.network_origin
+	FROM public.token_implementations ti
+		JOIN public.tokens nt ON ti.token::text = nt.slug::text
+		LEFT JOIN public.token_implementations oi ON oi.slug::text = concat(ti.token, '_', ti.network_origin)
+	WHERE ti.network_origin IS NOT NULL AND ti.network_origin::text <> 'native'::text AND ti.token_address::text ~ '^[0-9].*'::text
+		AND nt.depegged = false
+	ON CONFLICT (bridged_implementation_id) DO UPDATE
+	SET origin_implementation = EXCLUDED.origin_implementation,
+		origin_implementation_id = EXCLUDED.origin_implementation_id,
+		"token" = EXCLUDED.token,
+		origin_network = EXCLUDED.origin_network
+	WHERE (bridge_edges.origin_implementation, bridge_edges.origin_implementation_id, bridge_edges.token, bridge_edges.origin_network)
+		IS DISTINCT FROM (EXCLUDED.origin_implementation, EXCLUDED.origin_implementation_id, EXCLUDED.token, EXCLUDED.origin_network);
+	GET DIAGNOSTICS upserted_count = ROW_COUNT;
+
+	RETURN deleted_count + upserted_count > 0;
+END;
+$function$;
+
+-- Adjusted balances depend on the graph for every date, so a changed graph rebuilds the historical tables
+
+CREATE OR REPLACE FUNCTION public.sync_bridge_edges()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	IF public.rebuild_bridge_edges() THEN
+		PERFORM public.refresh_historical_supplies();
+	END IF;
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_bridge_edges after
+insert
+    or
+update
+    or
+delete
+    or
+truncate
+    on
+    public.token_implementations for each statement execute function sync_bridge_edges();
+
+create trigger sync_bridge_edges after
+insert
+    or
+update
+    or
+delete
+    or
+truncate
+    on
+    public.tokens for each statement execute function sync_bridge_edges();
+
+-- Backfill from existing token implementations
+
+SELECT public.rebuild_bridge_edges();
\ No newline at end of file
@@ -0,0 +1,54 @@
+-- public.config_version definition
+
+-- Drop table
+
+-- DROP TABLE public.config_version;
+
+-- Single-row counter bumped by every change to token or reserve implementations, so lambdas can
+-- revalidate their cached network configuration with one cheap read
+
+CREATE TABLE public.config_version (
+	id int4 DEFAULT 1 NOT NULL,
+	"version" int8 DEFAULT 1 NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT config_version_pkey PRIMARY KEY (id),
+	CONSTRAINT config_version_single_row CHECK (id = 1)
+);
+
+INSERT INTO public.config_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION public.bump_config_version()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	UPDATE public.config_version
+	SET "version" = "version" + 1, updated_at = CURRENT_TIMESTAMP
+	WHERE id = 1;
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger bump_config_version after
+insert
+    or
+update
+    or
+delete
+    or
+truncate
+    on
+    public.token_implementations for each statement execute function bump_config_version();
+
+create trigger bump_config_version after
+insert
+    or
+update
+    or
+delete
+    or
+truncate
+    on
+    public.reserve_implementations for each statement execute function bump_config_version();
\ No newline at end of file
@@ -0,0 +1,52 @@
+-- public.current_supply_ranks definition
+
+-- Drop table
+
+-- DROP TABLE public.current_supply_ranks;
+
+-- Current rank of every network (kind 'network', slug networks.slug) and token project (kind 'tokenproject', slug
+-- tokens.slug) by supply, as ranked by the current_supplies_by_network and current_supplies_by_tokenproject views.
+-- historical_supplies_by_tokenimpl joins these by key instead of ranking the current state for every read.
+-- Rebuilt by refresh_current_supply_ranks(), which the ingestion lambdas call at the end of every run. Run
+-- SELECT refresh_current_supply_ranks(); once to fill it after creating the views.
+
+CREATE TABLE public.current_supply_ranks (
+	kind varchar(32) NOT NULL,
+	slug varchar(255) NOT NULL,
+	"rank" int8 NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT current_supply_ranks_pkey PRIMARY KEY (kind, slug)
+);
+
+CREATE OR REPLACE FUNCTION public.refresh_current_supply_ranks()
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- Lambdas finishing at the same time rebuild one after another rather than racing on the same rows
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_current_supply_ranks'));
+
+	-- Only ranks that moved are written
+	WITH staged AS (
+		SELECT 'network'::varchar AS kind, network_slug AS slug, "rank"
+		FROM public.current_supplies_by_network
+		WHERE network_slug IS NOT NULL
+		UNION ALL
+		SELECT 'tokenproject'::varchar, token_slug, "rank"
+		FROM public.current_supplies_by_tokenproject
+		WHERE token_slug IS NOT NULL
+	), removed AS (
+		DELETE FROM public.current_supply_ranks r
+		WHERE NOT EXISTS (SELECT 1 FROM staged s WHERE s.kind = r.kind AND s.slug = r.slug)
+	)
+	INSERT INTO public.current_supply_ranks (kind, slug, "rank")
+	SELECT kind, slug, "rank"
+	FROM staged
+	EXCEPT
+	SELECT kind, slug, "rank"
+	FROM public.current_supply_ranks
+	ON CONFLICT (kind, slug) DO UPDATE
+	SET "rank" = EXCLUDED.rank,
+		updated_at = CURRENT_TIMESTAMP;
+END;
+$function$;
\ No newline at end of file
@@ -0,0 +1,213 @@
+-- Materialized historical supply aggregates
+
+-- Drop tables
+
+-- DROP TABLE public.historical_supplies_by_network_materialized;
+-- DROP TABLE public.historical_supplies_by_tokenproject_materialized;
+-- DROP TABLE public.historical_supplies_by_staking_materialized;
+-- DROP TABLE public.historical_supplies_by_liquidstaking_materialized;
+
+-- Per-date results of the historical_supplies_by_* views, which read from these tables. Every date is aggregated
+-- independently, so refresh_historical_supplies() recomputes only the dates it is given, in one transaction
+-- that readers never wait on. Given the token implementations a write changed, it narrows that further to the
+-- networks and token projects whose totals they feed. Run SELECT refresh_historical_supplies(); to rebuild every
+-- date, e.g. after creating these tables or changing bridge dependencies.
+
+CREATE TABLE public.historical_supplies_by_network_materialized (
+	network_slug varchar(255) NOT NULL,
+	network_name varchar(255) NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	tokens varchar[] NULL,
+	token_names text[] NULL,
+	CONSTRAINT historical_supplies_by_network_materialized_pkey PRIMARY KEY (date, network_slug)
+);
+
+CREATE TABLE public.historical_supplies_by_tokenproject_materialized (
+	token_slug varchar(255) NOT NULL,
+	token_name text NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	networks varchar[] NULL,
+	network_names varchar[] NULL,
+	token_addresses varchar[] NULL,
+	"rank" int8 NULL,
+	CONSTRAINT historical_supplies_by_tokenproject_materialized_pkey PRIMARY KEY (date, token_slug)
+);
+
+CREATE TABLE public.historical_supplies_by_staking_materialized (
+	token_slug varchar(255) NOT NULL,
+	token_name text NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	networks varchar[] NULL,
+	network_names varchar[] NULL,
+	token_addresses varchar[] NULL,
+	"rank" int8 NULL,
+	CONSTRAINT historical_supplies_by_staking_materialized_pkey PRIMARY KEY (date, token_slug)
+);
+
+CREATE TABLE public.historical_supplies_by_liquidstaking_materialized (
+	token_slug varchar(255) NOT NULL,
+	token_name text NULL,
+	total_balance numeric NULL,
+	"date" date NOT NULL,
+	networks varchar[] NULL,
+	network_names varchar[] NULL,
+	token_addresses varchar[] NULL,
+	"rank" int8 NULL,
+	CONSTRAINT historical_supplies_by_liquidstaking_materialized_pkey PRIMARY KEY (date, token_slug)
+);
+
+-- Recompute the given dates, or every date when p_dates is NULL. When p_implementation_ids is given, only the
+-- totals of the networks and token projects of those implementations, and of the implementations their supply
+-- is bridged from, are recomputed; the per-date ranks of the project tables are then brought up to date.
+
+CREATE OR REPLACE FUNCTION public.refresh_historical_supplies(p_dates date[] DEFAULT NULL, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	affected_ids int4[];
+	affected_networks varchar[];
+	affected_tokens varchar[];
+BEGIN
+	-- Lambdas finishing at the same time refresh one after another rather than racing on the same dates
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	-- A bridged implementation's balance is subtracted from its origin implementation, which may be on another network
+	IF p_implementation_ids IS NOT NULL THEN
+		affected_ids := ARRAY(
+			SELECT unnest(p_implementation_ids)
+			UNION
+			SELECT be.origin_implementation_id
+			FROM bridge_edges be
+			WHERE be.bridged_implementation_id = ANY (p_implementation_ids) AND be.origin_implementation_id IS NOT NULL
+		);
+		affected_networks := ARRAY(SELECT DISTINCT ti.network FROM token_implementations ti WHERE ti.id = ANY (affected_ids));
+		affected_tokens := ARRAY(SELECT DISTINCT ti.token FROM token_implementations ti WHERE ti.id = ANY (affected_ids));
+	END IF;
+
+	-- The aggregates are built on the bridge-adjusted balances, so bring those up to date first
+	PERFORM public.refresh_token_balances_adjusted(p_dates, affected_ids);
+
+	-- USD values are the adjusted balances times prices, see token_balances_usd.sql
+	PERFORM public.refresh_token_balances_usd(p_dates, p_implementation_ids => affected_ids);
+
+	DELETE FROM public.historical_supplies_by_network_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_networks IS NULL OR network_slug = ANY (affected_networks));
+
+	INSERT INTO public.historical_supplies_by_network_materialized (network_slug, network_name, total_balance, "date", tokens, token_names)
+	SELECT n.slug AS network_slug,
+		n.name AS network_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT ti.token) AS tokens,
+		array_agg(DISTINCT nt.name) AS token_names
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_networks IS NULL OR n.slug = ANY (affected_networks))
+	GROUP BY tb.date, n.slug, n.name;
+
+	DELETE FROM public.historical_supplies_by_tokenproject_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_tokens IS NULL OR token_slug = ANY (affected_tokens));
+
+	INSERT INTO public.historical_supplies_by_tokenproject_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type <> 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_tokens IS NULL OR ti.token = ANY (affected_tokens))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_staking_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_tokens IS NULL OR token_slug = ANY (affected_tokens));
+
+	INSERT INTO public.historical_supplies_by_staking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_tokens IS NULL OR ti.token = ANY (affected_tokens))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	DELETE FROM public.historical_supplies_by_liquidstaking_materialized
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (affected_tokens IS NULL OR token_slug = ANY (affected_tokens));
+
+	INSERT INTO public.historical_supplies_by_liquidstaking_materialized (token_slug, token_name, total_balance, "date", networks, network_names, token_addresses, "rank")
+	SELECT ti.token AS token_slug,
+		nt.name AS token_name,
+		sum(tb.balance) AS total_balance,
+		tb.date,
+		array_agg(DISTINCT n.slug) AS networks,
+		array_agg(DISTINCT n.name) AS network_names,
+		array_agg(DISTINCT ti.token_address) AS token_addresses,
+		rank() OVER (PARTITION BY tb.date ORDER BY (sum(tb.balance)) DESC) AS rank
+	FROM token_balances_adjusted tb
+		JOIN token_implementations ti ON tb.token_implementation_id = ti.id
+		JOIN networks n ON ti.network::text = n.slug::text
+		JOIN tokens nt ON ti.token::text = nt.slug::text
+	WHERE nt.depegged = false AND nt.type = 'liquid_staking'::token_type_enum
+		AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (affected_tokens IS NULL OR ti.token = ANY (affected_tokens))
+	GROUP BY tb.date, ti.token, nt.name;
+
+	-- The projects recomputed above were only ranked among themselves; rank them against the rest of their dates
+	IF affected_tokens IS NOT NULL THEN
+		UPDATE public.historical_supplies_by_tokenproject_materialized m
+		SET "rank" = ranked.rank
+		FROM (
+			SELECT token_slug, "date", rank() OVER (PARTITION BY "date" ORDER BY total_balance DESC) AS rank
+			FROM public.historical_supplies_by_tokenproject_materialized
+			WHERE p_dates IS NULL OR "date" = ANY (p_dates)
+		) ranked
+		WHERE m.token_slug = ranked.token_slug AND m.date = ranked.date AND m.rank IS DISTINCT FROM ranked.rank;
+
+		UPDATE public.historical_supplies_by_staking_materialized m
+		SET "rank" = ranked.rank
+		FROM (
+			SELECT token_slug, "date", rank() OVER (PARTITION BY "date" ORDER BY total_balance DESC) AS rank
+			FROM public.historical_supplies_by_staking_materialized
+			WHERE p_dates IS NULL OR "date" = ANY (p_dates)
+		) ranked
+		WHERE m.token_slug = ranked.token_slug AND m.date = ranked.date AND m.rank IS DISTINCT FROM ranked.rank;
+
+		UPDATE public.historical_supplies_by_liquidstaking_materialized m
+		SET "rank" = ranked.rank
+		FROM (
+			SELECT token_slug, "date", rank() OVER (PARTITION BY "date" ORDER BY total_balance DESC) AS rank
+			FROM public.historical_supplies_by_liquidstaking_materialized
+			WHERE p_dates IS NULL OR "date" = ANY (p_dates)
+		) ranked
+		WHERE m.token_slug = ranked.token_slug AND m.date = ranked.date AND m.rank IS DISTINCT FROM ranked.rank;
+	END IF;
+END;
+$function$;
\ No newline at end of file
@@ -10,5 +10,7 @@ CREATE TABLE public.networks (
 	explorer varchar(255) NULL,
 	is_bitcoin_layer bool NULL,
 	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
-	CONSTRAINT networks_pkey PRIMARY KEY (slug)
+	id serial4 NOT NULL,
+	CONSTRAINT networks_pkey PRIMARY KEY (slug),
+	CONSTRAINT networks_id_key UNIQUE (id)
 );
\ No newline at end of file
@@ -4,15 +4,24 @@
 
 -- DROP TABLE public.reserve_balances;
 
+-- Keyed by the integer ids of the reserve network and token implementations rather than their slugs.
+-- Partitioned by month, see balance_partitions.sql. The indexes below are created on every partition
+
 CREATE TABLE public.reserve_balances (
 	"date" date NOT NULL,
 	balance numeric(20, 8) NOT NULL,
 	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
 	reserve_implementation_id int4 NULL,
-	reserve_network varchar(255) NULL,
-	collateral_token varchar(255) NULL,
-	derivative_token varchar(255) NULL,
 	reserve_address varchar(255) NOT NULL,
-	CONSTRAINT unique_reserve_balance_entry UNIQUE (date, reserve_network, reserve_address, collateral_token, derivative_token),
-	CONSTRAINT reserve_balances_reserve_implementation_fkey FOREIGN KEY (reserve_implementation_id) REFERENCES public.reserve_implementations(id) ON DELETE CASCADE
-);
\ No newline at end of file
+	reserve_network_id int4 NULL,
+	collateral_token_id int4 NULL,
+	derivative_token_id int4 NULL,
+	CONSTRAINT unique_reserve_balance_entry UNIQUE (date, reserve_network_id, reserve_address, collateral_token_id, derivative_token_id),
+	CONSTRAINT reserve_balances_reserve_implementation_fkey FOREIGN KEY (reserve_implementation_id) REFERENCES public.reserve_implementations(id) ON DELETE CASCADE,
+	CONSTRAINT reserve_balances_reserve_network_id_fkey FOREIGN KEY (reserve_network_id) REFERENCES public.networks(id) ON DELETE CASCADE,
+	CONSTRAINT reserve_balances_collateral_token_id_fkey FOREIGN KEY (collateral_token_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE,
+	CONSTRAINT reserve_balances_derivative_token_id_fkey FOREIGN KEY (derivative_token_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+) PARTITION BY RANGE ("date");
+
+CREATE INDEX reserve_balances_derivative_token_id_date_idx ON public.reserve_balances USING btree (derivative_token_id, date DESC) INCLUDE (balance);
+CREATE INDEX reserve_balances_date_brin_idx ON public.reserve_balances USING brin (date);
\ No newline at end of file
@@ -0,0 +1,92 @@
+-- public.reserve_balances_latest definition
+
+-- Drop table
+
+-- DROP TABLE public.reserve_balances_latest;
+
+-- Most recent balance of each reserve (one row per unique reserve_balances key without the date), kept current
+-- by triggers on reserve_balances. Rows missing part of the key are not tracked; the ingestion path always sets it.
+
+CREATE TABLE public.reserve_balances_latest (
+	reserve_network_id int4 NOT NULL,
+	reserve_address varchar(255) NOT NULL,
+	collateral_token_id int4 NOT NULL,
+	derivative_token_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	reserve_implementation_id int4 NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT reserve_balances_latest_pkey PRIMARY KEY (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id),
+	CONSTRAINT reserve_balances_latest_reserve_implementation_fkey FOREIGN KEY (reserve_implementation_id) REFERENCES public.reserve_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX reserve_balances_latest_derivative_token_id_idx ON public.reserve_balances_latest USING btree (derivative_token_id, date DESC);
+
+CREATE OR REPLACE FUNCTION public.sync_reserve_balances_latest()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- A removed or moved row may have been the latest one: recompute it from the remaining history
+	IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.date, OLD.reserve_network_id, OLD.reserve_address, OLD.collateral_token_id, OLD.derivative_token_id)
+		IS DISTINCT FROM (NEW.date, NEW.reserve_network_id, NEW.reserve_address, NEW.collateral_token_id, NEW.derivative_token_id)) THEN
+		DELETE FROM public.reserve_balances_latest
+		WHERE reserve_network_id = OLD.reserve_network_id
+			AND reserve_address = OLD.reserve_address
+			AND collateral_token_id = OLD.collateral_token_id
+			AND derivative_token_id = OLD.derivative_token_id
+			AND "date" = OLD.date;
+
+		INSERT INTO public.reserve_balances_latest (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id)
+		SELECT rb.reserve_network_id, rb.reserve_address, rb.collateral_token_id, rb.derivative_token_id, rb.date, rb.balance, rb.reserve_implementation_id
+		FROM public.reserve_balances rb
+		WHERE rb.reserve_network_id = OLD.reserve_network_id
+			AND rb.reserve_address = OLD.reserve_address
+			AND rb.collateral_token_id = OLD.collateral_token_id
+			AND rb.derivative_token_id = OLD.derivative_token_id
+			-- Skip when the reserve implementation itself is being deleted and its history cascades away
+			AND (rb.reserve_implementation_id IS NULL OR EXISTS (SELECT 1 FROM public.reserve_implementations ri WHERE ri.id = rb.reserve_implementation_id))
+		ORDER BY rb.date DESC
+		LIMIT 1
+		ON CONFLICT (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id) DO NOTHING;
+	END IF;
+
+	IF TG_OP = 'DELETE' OR NEW.reserve_network_id IS NULL OR NEW.collateral_token_id IS NULL OR NEW.derivative_token_id IS NULL THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO public.reserve_balances_latest (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id)
+	VALUES (NEW.reserve_network_id, NEW.reserve_address, NEW.collateral_token_id, NEW.derivative_token_id, NEW.date, NEW.balance, NEW.reserve_implementation_id)
+	ON CONFLICT (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id) DO UPDATE
+	SET "date" = EXCLUDED.date,
+		balance = EXCLUDED.balance,
+		reserve_implementation_id = EXCLUDED.reserve_implementation_id,
+		updated_at = CURRENT_TIMESTAMP
+	WHERE reserve_balances_latest.date <= EXCLUDED.date
+		AND (reserve_balances_latest.date, reserve_balances_latest.balance, reserve_balances_latest.reserve_implementation_id)
+		IS DISTINCT FROM (EXCLUDED.date, EXCLUDED.balance, EXCLUDED.reserve_implementation_id);
+
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_reserve_balances_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.reserve_balances for each row execute function sync_reserve_balances_latest();
+
+-- Backfill from existing history
+
+INSERT INTO public.reserve_balances_latest (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id)
+SELECT DISTINCT ON (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id)
+	reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date", balance, reserve_implementation_id
+FROM public.reserve_balances
+WHERE reserve_network_id IS NOT NULL AND collateral_token_id IS NOT NULL AND derivative_token_id IS NOT NULL
+ORDER BY reserve_network_id, reserve_address, collateral_token_id, derivative_token_id, "date" DESC
+ON CONFLICT (reserve_network_id, reserve_address, collateral_token_id, derivative_token_id) DO NOTHING;
\ No newline at end of file
@@ -4,13 +4,20 @@
 
 -- DROP TABLE public.token_balances;
 
+-- Keyed by the integer id of the token implementation rather than its slug.
+-- Partitioned by month, see balance_partitions.sql. The primary key has to include the partition key,
+-- and the indexes below are created on every partition
+
 CREATE TABLE public.token_balances (
 	"date" date NOT NULL,
-	token_implementation varchar(255) NULL,
 	balance numeric(20, 8) NOT NULL,
 	created_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
 	id serial4 NOT NULL,
-	CONSTRAINT token_balances_pkey PRIMARY KEY (id),
-	CONSTRAINT token_balances_token_implementation_date_key UNIQUE (token_implementation, date),
-	CONSTRAINT token_balances_token_implementation_fkey FOREIGN KEY (token_implementation) REFERENCES public.token_implementations(slug) ON DELETE CASCADE
-);
\ No newline at end of file
+	token_implementation_id int4 NOT NULL,
+	CONSTRAINT token_balances_pkey PRIMARY KEY (id, date),
+	CONSTRAINT token_balances_token_implementation_id_date_key UNIQUE (token_implementation_id, date),
+	CONSTRAINT token_balances_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+) PARTITION BY RANGE ("date");
+
+CREATE INDEX token_balances_token_implementation_id_date_idx ON public.token_balances USING btree (token_implementation_id, date DESC) INCLUDE (balance);
+CREATE INDEX token_balances_date_brin_idx ON public.token_balances USING brin (date);
\ No newline at end of file
@@ -0,0 +1,62 @@
+-- public.token_balances_adjusted definition
+
+-- Drop table
+
+-- DROP TABLE public.token_balances_adjusted;
+
+-- Daily token balances with bridged supply subtracted from the implementation on the origin network, so the
+-- historical views read indexed rows instead of joining the full history against the bridge graph.
+-- Maintained per date by refresh_token_balances_adjusted(), which refresh_historical_supplies() calls for the
+-- dates ingestion touched. Run SELECT refresh_historical_supplies(); once to fill it for every date.
+
+CREATE TABLE public.token_balances_adjusted (
+	token_implementation_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	created_at timestamp NULL,
+	id int4 NULL,
+	CONSTRAINT token_balances_adjusted_pkey PRIMARY KEY (token_implementation_id, date),
+	CONSTRAINT token_balances_adjusted_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX token_balances_adjusted_date_idx ON public.token_balances_adjusted USING btree (date);
+
+-- Recompute the given dates, or every date when p_dates is NULL, for the given token implementations, or for all of
+-- them when p_implementation_ids is NULL
+
+CREATE OR REPLACE FUNCTION public.refresh_token_balances_adjusted(p_dates date[] DEFAULT NULL, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	DELETE FROM public.token_balances_adjusted
+	WHERE (p_dates IS NULL OR "date" = ANY (p_dates))
+		AND (p_implementation_ids IS NULL OR token_implementation_id = ANY (p_implementation_ids));
+
+	INSERT INTO public.token_balances_adjusted (token_implementation_id, "date", balance, created_at, id)
+	WITH adjustments AS (
+		SELECT be.origin_implementation_id,
+			tb.date,
+			sum(tb.balance) AS total_to_subtract
+		FROM bridge_edges be
+			JOIN token_balances tb ON tb.token_implementation_id = be.bridged_implementation_id
+		WHERE be.origin_implementation_id IS NOT NULL
+			AND (p_dates IS NULL OR tb.date = ANY (p_dates))
+			AND (p_implementation_ids IS NULL OR be.origin_implementation_id = ANY (p_implementation_ids))
+		GROUP BY be.origin_implementation_id, tb.date
+	)
+	SELECT tb.token_implementation_id,
+		tb.date,
+		(tb.balance - COALESCE(adj.total_to_subtract, 0::numeric))::numeric(20,8) AS balance,
+		tb.created_at,
+		tb.id
+	FROM token_balances tb
+		-- Skips implementations being deleted: their balances only cascade away after the bridge_edges trigger has run this
+		JOIN token_implementations ti ON ti.id = tb.token_implementation_id
+		LEFT JOIN adjustments adj ON tb.token_implementation_id = adj.origin_implementation_id AND tb.date = adj.date
+	WHERE (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (p_implementation_ids IS NULL OR tb.token_implementation_id = ANY (p_implementation_ids));
+END;
+$function$;
\ No newline at end of file
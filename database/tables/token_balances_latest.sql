@@ -0,0 +1,72 @@
+-- public.token_balances_latest definition
+
+-- Drop table
+
+-- DROP TABLE public.token_balances_latest;
+
+-- Most recent balance of each token implementation, kept current by triggers on token_balances so the
+-- "current" views read one row per token implementation instead of searching the full history
+
+CREATE TABLE public.token_balances_latest (
+	token_implementation_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT token_balances_latest_pkey PRIMARY KEY (token_implementation_id),
+	CONSTRAINT token_balances_latest_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION public.sync_token_balances_latest()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	-- A removed or moved row may have been the latest one: recompute it from the remaining history
+	IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (OLD.token_implementation_id, OLD.date) IS DISTINCT FROM (NEW.token_implementation_id, NEW.date)) THEN
+		DELETE FROM public.token_balances_latest
+		WHERE token_implementation_id = OLD.token_implementation_id AND "date" = OLD.date;
+
+		INSERT INTO public.token_balances_latest (token_implementation_id, "date", balance)
+		SELECT tb.token_implementation_id, tb.date, tb.balance
+		FROM public.token_balances tb
+		WHERE tb.token_implementation_id = OLD.token_implementation_id
+			-- Skip when the token implementation itself is being deleted and its history cascades away
+			AND EXISTS (SELECT 1 FROM public.token_implementations ti WHERE ti.id = OLD.token_implementation_id)
+		ORDER BY tb.date DESC
+		LIMIT 1
+		ON CONFLICT (token_implementation_id) DO NOTHING;
+	END IF;
+
+	IF TG_OP = 'DELETE' THEN
+		RETURN NULL;
+	END IF;
+
+	INSERT INTO public.token_balances_latest (token_implementation_id, "date", balance)
+	VALUES (NEW.token_implementation_id, NEW.date, NEW.balance)
+	ON CONFLICT (token_implementation_id) DO UPDATE
+	SET "date" = EXCLUDED.date, balance = EXCLUDED.balance, updated_at = CURRENT_TIMESTAMP
+	WHERE token_balances_latest.date <= EXCLUDED.date
+		AND (token_balances_latest.date, token_balances_latest.balance) IS DISTINCT FROM (EXCLUDED.date, EXCLUDED.balance);
+
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_token_balances_latest after
+insert
+    or
+update
+    or
+delete
+    on
+    public.token_balances for each row execute function sync_token_balances_latest();
+
+-- Backfill from existing history
+
+INSERT INTO public.token_balances_latest (token_implementation_id, "date", balance)
+SELECT DISTINCT ON (token_implementation_id) token_implementation_id, "date", balance
+FROM public.token_balances
+ORDER BY token_implementation_id, "date" DESC
+ON CONFLICT (token_implementation_id) DO NOTHING;
\ No newline at end of file
@@ -0,0 +1,130 @@
+-- public.token_balances_usd definition
+
+-- Drop table
+
+-- DROP TABLE public.token_balances_usd;
+
+-- Daily bridge-adjusted balances valued in USD, so USD dashboards read indexed rows instead of ranking the price
+-- history for every balance. Each implementation is valued at the last price on or before the date of its token's
+-- token_slug in price (see database/other/price.sql); price_usd, price_date and balance_usd are NULL when there is
+-- none. Maintained per date by refresh_token_balances_usd(): refresh_historical_supplies() calls it for the dates
+-- and implementations ingestion touched, and triggers on price call it for the dates a changed price applies to.
+-- Run SELECT refresh_token_balances_usd(); after changing a token's token_slug.
+
+CREATE TABLE public.token_balances_usd (
+	token_implementation_id int4 NOT NULL,
+	"date" date NOT NULL,
+	balance numeric(20, 8) NOT NULL,
+	price_usd numeric(18, 8) NULL,
+	price_date date NULL,
+	balance_usd numeric NULL,
+	CONSTRAINT token_balances_usd_pkey PRIMARY KEY (token_implementation_id, date),
+	CONSTRAINT token_balances_usd_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+
+CREATE INDEX token_balances_usd_date_idx ON public.token_balances_usd USING btree (date);
+
+-- Recompute the given dates, or every date when p_dates is NULL, for the tokens priced under the given price
+-- token slugs, or for every token when p_token_slugs is NULL, limited to the given token implementations, or
+-- covering all of them when p_implementation_ids is NULL
+
+CREATE OR REPLACE FUNCTION public.refresh_token_balances_usd(p_dates date[] DEFAULT NULL, p_token_slugs varchar[] DEFAULT NULL, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	PERFORM pg_advisory_xact_lock(hashtext('refresh_historical_supplies'));
+
+	DELETE FROM public.token_balances_usd tu
+	USING public.token_implementations ti
+		JOIN public.tokens nt ON ti.token::text = nt.slug::text
+	WHERE ti.id = tu.token_implementation_id
+		AND (p_dates IS NULL OR tu.date = ANY (p_dates))
+		AND (p_token_slugs IS NULL OR nt.token_slug = ANY (p_token_slugs))
+		AND (p_implementation_ids IS NULL OR tu.token_implementation_id = ANY (p_implementation_ids));
+
+	INSERT INTO public.token_balances_usd (token_implementation_id, "date", balance, price_usd, price_date, balance_usd)
+	SELECT tb.token_implementation_id,
+		tb.date,
+		tb.balance,
+		p.price_usd,
+		p.date,
+		tb.balance * p.price_usd
+	FROM public.token_balances_adjusted tb
+		JOIN public.token_implementations ti ON ti.id = tb.token_implementation_id
+		JOIN public.tokens nt ON ti.token::text = nt.slug::text
+		-- A backward scan of price_token_slug_date_idx stopping at the first row
+		LEFT JOIN LATERAL (
+			SELECT pr.date, pr.price_usd
+			FROM public.price pr
+			WHERE pr.token_slug::text = nt.token_slug::text AND pr.date <= tb.date
+			ORDER BY pr.date DESC
+			LIMIT 1
+		) p ON true
+	WHERE (p_dates IS NULL OR tb.date = ANY (p_dates))
+		AND (p_token_slugs IS NULL OR nt.token_slug = ANY (p_token_slugs))
+		AND (p_implementation_ids IS NULL OR tb.token_implementation_id = ANY (p_implementation_ids));
+END;
+$function$;
+
+-- A changed price applies from its date until the token's next price, so revalue every date from the earliest
+-- changed one for the tokens whose prices changed. Daily prices only revalue their own date.
+
+CREATE OR REPLACE FUNCTION public.sync_token_balances_usd()
+ RETURNS trigger
+ LANGUAGE plpgsql
+AS $function$
+DECLARE
+	changed record;
+	token_slugs varchar[] := '{}';
+	dates date[] := '{}';
+BEGIN
+	IF TG_OP = 'TRUNCATE' THEN
+		PERFORM public.refresh_token_balances_usd();
+		RETURN NULL;
+	END IF;
+
+	-- Transition tables only exist for the events that have them
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		SELECT token_slugs || array_agg(token_slug), dates || array_agg("date") INTO token_slugs, dates FROM new_rows;
+	END IF;
+	IF TG_OP IN ('UPDATE', 'DELETE') THEN
+		SELECT token_slugs || array_agg(token_slug), dates || array_agg("date") INTO token_slugs, dates FROM old_rows;
+	END IF;
+
+	FOR changed IN
+		SELECT c.token_slug, min(c.date) AS from_date
+		FROM unnest(token_slugs, dates) c(token_slug, "date")
+		WHERE c.token_slug IS NOT NULL AND c.date IS NOT NULL
+		GROUP BY c.token_slug
+	LOOP
+		PERFORM public.refresh_token_balances_usd(
+			ARRAY(SELECT DISTINCT tb.date FROM public.token_balances_adjusted tb WHERE tb.date >= changed.from_date),
+			ARRAY[changed.token_slug]
+		);
+	END LOOP;
+	RETURN NULL;
+END;
+$function$;
+
+-- Table Triggers
+
+create trigger sync_token_balances_usd_insert after
+insert
+    on
+    public.price referencing new table as new_rows for each statement execute function sync_token_balances_usd();
+
+create trigger sync_token_balances_usd_update after
+update
+    on
+    public.price referencing old table as old_rows new table as new_rows for each statement execute function sync_token_balances_usd();
+
+create trigger sync_token_balances_usd_delete after
+delete
+    on
+    public.price referencing old table as old_rows for each statement execute function sync_token_balances_usd();
+
+create trigger sync_token_balances_usd_truncate after
+truncate
+    on
+    public.price for each statement execute function sync_token_balances_usd();
\ No newline at end of file
@@ -14,7 +14,9 @@ CREATE TABLE public.token_implementations (
 	token_address varchar(255) NULL,
 	reserve_implementations jsonb NULL,
 	"degree" int4 NULL,
+	id serial4 NOT NULL,
 	CONSTRAINT token_implementations_pkey PRIMARY KEY (slug),
+	CONSTRAINT token_implementations_id_key UNIQUE (id),
 	CONSTRAINT token_implementations_network_fkey FOREIGN KEY (network) REFERENCES public.networks(slug) ON DELETE CASCADE,
 	CONSTRAINT token_implementations_network_origin_fkey FOREIGN KEY (network_origin) REFERENCES public.networks(slug) ON DELETE CASCADE,
 	CONSTRAINT token_implementations_token_fkey FOREIGN KEY ("token") REFERENCES public.tokens(slug) ON DELETE CASCADE
@@ -16,4 +16,6 @@ CREATE TABLE public.tokens (
 	depegged bool DEFAULT false NULL,
 	CONSTRAINT tokens_pkey PRIMARY KEY (slug),
 	CONSTRAINT tokens_project_slug_token_slug_key UNIQUE (project_slug, token_slug)
-);
\ No newline at end of file
+);
+
+CREATE INDEX tokens_not_depegged_idx ON public.tokens USING btree (slug) INCLUDE (type) WHERE (depegged = false);
\ No newline at end of file
@@ -0,0 +1,93 @@
+-- public.top_gainers_snapshot definition
+
+-- Drop table
+
+-- DROP TABLE public.top_gainers_snapshot;
+
+-- Supply change of each token implementation over the daily, weekly, monthly and yearly periods, computed once per
+-- closed day by refresh_top_gainers_snapshot() so the top_gainers_by_tokenimpl* views are a plain indexed read.
+-- The balances compared are the last ones on or before as_of and on or before each period_date, so a day missing
+-- from the history falls back to the day before it instead of dropping the comparison. past_date and
+-- past_balance are NULL when the implementation has no history that far back.
+
+CREATE TABLE public.top_gainers_snapshot (
+	token_implementation_id int4 NOT NULL,
+	period text NOT NULL,
+	as_of date NOT NULL,
+	recent_date date NOT NULL,
+	recent_balance numeric(20, 8) NOT NULL,
+	period_date date NOT NULL,
+	past_date date NULL,
+	past_balance numeric(20, 8) NULL,
+	percent_change numeric NULL,
+	supply_change numeric NOT NULL,
+	updated_at timestamp DEFAULT CURRENT_TIMESTAMP NULL,
+	CONSTRAINT top_gainers_snapshot_pkey PRIMARY KEY (token_implementation_id, period),
+	CONSTRAINT top_gainers_snapshot_token_implementation_id_fkey FOREIGN KEY (token_implementation_id) REFERENCES public.token_implementations(id) ON DELETE CASCADE
+);
+CREATE INDEX top_gainers_snapshot_period_percent_change_idx ON public.top_gainers_snapshot USING btree (period, percent_change DESC);
+CREATE INDEX top_gainers_snapshot_period_supply_change_idx ON public.top_gainers_snapshot USING btree (period, supply_change DESC);
+
+-- Recompute the snapshot as of a closed day for the given token implementations, or for all of them when
+-- p_implementation_ids is NULL. Rows already computed as of a later day are left alone, so re-ingesting an
+-- older date does not move the snapshot back.
+
+CREATE OR REPLACE FUNCTION public.refresh_top_gainers_snapshot(p_as_of date DEFAULT CURRENT_DATE - 1, p_implementation_ids int4[] DEFAULT NULL)
+ RETURNS void
+ LANGUAGE plpgsql
+AS $function$
+BEGIN
+	INSERT INTO public.top_gainers_snapshot (token_implementation_id, period, as_of, recent_date, recent_balance, period_date, past_date, past_balance, percent_change, supply_change)
+	SELECT ti.id,
+		p.period,
+		p_as_of,
+		r.date,
+		r.balance,
+		(p_as_of - p.span)::date,
+		pb.date,
+		pb.balance,
+		CASE
+			WHEN pb.balance IS NOT NULL THEN COALESCE(round((r.balance - pb.balance) / NULLIF(pb.balance, 0::numeric) * 100::numeric, 2), 0::numeric)
+			ELSE NULL::numeric
+		END,
+		r.balance - COALESCE(pb.balance, 0::numeric)
+	FROM public.token_implementations ti
+		-- Both lookups are a backward scan of token_balances_token_implementation_id_date_idx stopping at the first row
+		CROSS JOIN LATERAL (
+			SELECT tb.date, tb.balance
+			FROM public.token_balances tb
+			WHERE tb.token_implementation_id = ti.id AND tb.date <= p_as_of
+			ORDER BY tb.date DESC
+			LIMIT 1
+		) r
+		CROSS JOIN (VALUES
+			('daily'::text, '1 day'::interval),
+			('weekly'::text, '7 days'::interval),
+			('monthly'::text, '1 mon'::interval),
+			('yearly'::text, '1 year'::interval)
+		) p(period, span)
+		LEFT JOIN LATERAL (
+			SELECT tb.date, tb.balance
+			FROM public.token_balances tb
+			WHERE tb.token_implementation_id = ti.id AND tb.date <= (p_as_of - p.span)::date
+			ORDER BY tb.date DESC
+			LIMIT 1
+		) pb ON true
+	WHERE p_implementation_ids IS NULL OR ti.id = ANY (p_implementation_ids)
+	ON CONFLICT (token_implementation_id, period) DO UPDATE
+	SET as_of = EXCLUDED.as_of,
+		recent_date = EXCLUDED.recent_date,
+		recent_balance = EXCLUDED.recent_balance,
+		period_date = EXCLUDED.period_date,
+		past_date = EXCLUDED.past_date,
+		past_balance = EXCLUDED.past_balance,
+		percent_change = EXCLUDED.percent_change,
+		supply_change = EXCLUDED.supply_change,
+		updated_at = CURRENT_TIMESTAMP
+	WHERE top_gainers_snapshot.as_of <= EXCLUDED.as_of;
+END;
+$function$;
+
+-- Backfill as of yesterday
+
+SELECT public.refresh_top_gainers_snapshot();
\ No newline at end of file
@@ -2,34 +2,40 @@
 
 CREATE OR REPLACE VIEW public.current_reserves_by_tokenimpl
 AS WITH recent_reserves AS (
-         SELECT hrs.derivative_token AS token_implementation,
-            hrs.total_balance AS balance,
-            hrs.date
-           FROM helper_reserves_summed hrs
-          WHERE hrs.date = (( SELECT max(inner_hrs.date) AS max
-                   FROM helper_reserves_summed inner_hrs
-                  WHERE inner_hrs.derivative_token::text = hrs.derivative_token::text))
+         SELECT rbl.derivative_token_id AS token_implementation_id,
+            sum(rbl.balance) AS balance,
+            rbl.date
+           FROM ( SELECT reserve_balances_latest.reserve_network_id,
+                    reserve_balances_latest.collateral_token_id,
+                    reserve_balances_latest.derivative_token_id,
+                    reserve_balances_latest.balance,
+                    reserve_balances_latest.date,
+                    max(reserve_balances_latest.date) OVER (PARTITION BY reserve_balances_latest.derivative_token_id) AS latest_date
+                   FROM reserve_balances_latest) rbl
+          WHERE rbl.date = rbl.latest_date
+          GROUP BY rbl.date, rbl.reserve_network_id, rbl.collateral_token_id, rbl.derivative_token_id
         ), adjustments AS (
-         SELECT hdb.token_implementation AS original_token_implementation,
+         SELECT be.origin_implementation_id,
             sum(rr.balance) AS total_to_subtract
-           FROM helper_dependencies_bridges hdb
-             JOIN recent_reserves rr ON rr.token_implementation::text = ANY (hdb.tokens_to_subtract::text[])
-          GROUP BY hdb.token_implementation
+           FROM bridge_edges be
+             JOIN recent_reserves rr ON rr.token_implementation_id = be.bridged_implementation_id
+          WHERE be.origin_implementation_id IS NOT NULL
+          GROUP BY be.origin_implementation_id
         ), adjusted_reserves AS (
-         SELECT rr.token_implementation,
+         SELECT rr.token_implementation_id,
                 CASE
                     WHEN adj.total_to_subtract IS NOT NULL THEN
                     CASE
-                        WHEN rr.token_implementation::text = adj.original_token_implementation THEN rr.balance - adj.total_to_subtract
+                        WHEN rr.token_implementation_id = adj.origin_implementation_id THEN rr.balance - adj.total_to_subtract
                         ELSE rr.balance
                     END
                     ELSE rr.balance
                 END AS balance,
             rr.date
            FROM recent_reserves rr
-             LEFT JOIN adjustments adj ON rr.token_implementation::text = adj.original_token_implementation
+             LEFT JOIN adjustments adj ON rr.token_implementation_id = adj.origin_implementation_id
         )
- SELECT ar.token_implementation,
+ SELECT ti.slug AS token_implementation,
     ar.balance,
     ar.date,
     ti.network,
@@ -42,7 +48,7 @@ AS WITH recent_reserves AS (
     n.explorer,
     rank() OVER (ORDER BY ar.balance DESC) AS rank
    FROM adjusted_reserves ar
-     JOIN token_implementations ti ON ar.token_implementation::text = ti.slug::text
+     JOIN token_implementations ti ON ar.token_implementation_id = ti.id
      JOIN networks n ON ti.network::text = n.slug::text
      JOIN tokens nt ON ti.token::text = nt.slug::text
   ORDER BY ar.balance DESC;
\ No newline at end of file
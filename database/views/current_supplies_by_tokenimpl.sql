@@ -2,36 +2,35 @@
 
 CREATE OR REPLACE VIEW public.current_supplies_by_tokenimpl
 AS WITH recent_balances AS (
-         SELECT tb.token_implementation,
+         SELECT tb.token_implementation_id,
             tb.balance,
             tb.date
-           FROM token_balances tb
-             JOIN token_implementations ti_1 ON tb.token_implementation::text = ti_1.slug::text
+           FROM token_balances_latest tb
+             JOIN token_implementations ti_1 ON tb.token_implementation_id = ti_1.id
              JOIN tokens nt_1 ON ti_1.token::text = nt_1.slug::text
-          WHERE tb.date = (( SELECT max(inner_tb.date) AS max
-                   FROM token_balances inner_tb
-                  WHERE inner_tb.token_implementation::text = tb.token_implementation::text)) AND nt_1.depegged = false
+          WHERE nt_1.depegged = false
         ), adjustments AS (
-         SELECT hdb.token_implementation AS original_token_implementation,
+         SELECT be.origin_implementation_id,
             sum(rb.balance) AS total_to_subtract
-           FROM helper_dependencies_bridges hdb
-             JOIN recent_balances rb ON rb.token_implementation::text = ANY (hdb.tokens_to_subtract::text[])
-          GROUP BY hdb.token_implementation
+           FROM bridge_edges be
+             JOIN recent_balances rb ON rb.token_implementation_id = be.bridged_implementation_id
+          WHERE be.origin_implementation_id IS NOT NULL
+          GROUP BY be.origin_implementation_id
         ), adjusted_balances AS (
-         SELECT rb.token_implementation,
+         SELECT rb.token_implementation_id,
                 CASE
                     WHEN adj.total_to_subtract IS NOT NULL THEN
                     CASE
-                        WHEN rb.token_implementation::text = adj.original_token_implementation THEN rb.balance - adj.total_to_subtract
+                        WHEN rb.token_implementation_id = adj.origin_implementation_id THEN rb.balance - adj.total_to_subtract
                         ELSE rb.balance
                     END
                     ELSE rb.balance
                 END AS balance,
             rb.date
            FROM recent_balances rb
-             LEFT JOIN adjustments adj ON rb.token_implementation::text = adj.original_token_implementation
+             LEFT JOIN adjustments adj ON rb.token_implementation_id = adj.origin_implementation_id
         )
- SELECT ab.token_implementation,
+ SELECT ti.slug AS token_implementation,
     ab.balance,
     ab.date,
     ti.network,
@@ -44,7 +43,7 @@ AS WITH recent_balances AS (
     n.explorer,
     rank() OVER (ORDER BY ab.balance DESC) AS rank
    FROM adjusted_balances ab
-     JOIN token_implementations ti ON ab.token_implementation::text = ti.slug::text
+     JOIN token_implementations ti ON ab.token_implementation_id = ti.id
      JOIN networks n ON ti.network::text = n.slug::text
      JOIN tokens nt ON ti.token::text = nt.slug::text
   ORDER BY ab.balance DESC;
\ No newline at end of file
@@ -3,15 +3,12 @@
 
 CREATE OR REPLACE VIEW public.helper_current_supplies_by_tokenimpl_raw
 AS WITH recent_balances AS (
-         SELECT tb.token_implementation,
+         SELECT tb.token_implementation_id,
             tb.balance,
             tb.date
-           FROM token_balances tb
-          WHERE tb.date = (( SELECT max(inner_tb.date) AS max
-                   FROM token_balances inner_tb
-                  WHERE inner_tb.token_implementation::text = tb.token_implementation::text))
+           FROM token_balances_latest tb
         )
- SELECT rb.token_implementation,
+ SELECT ti.slug AS token_implementation,
     rb.balance,
     rb.date,
     ti.network,
@@ -24,7 +21,7 @@ AS WITH recent_balances AS (
     n.explorer,
     rank() OVER (ORDER BY rb.balance DESC) AS rank
    FROM recent_balances rb
-     JOIN token_implementations ti ON rb.token_implementation::text = ti.slug::text
+     JOIN token_implementations ti ON rb.token_implementation_id = ti.id
      JOIN networks n ON ti.network::text = n.slug::text
      JOIN tokens nt ON ti.token::text = nt.slug::text
   ORDER BY rb.balance DESC;
\ No newline at end of file
@@ -1,21 +1,15 @@
 -- public.helper_dependencies_bridges source
 -- Show bridge dependencies for each token implementation in order to adjust for double counting
+-- The graph itself is kept in bridge_edges, rebuilt whenever token_implementations or tokens change
 
 CREATE OR REPLACE VIEW public.helper_dependencies_bridges
-AS WITH origin_tokens AS (
-         SELECT ti.token AS token_slug,
-            ti.network_origin AS origin_network,
-            array_agg(ti.slug) AS tokens_to_subtract
-           FROM token_implementations ti
-          WHERE ti.network_origin IS NOT NULL AND ti.network_origin::text <> 'native'::text AND ti.token_address::text ~ '^[0-9].*'::text
-          GROUP BY ti.token, ti.network_origin
-        )
- SELECT nt.slug AS token_slug,
-    concat(nt.slug, '_', origin_tokens.origin_network) AS token_implementation,
+AS SELECT nt.slug AS token_slug,
+    be.origin_implementation::text AS token_implementation,
     nt.token_name,
     nt.type AS token_type,
-    origin_tokens.origin_network,
-    origin_tokens.tokens_to_subtract
-   FROM origin_tokens
-     JOIN tokens nt ON origin_tokens.token_slug::text = nt.slug::text
-  WHERE nt.depegged = false;
\ No newline at end of file
+    be.origin_network,
+    array_agg(bi.slug ORDER BY bi.slug) AS tokens_to_subtract
+   FROM bridge_edges be
+     JOIN token_implementations bi ON be.bridged_implementation_id = bi.id
+     JOIN tokens nt ON be.token::text = nt.slug::text
+  GROUP BY nt.slug, be.origin_implementation, nt.token_name, nt.type, be.origin_network;
\ No newline at end of file
@@ -1,9 +1,15 @@
 -- public.helper_reserves_summed source
 
 CREATE OR REPLACE VIEW public.helper_reserves_summed
-AS SELECT date,
-    derivative_token,
-    sum(balance) AS total_balance,
-    collateral_token
-   FROM reserve_balances
-  GROUP BY date, reserve_network, collateral_token, derivative_token;
\ No newline at end of file
+AS SELECT rs.date,
+    dt.slug AS derivative_token,
+    rs.total_balance,
+    ct.slug AS collateral_token
+   FROM ( SELECT reserve_balances.date,
+            reserve_balances.collateral_token_id,
+            reserve_balances.derivative_token_id,
+            sum(reserve_balances.balance) AS total_balance
+           FROM reserve_balances
+          GROUP BY reserve_balances.date, reserve_balances.reserve_network_id, reserve_balances.collateral_token_id, reserve_balances.derivative_token_id) rs
+     LEFT JOIN token_implementations dt ON rs.derivative_token_id = dt.id
+     LEFT JOIN token_implementations ct ON rs.collateral_token_id = ct.id;
\ No newline at end of file
@@ -1,4 +1,5 @@
 -- public.historical_supplies_by_tokenimpl source
+-- Current network and project ranks are kept in current_supply_ranks by refresh_current_supply_ranks()
 
 CREATE OR REPLACE VIEW public.historical_supplies_by_tokenimpl
 AS SELECT n.name AS network_name,
@@ -10,11 +11,11 @@ AS SELECT n.name AS network_name,
     nt.slug AS infra_slug,
     COALESCE(cs.rank, 0::bigint) AS network_rank,
     COALESCE(cp.rank, 0::bigint) AS project_rank
-   FROM helper_token_balances_adjusted tb
-     LEFT JOIN token_implementations ti ON tb.token_implementation::text = ti.slug::text
+   FROM token_balances_adjusted tb
+     LEFT JOIN token_implementations ti ON tb.token_implementation_id = ti.id
      LEFT JOIN networks n ON ti.network::text = n.slug::text
      LEFT JOIN tokens nt ON ti.token::text = nt.slug::text
-     LEFT JOIN current_supplies_by_network cs ON n.slug::text = cs.network_slug::text
-     LEFT JOIN current_supplies_by_tokenproject cp ON ti.token::text = cp.token_slug::text
+     LEFT JOIN current_supply_ranks cs ON cs.kind::text = 'network'::text AND n.slug::text = cs.slug::text
+     LEFT JOIN current_supply_ranks cp ON cp.kind::text = 'tokenproject'::text AND ti.token::text = cp.slug::text
   WHERE nt.depegged = false
   ORDER BY cp.rank DESC NULLS LAST, cs.rank DESC NULLS LAST, tb.date DESC;
\ No newline at end of file
@@ -2,52 +2,44 @@ from datetime import datetime, timedelta, timezone
 import logging
 from web3 import Web3
 import psycopg2
-import helpers
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import evm_rpc
+import http_client
+import fetch_pool
 
 log = logging.getLogger()
 log.setLevel("INFO")
 
 network_slug = 'BEVM'
 
-# ERC20 ABI snippet for totalSupply and decimals functions
-erc20_abi = [
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "totalSupply",
-        "outputs": [{"name": "", "type": "uint256"}],
-        "type": "function"
-    },
-    {
-        "constant": True,
-        "inputs": [],
-        "name": "decimals",
-        "outputs": [{"name": "", "type": "uint8"}],
-        "type": "function"
-    }
-]
+total_supply_function_data = Web3.keccak(text="totalSupply()")[:4].hex()
 
 
 def get_total_supply(token_address, decimals, bevm_rpc_url):
-    w3 = Web3(Web3.HTTPProvider(bevm_rpc_url))
+    response = evm_rpc.rpc_request(bevm_rpc_url, "eth_call", [
+        {"to": token_address, "data": "0x" + total_supply_function_data},
+        "latest"
+    ])
 
-    # Check if connected to the BEVM Mainnet
-    if not w3.is_connected():
-        raise Exception("Failed to connect to BEVM Mainnet")
+    if not response or not response.get('result') or response['result'] == '0x':
+        log.error(f"Error fetching supply for {token_address}: {response}")
+        return None
 
-    token_contract = w3.eth.contract(address=token_address, abi=erc20_abi)
-    total_supply = token_contract.functions.totalSupply().call()
+    total_supply = int(response['result'], 16)
     return total_supply / (10 ** decimals)
 
 
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     bevm_rpc_url = api_secret.get('RPC_BEVM')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
     reserves = network_config.get('network_reserves')
 
@@ -60,28 +52,32 @@ def lambda_handler(event, context):
     token_values = {}
     reserve_values = {}
 
-    for token in tokens:
+    # Fetch one token's supply, logging and skipping it on failure like the rest of the handler
+    def fetch_token(token):
         try:
             token_address = token.get('address')
             token_decimals = int(token.get('decimals')) if token.get('decimals') else None
             if not token_address:
                 log.warning(f"No token_address for {token['slug']}")
-                continue
+                return
 
             if not token_decimals:
                 log.warning(f"No token_decimals for {token['slug']}")
-                continue
+                return
 
             supply = get_total_supply(token_address, token_decimals, bevm_rpc_url)
             if not supply:
                 log.warning(f"Error fetching total supply for {token['slug']}")
-                continue
+                return
 
             log.info(f"{token['slug']} Total Supply: {supply} tokens")
             token_values[token['slug']] = supply
         except Exception as e:
             log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
+    # Fetch all tokens concurrently, capped per network
+    fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
     for reserve in reserves:
         try:
             reserve_address = reserve.get('address')
@@ -128,49 +124,13 @@ def lambda_handler(event, context):
         except Exception as e:
             log.error(f"[RESERVE] Error fetching total supply for {reserve['slug']}: {e}")
 
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     # Insert total supply values into database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day,
-                        supply
-                    ))
-                    conn.commit()
-
-                # Uncomment when we implement reserve balance fetches
-                # for reserve_slug, supply in reserve_values.items():
-                #     insert_query = """
-                #     INSERT INTO reserve_balances (reserve_implementation, date, balance)
-                #     VALUES (%s, %s, %s)
-                #     ON CONFLICT (reserve_implementation, date)
-                #     DO UPDATE SET balance = EXCLUDED.balance
-                #     """
-                #     cursor.execute(insert_query, (
-                #         reserve_slug,
-                #         day,
-                #         supply
-                #     ))
-                #     conn.commit()
+        db_writer.write_balances(conn, day, token_values)
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
-
-
-    finally:
-        conn.close()
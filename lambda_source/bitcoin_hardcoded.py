@@ -4,7 +4,11 @@ from datetime import datetime, timedelta, timezone
 import logging
 import psycopg2
 import requests
-import helpers
+import http_client
+import secrets_cache
+import db_writer
+import db_connection
+import fetch_pool
 
 # Setup logging
 log = logging.getLogger()
@@ -16,7 +20,7 @@ BLOCKSTREAM_API = "https://blockstream.info/api"
 def get_btc_balance(address):
     try:
         url = f'{BLOCKSTREAM_API}/address/{address}'
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
         data = response.json()
         balance = data['chain_stats']['funded_txo_sum'] - data['chain_stats']['spent_txo_sum']
@@ -29,8 +33,8 @@ def get_btc_balance(address):
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
 
     # Load slugs to track from network config (comma-separated string or list)
     target_slugs = "Simple-sBTC_Fractal"
@@ -51,13 +55,7 @@ def lambda_handler(event, context):
     token_values = {}
 
     # Query reserve_implementations across all networks
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
         with conn:
@@ -73,9 +71,11 @@ def lambda_handler(event, context):
 
                 reserves = cursor.fetchall()
 
-                for derivative_token, reserve_address in reserves:
+                # Fetch all reserve balances concurrently, capped per network, then sum them per token in order
+                balances = fetch_pool.fetch_all(lambda reserve: get_btc_balance(reserve[1]), reserves, 'bitcoin')
+
+                for (derivative_token, reserve_address), balance in zip(reserves, balances):
                     try:
-                        balance = get_btc_balance(reserve_address)
                         if balance is None:
                             log.warning(f"No balance fetched for {derivative_token} at {reserve_address}")
                             continue
@@ -86,25 +86,14 @@ def lambda_handler(event, context):
                     except Exception as e:
                         log.error(f"Error processing {reserve_address}: {e}")
 
-                # Insert aggregated balances into token_balances
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day,
-                        supply
-                    ))
-                    conn.commit()
+        # Insert aggregated balances into token_balances
+        db_writer.write_balances(conn, day, token_values)
 
     except psycopg2.Error as e:
         log.error(f"Database error: {e}")
 
-    finally:
-        conn.close()
+
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
 
     log.info("BTC Reserve Lambda completed.")
@@ -1,10 +1,13 @@
 from datetime import datetime, timezone, timedelta
 import time
 import logging
-from web3 import Web3
 import psycopg2
-import requests
-import helpers
+import http_client
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import evm_rpc
 
 # Setup logging
 log = logging.getLogger()
@@ -12,16 +15,10 @@ log.setLevel(logging.INFO)
 
 network_slug = 'Bitlayer'
 
-# Hardcoded ABI for the token contracts
-token_abi = [
-    {"inputs": [], "name": "totalSupply", "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"}
-]
-
-
 # Function to get the block number closest to the provided timestamp
 def get_block_by_timestamp(timestamp):
     try:
-        response = requests.get(f"https://api.btrscan.com/scan/api?module=block&action=getblocknobytime&timestamp={timestamp}&closest=before")
+        response = http_client.get(f"https://api.btrscan.com/scan/api?module=block&action=getblocknobytime&timestamp={timestamp}&closest=before")
         if response.status_code == 200:
             result = response.json()
             block_number = result.get('result', None)
@@ -37,26 +34,15 @@ def get_block_by_timestamp(timestamp):
         log.error(f"Exception during block fetch: {e}")
         return None
 
-# Function to call totalSupply() at a specific block
-def get_total_supply_at_block(block_number, token_address, token_decimals, bitlayer_rpc_url):
-    try:
-        web3 = Web3(Web3.HTTPProvider(bitlayer_rpc_url))
-        contract = web3.eth.contract(address=Web3.to_checksum_address(token_address), abi=token_abi)
-        total_supply = contract.functions.totalSupply().call(block_identifier=block_number)
-        return total_supply / (10 ** token_decimals)
-    except Exception as e:
-        log.error(f"Exception during totalSupply call: {e}")
-        return None
-
 # Lambda handler function
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     bitlayer_rpc_url = api_secret.get('RPC_BITLAYER')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
     reserves = network_config.get('network_reserves')
 
@@ -79,6 +65,7 @@ def lambda_handler(event, context):
         return
 
     token_values = {}
+    token_requests = {}
     reserve_values = {}
 
     for token in tokens:
@@ -93,17 +80,20 @@ def lambda_handler(event, context):
                 log.warning(f"No token_decimals for {token['slug']}")
                 continue
 
-            supply = get_total_supply_at_block(block_number, token_address, token_decimals, bitlayer_rpc_url)
-
-            if not supply:
-                log.warning(f"Error fetching total supply for {token['slug']}")
-                continue
-
-            log.info(f"{token['slug']} Total Supply: {supply} tokens")
-            token_values[token['slug']] = supply
+            token_requests[token['slug']] = (token_address, token_decimals)
         except Exception as e:
             log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
+    supplies = evm_rpc.get_total_supplies(token_requests, block_number, bitlayer_rpc_url)
+
+    for token_slug, supply in supplies.items():
+        if not supply:
+            log.warning(f"Error fetching total supply for {token_slug}")
+            continue
+
+        log.info(f"{token_slug} Total Supply: {supply} tokens")
+        token_values[token_slug] = supply
+
     for reserve in reserves:
         try:
             reserve_address = reserve.get('address')
@@ -150,49 +140,13 @@ def lambda_handler(event, context):
         except Exception as e:
             log.error(f"[RESERVE] Error fetching total supply for {reserve['slug']}: {e}")
 
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     # Insert total supply values into database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day.strftime('%Y-%m-%d'),
-                        supply
-                    ))
-                    conn.commit()
-
-                # Uncomment when we implement reserve balance fetches
-                # for reserve_slug, supply in reserve_values.items():
-                #     insert_query = """
-                #     INSERT INTO reserve_balances (reserve_implementation, date, balance)
-                #     VALUES (%s, %s, %s)
-                #     ON CONFLICT (reserve_implementation, date)
-                #     DO UPDATE SET balance = EXCLUDED.balance
-                #     """
-                #     cursor.execute(insert_query, (
-                #         reserve_slug,
-                #         day,
-                #         supply
-                #     ))
-                #     conn.commit()
+        db_writer.write_balances(conn, day, token_values)
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
-
-
-    finally:
-        conn.close()
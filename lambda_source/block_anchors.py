@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import psycopg2
+import db_connection
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Anchor files live under /tmp so they survive between invocations of a warm container
+ANCHOR_DIR = os.environ.get('BLOCK_ANCHOR_DIR', '/tmp/block_anchors')
+
+# Maximum number of learned (block_number, timestamp) pairs kept per network; pinned resolutions are never evicted
+MAX_ANCHORS = 2000
+
+# Anchor stores already loaded by this container, keyed by network slug
+stores = {}
+
+# Known blocks for one network: learned (block_number, timestamp) pairs that seed later
+# resolutions, and pinned timestamp -> block_number answers for day boundaries
+class AnchorStore:
+    def __init__(self, network_slug, blocks=None, pinned=None):
+        self.network_slug = network_slug
+        self.blocks = blocks or {}
+        self.pinned = pinned or {}
+        self.pinned_loaded = False
+
+    def path(self):
+        return os.path.join(ANCHOR_DIR, f"{self.network_slug}.json")
+
+    # Remember a block seen while resolving, evicting the oldest learned blocks beyond MAX_ANCHORS
+    def add(self, block_number, block_timestamp):
+        self.blocks.pop(block_number, None)
+        self.blocks[block_number] = block_timestamp
+        while len(self.blocks) > MAX_ANCHORS:
+            del self.blocks[next(iter(self.blocks))]
+
+    def known_blocks(self):
+        return self.blocks.items()
+
+    def save(self):
+        try:
+            os.makedirs(ANCHOR_DIR, exist_ok=True)
+            temp_path = self.path() + '.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump({
+                    'blocks': list(self.blocks.items()),
+                    'pinned': list(self.pinned.items()),
+                }, f)
+            os.replace(temp_path, self.path())
+        except OSError as e:
+            log.warning(f"Could not save block anchors for {self.network_slug}: {e}")
+
+# Load the anchor store for a network, from memory on warm containers or from the /tmp file
+def load(network_slug):
+    if network_slug in stores:
+        return stores[network_slug]
+
+    store = AnchorStore(network_slug)
+    try:
+        with open(store.path()) as f:
+            data = json.load(f)
+        store.blocks = {int(block_number): int(block_timestamp) for block_number, block_timestamp in data.get('blocks', [])}
+        store.pinned = {int(timestamp): int(block_number) for timestamp, block_number in data.get('pinned', [])}
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError) as e:
+        log.warning(f"Ignoring unreadable block anchors for {network_slug}: {e}")
+
+    stores[network_slug] = store
+    return store
+
+# Merge the day-boundary blocks persisted in the block_anchors table into the store, once per container
+def load_pinned(store, db_secret):
+    if store.pinned_loaded:
+        return
+
+    try:
+        with db_connection.get_connection(db_secret) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT timestamp, block_number FROM block_anchors WHERE network = %s", (store.network_slug,))
+                for timestamp, block_number in cursor.fetchall():
+                    store.pinned[int(timestamp)] = int(block_number)
+        store.pinned_loaded = True
+    except psycopg2.Error as e:
+        log.warning(f"Could not load pinned block anchors for {store.network_slug}: {e}")
+
+# Persist a day-boundary resolution so backfills and re-runs never resolve it again
+def save_pinned(store, timestamp, block_number, db_secret):
+    store.pinned[timestamp] = block_number
+
+    try:
+        with db_connection.get_connection(db_secret) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO block_anchors (network, timestamp, block_number)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (network, timestamp) DO NOTHING
+                """, (store.network_slug, timestamp, block_number))
+    except psycopg2.Error as e:
+        log.warning(f"Could not persist pinned block anchor for {store.network_slug}: {e}")
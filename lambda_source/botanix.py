@@ -1,9 +1,12 @@
 from datetime import datetime, timedelta, timezone
 import logging
-import psycopg2
-import requests
+import http_client
 import json
-import helpers
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import fetch_pool
 from web3 import Web3
 
 log = logging.getLogger()
@@ -26,7 +29,7 @@ def get_circulating_btx(wallet_addr, rpc_url):
             "params": [wallet_addr, "latest"],
             "id": 1
         }
-        response = requests.post(rpc_url, json=payload)
+        response = http_client.post(rpc_url, json=payload)
         result = response.json().get('result')
 
         if not result:
@@ -42,7 +45,7 @@ def get_circulating_btx(wallet_addr, rpc_url):
 
 def get_total_supply(token_address, decimals, rpc_url):
     try:
-        response = requests.post(rpc_url, json={
+        response = http_client.post(rpc_url, json={
             "jsonrpc": "2.0",
             "method": "eth_call",
             "params": [{
@@ -64,8 +67,8 @@ def get_total_supply(token_address, decimals, rpc_url):
 
 def lambda_handler(event, context):
     log.info("Botanix Lambda execution started.")
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     rpc_url = api_secret.get('RPC_BOTANIX')
     invocation_type = event.get('invocation_type', 'incremental')
 
@@ -74,47 +77,49 @@ def lambda_handler(event, context):
 
     log.info(f"UTC now: {utc_now.isoformat()} — inserting for: {now.isoformat()}")
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
 
-    with psycopg2.connect(
-        host=db_secret.get('host'),
-        database=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        port=db_secret.get('port')
-    ) as conn:
-        with conn.cursor() as cursor:
-            for token in tokens:
-                try:
-                    slug = token.get('slug')
-                    address = token.get('address')
-                    decimals = token.get('decimals')
-
-                    if not address or not decimals:
-                        log.warning(f"Skipping token {slug} due to missing address/decimals.")
-                        continue
-
-                    if slug == SPECIAL_TOKEN:
-                        supply = get_circulating_btx(SPECIAL_WALLET, rpc_url)
-                    else:
-                        supply = get_total_supply(address, decimals, rpc_url)
-
-                    if supply is not None:
-                        log.info(f"{slug} Total Supply: {supply}")
-                        cursor.execute("""
-                            INSERT INTO token_balances (token_implementation, date, balance)
-                            VALUES (%s, %s, %s)
-                            ON CONFLICT (token_implementation, date)
-                            DO UPDATE SET balance = EXCLUDED.balance
-                        """, (slug, now, supply))
-                    else:
-                        log.warning(f"No supply fetched for {slug}")
-
-                except Exception as e:
-                    log.error(f"Error processing {slug}: {e}")
-
-            conn.commit()
+    with db_connection.get_connection(db_secret) as conn:
+        # Fetch one token's supply; tokens missing an address or decimals are skipped below
+        def fetch_token(token):
+            try:
+                if not token.get('address') or not token.get('decimals'):
+                    return None
+                if token.get('slug') == SPECIAL_TOKEN:
+                    return get_circulating_btx(SPECIAL_WALLET, rpc_url)
+                return get_total_supply(token.get('address'), token.get('decimals'), rpc_url)
+            except Exception as e:
+                log.error(f"Error processing {token.get('slug')}: {e}")
+                return None
+
+        # Fetch all supplies concurrently, capped per network, before writing any of them
+        supplies = fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
+        token_values = {}
+        for token, supply in zip(tokens, supplies):
+            try:
+                slug = token.get('slug')
+                address = token.get('address')
+                decimals = token.get('decimals')
+
+                if not address or not decimals:
+                    log.warning(f"Skipping token {slug} due to missing address/decimals.")
+                    continue
+
+                if supply is not None:
+                    log.info(f"{slug} Total Supply: {supply}")
+                    token_values[slug] = supply
+                else:
+                    log.warning(f"No supply fetched for {slug}")
+
+            except Exception as e:
+                log.error(f"Error processing {slug}: {e}")
+
+        db_writer.write_balances(conn, now, token_values)
+
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
 
     log.info("Botanix Lambda completed.")
     return {"status": "success"}
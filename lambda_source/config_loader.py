@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# The loaded configuration is also kept under /tmp so a restarted container only needs the version check
+CACHE_FILE = os.environ.get('NETWORK_CONFIG_CACHE_FILE', '/tmp/network_config.json')
+
+# Bumped when the shape of the cached configuration changes, so files written by older code are reloaded
+CACHE_FORMAT = 2
+
+# Bumped by triggers on token_implementations and reserve_implementations, see database/tables/config_version.sql
+CONFIG_VERSION_QUERY = "SELECT version FROM config_version WHERE id = 1"
+
+# Every network's tokens and reserves with the version they belong to, in one statement so they are consistent
+ALL_NETWORKS_QUERY = """
+SELECT
+    (SELECT version FROM config_version WHERE id = 1),
+    (
+        SELECT COALESCE(json_agg(json_build_object(
+            'network', network,
+            'id', id,
+            'slug', slug,
+            'address', COALESCE(token_address, ''),
+            'decimals', COALESCE(token_decimals, ''),
+            'reserve_implementations', reserve_implementations
+        ) ORDER BY slug), '[]')
+        FROM token_implementations
+    ),
+    (
+        SELECT COALESCE(json_agg(json_build_object(
+            'network', ri.reserve_network,
+            'tag', ri.tag,
+            'slug', ri.slug,
+            'address', ri.reserve_address,
+            'id', ri.id,
+            'collateral_token', json_build_object(
+                'id', ct.id,
+                'slug', ri.collateral_token,
+                'address', COALESCE(ct.token_address, ''),
+                'decimals', COALESCE(ct.token_decimals, '')
+            ),
+            'derivative_token', json_build_object(
+                'id', dt.id,
+                'slug', ri.derivative_token,
+                'address', COALESCE(dt.token_address, ''),
+                'decimals', COALESCE(dt.token_decimals, '')
+            )
+        ) ORDER BY ri.id), '[]')
+        FROM reserve_implementations ri
+        LEFT JOIN token_implementations ct ON ct.slug = ri.collateral_token
+        LEFT JOIN token_implementations dt ON dt.slug = ri.derivative_token
+    ),
+    (SELECT COALESCE(json_object_agg(slug, id), '{}') FROM networks)
+"""
+
+# Configuration loaded by this container: {'format', 'version', 'networks': {network_slug: network config},
+# 'token_ids': {token implementation slug: id}, 'network_ids': {network slug: id}}
+cache = {}
+
+# Group the loaded rows by network in the shape of helpers.get_network_config
+def build_networks(tokens, reserves):
+    networks = {}
+    for token in tokens:
+        network = networks.setdefault(token.pop('network'), {'network_tokens': [], 'network_reserves': []})
+        network['network_tokens'].append(token)
+    for reserve in reserves:
+        network = networks.setdefault(reserve.pop('network'), {'network_tokens': [], 'network_reserves': []})
+        network['network_reserves'].append(reserve)
+    return networks
+
+def read_cache_file():
+    try:
+        with open(CACHE_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable network config cache: {e}")
+        return None
+
+def write_cache_file(config):
+    try:
+        temp_path = CACHE_FILE + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(config, f)
+        os.replace(temp_path, CACHE_FILE)
+    except OSError as e:
+        log.warning(f"Could not save network config cache: {e}")
+
+# Get every network's configuration, revalidated with one version read per call and reloaded in a
+# single query only when the version has moved since it was cached in memory or in CACHE_FILE
+def get_config(conn):
+    with conn:
+        with conn.cursor() as cursor:
+            cursor.execute(CONFIG_VERSION_QUERY)
+            row = cursor.fetchone()
+            version = row[0] if row else None
+
+            if version is not None and cache.get('version') == version:
+                return cache
+
+            cached = read_cache_file()
+            if version is not None and cached and cached.get('version') == version and cached.get('format') == CACHE_FORMAT:
+                log.info(f"Loaded network config version {version} from {CACHE_FILE}")
+                cache.clear()
+                cache.update(cached)
+                return cache
+
+            cursor.execute(ALL_NETWORKS_QUERY)
+            version, tokens, reserves, network_ids = cursor.fetchone()
+
+    cache.clear()
+    cache.update({
+        'format': CACHE_FORMAT,
+        'version': version,
+        'token_ids': {token['slug']: token['id'] for token in tokens},
+        'network_ids': network_ids,
+        'networks': build_networks(tokens, reserves),
+    })
+    write_cache_file(cache)
+    log.info(f"Loaded network config version {version}: {len(tokens)} tokens and {len(reserves)} reserves")
+    return cache
+
+# Get a network's tokens and reserves over an existing connection, in the same shape as
+# helpers.get_network_config plus the token implementation ids: {'network_tokens': [{id, slug, address, decimals,
+# reserve_implementations}], 'network_reserves': [{tag, slug, address, id, collateral_token: {id, slug, address,
+# decimals}, derivative_token: {...}}]}
+def get_network_config(network_slug, conn):
+    network = get_config(conn)['networks'].get(network_slug, {'network_tokens': [], 'network_reserves': []})
+    return {'network_tokens': list(network['network_tokens']), 'network_reserves': list(network['network_reserves'])}
+
+# Map token implementation and network slugs to their integer ids from the configuration this container has loaded,
+# revalidating it only when a slug is missing, e.g. an implementation added since it was cached. Returns
+# ({token implementation slug: id}, {network slug: id}) without the slugs that are still unknown.
+def resolve_ids(conn, token_slugs=(), network_slugs=()):
+    config = cache
+    missing = not config or (
+        any(slug not in config['token_ids'] for slug in token_slugs)
+        or any(slug not in config['network_ids'] for slug in network_slugs)
+    )
+    if missing:
+        config = get_config(conn)
+    token_ids = {slug: config['token_ids'][slug] for slug in token_slugs if slug in config['token_ids']}
+    network_ids = {slug: config['network_ids'][slug] for slug in network_slugs if slug in config['network_ids']}
+    return token_ids, network_ids
@@ -2,8 +2,12 @@ from datetime import datetime, timedelta, timezone
 import logging
 from web3 import Web3
 import psycopg2
-import requests
-import helpers
+import http_client
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import evm_rpc
 
 # Setup logging
 log = logging.getLogger()
@@ -11,15 +15,13 @@ log.setLevel(logging.INFO)
 
 network_slug = 'Core'
 
-# Load totalSupply function selector
-total_supply_function_data = Web3.keccak(text="totalSupply()")[:4].hex()
 decimals_function_data = Web3.keccak(text="decimals()")[:4].hex()
 
 # Fetch block number by timestamp from the CoreScan API
 def get_block_number_by_timestamp(timestamp, api_key_alt):
     try:
         url = f"https://openapi.coredao.org/api?module=block&action=getblocknobytime&timestamp={timestamp}&closest=before&apikey={api_key_alt}"
-        response = requests.get(url)
+        response = http_client.get(url)
         data = response.json()
 
         if data['status'] == '1':
@@ -31,40 +33,17 @@ def get_block_number_by_timestamp(timestamp, api_key_alt):
         log.error(f"Exception while fetching block number: {e}")
         return None
 
-# Fetch total supply for a given token and block
-def get_total_supply(token_address, block_identifier, token_decimals, core_rpc_url):
-    log.info(f"Fetching total supply for token: {token_address} at block: {block_identifier}")
-
-    # Fetch totalSupply
-    response = requests.post(core_rpc_url, json={
-        "jsonrpc": "2.0",
-        "method": "eth_call",
-        "params": [{
-            "to": token_address,
-            "data": "0x" + total_supply_function_data
-        }, hex(block_identifier)],
-        "id": 1
-    }).json()
-
-    if 'result' not in response:
-        log.error(f"Error fetching total supply for {token_address}: {response}")
-        return None
-
-    total_supply = int(response['result'], 16)
-
-    return total_supply / (10 ** token_decimals)
-
 # Lambda handler function
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     api_key = api_secret.get('API_KEY_ANKR')
     api_key_alt = api_secret.get('API_KEY_CORE')
     core_rpc_url = api_secret.get('RPC_CORE')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
     reserves = network_config.get('network_reserves')
 
@@ -86,6 +65,7 @@ def lambda_handler(event, context):
         return
 
     token_values = {}
+    token_requests = {}
     reserve_values = {}
 
     for token in tokens:
@@ -100,17 +80,20 @@ def lambda_handler(event, context):
                 log.warning(f"No token_decimals for {token['slug']}")
                 continue
 
-            supply = get_total_supply(token_address, block_number, token_decimals, core_rpc_url)
-
-            if not supply:
-                log.warning(f"Error fetching total supply for {token['slug']}")
-                continue
-
-            log.info(f"{token['slug']} Total Supply: {supply} tokens")
-            token_values[token['slug']] = supply
+            token_requests[token['slug']] = (token_address, token_decimals)
         except Exception as e:
             log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
+    supplies = evm_rpc.get_total_supplies(token_requests, block_number, core_rpc_url)
+
+    for token_slug, supply in supplies.items():
+        if not supply:
+            log.warning(f"Error fetching total supply for {token_slug}")
+            continue
+
+        log.info(f"{token_slug} Total Supply: {supply} tokens")
+        token_values[token_slug] = supply
+
     for reserve in reserves:
         try:
             reserve_address = reserve.get('address')
@@ -157,49 +140,13 @@ def lambda_handler(event, context):
         except Exception as e:
             log.error(f"[RESERVE] Error fetching total supply for {reserve['slug']}: {e}")
 
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     # Insert total supply values into database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day,
-                        supply
-                    ))
-                    conn.commit()
-
-                # Uncomment when we implement reserve balance fetches
-                # for reserve_slug, supply in reserve_values.items():
-                #     insert_query = """
-                #     INSERT INTO reserve_balances (reserve_implementation, date, balance)
-                #     VALUES (%s, %s, %s)
-                #     ON CONFLICT (reserve_implementation, date)
-                #     DO UPDATE SET balance = EXCLUDED.balance
-                #     """
-                #     cursor.execute(insert_query, (
-                #         reserve_slug,
-                #         day,
-                #         supply
-                #     ))
-                #     conn.commit()
+        db_writer.write_balances(conn, day, token_values)
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
-
-
-    finally:
-        conn.close()
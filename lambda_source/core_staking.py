@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta, timezone
 import logging
 import psycopg2
-import requests
-import helpers
+import http_client
+import secrets_cache
+import db_writer
+import db_connection
 
 # Setup logging
 log = logging.getLogger()
@@ -14,7 +16,7 @@ core_staking_api_url = 'https://staking-api.coredao.org/staking/summary/overall'
 def get_staked_btc():
     log.info("Fetching staked BTC amount from Core Staking API")
     
-    response = requests.get(core_staking_api_url, headers={'Accept': 'application/json'})
+    response = http_client.get(core_staking_api_url, headers={'Accept': 'application/json'})
     response.raise_for_status()
     
     data = response.json()
@@ -29,8 +31,7 @@ def get_staked_btc():
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
     
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    db_secret = secrets_cache.get_db_secret()
     
     if invocation_type == 'incremental':
         day = datetime.now(timezone.utc).date()
@@ -46,31 +47,15 @@ def lambda_handler(event, context):
         
         log.info(f"Staked BTC: {staked_btc} BTC")
         
-        conn = psycopg2.connect(
-            dbname=db_secret.get('dbname'),
-            user=db_secret.get('username'),
-            password=db_secret.get('password'),
-            host=db_secret.get('host'),
-            port=db_secret.get('port')
-        )
+        # Log per-host HTTP statistics for this invocation
+        http_client.log_stats()
+
+        conn = db_connection.get_connection(db_secret)
         
-        with conn:
-            with conn.cursor() as cursor:
-                insert_query = """
-                INSERT INTO token_balances (token_implementation, date, balance)
-                VALUES ('Core-stakedBTC_staking', %s, %s)
-                ON CONFLICT (token_implementation, date)
-                DO UPDATE SET balance = EXCLUDED.balance
-                """
-                cursor.execute(insert_query, (day, staked_btc))
-                conn.commit()
+        db_writer.write_balances(conn, day, {'Core-stakedBTC_staking': staked_btc})
         
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
     
     except Exception as e:
         log.error(f"Unexpected error: {e}")
-    
-    finally:
-        if 'conn' in locals():
-            conn.close()
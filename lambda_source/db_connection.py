@@ -0,0 +1,91 @@
+import logging
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+import secrets_cache
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# A cached connection idle for longer than this is checked with a round trip before it is handed out again
+VALIDATE_AFTER_IDLE_SECONDS = 30
+
+# Connection settings: fail fast on unreachable hosts and let TCP keepalives detect dead peers between invocations
+CONNECT_TIMEOUT = 10
+KEEPALIVE_SETTINGS = {
+    'keepalives': 1,
+    'keepalives_idle': 60,
+    'keepalives_interval': 10,
+    'keepalives_count': 3,
+}
+
+# One connection per database per container, with the time it was last handed out
+connections = {}
+lock = threading.Lock()
+
+def connect(db_secret):
+    return psycopg2.connect(
+        dbname=db_secret.get('dbname'),
+        user=db_secret.get('username'),
+        password=db_secret.get('password'),
+        host=db_secret.get('host'),
+        port=db_secret.get('port'),
+        connect_timeout=CONNECT_TIMEOUT,
+        **KEEPALIVE_SETTINGS
+    )
+
+# Rotated credentials show up as a failed login
+def is_auth_failure(error):
+    return 'authentication failed' in str(error)
+
+# Open a connection, refetching the database secret once if the login is rejected
+def connect_or_refresh(db_secret):
+    try:
+        return connect(db_secret)
+    except psycopg2.OperationalError as e:
+        if not is_auth_failure(e):
+            raise
+        log.warning("Database authentication failed, refreshing the database secret")
+        return connect(secrets_cache.get_db_secret(force_refresh=True))
+
+# Check a cached connection is still usable, rolling back anything a failed invocation left open
+def is_usable(conn):
+    if conn.closed:
+        return False
+    try:
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error as e:
+        log.warning(f"Discarding cached database connection: {e}")
+        return False
+
+# Get the container's connection to the database in db_secret, reusing it across warm invocations.
+# It is validated before reuse when it has been idle or left mid-transaction, and replaced if it is broken.
+# Callers must not close it; use `with conn:` for transactions as before.
+def get_connection(db_secret):
+    key = (db_secret.get('host'), db_secret.get('port'), db_secret.get('dbname'), db_secret.get('username'))
+    with lock:
+        conn, last_used = connections.get(key, (None, 0))
+        now = time.monotonic()
+
+        if conn is not None:
+            idle = now - last_used > VALIDATE_AFTER_IDLE_SECONDS
+            if conn.closed or ((idle or conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE) and not is_usable(conn)):
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+                conn = None
+
+        if conn is None:
+            log.info(f"Opening database connection to {db_secret.get('host')}")
+            conn = connect_or_refresh(db_secret)
+
+        connections[key] = (conn, now)
+        return conn
@@ -0,0 +1,339 @@
+import logging
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, ROUND_HALF_UP
+import psycopg2
+from psycopg2.extras import execute_values
+import config_loader
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Scale of the numeric(20, 8) balance columns
+BALANCE_SCALE = Decimal('0.00000001')
+
+# Staging tables live for the session and are emptied at every commit, so reused connections don't recreate them
+CREATE_STAGED_TOKEN_BALANCES = """
+CREATE TEMP TABLE IF NOT EXISTS staged_token_balances (
+    token_implementation_id int4,
+    date date,
+    balance numeric(20, 8)
+) ON COMMIT DELETE ROWS
+"""
+
+CREATE_STAGED_RESERVE_BALANCES = """
+CREATE TEMP TABLE IF NOT EXISTS staged_reserve_balances (
+    date date,
+    balance numeric(20, 8),
+    reserve_implementation_id int4,
+    reserve_network_id int4,
+    collateral_token_id int4,
+    derivative_token_id int4,
+    reserve_address varchar(255)
+) ON COMMIT DELETE ROWS
+"""
+
+# Last known balances for a run's rows, preloaded in one query per table. The known flag marks rows whose
+# implementation exists in the config tables; balance is NULL when the row has not been written yet.
+KNOWN_TOKEN_BALANCES = """
+SELECT k.token_implementation_id, ti.id IS NOT NULL AS known, t.balance
+FROM (VALUES %s) AS k(token_implementation_id, date)
+LEFT JOIN token_implementations ti ON ti.id = k.token_implementation_id
+LEFT JOIN token_balances t
+    ON t.token_implementation_id = k.token_implementation_id
+    AND t.date = k.date
+"""
+
+KNOWN_RESERVE_BALANCES = """
+SELECT
+    k.reserve_network_id,
+    k.reserve_address,
+    k.collateral_token_id,
+    k.derivative_token_id,
+    k.reserve_implementation_id IS NULL OR ri.id IS NOT NULL AS known,
+    r.balance
+FROM (VALUES %s) AS k(date, reserve_implementation_id, reserve_network_id, reserve_address, collateral_token_id, derivative_token_id)
+LEFT JOIN reserve_implementations ri ON ri.id = k.reserve_implementation_id
+LEFT JOIN reserve_balances r
+    ON r.date = k.date
+    AND r.reserve_network_id = k.reserve_network_id
+    AND r.reserve_address = k.reserve_address
+    AND r.collateral_token_id = k.collateral_token_id
+    AND r.derivative_token_id = k.derivative_token_id
+"""
+
+# One set-based upsert per table, returning the unique key of every row it wrote. Partitioned tables cannot return
+# system columns such as xmax, so inserted and updated rows are told apart from the preloaded balances.
+# Conflicting rows are only rewritten when the balance moved, so unchanged rows leave no dead tuple or WAL behind.
+# Rows for implementations missing from the config tables are left out rather than failing the whole batch.
+UPSERT_TOKEN_BALANCES = """
+INSERT INTO token_balances (token_implementation_id, date, balance)
+SELECT token_implementation_id, date, balance
+FROM staged_token_balances s
+WHERE EXISTS (SELECT 1 FROM token_implementations ti WHERE ti.id = s.token_implementation_id)
+ON CONFLICT (token_implementation_id, date)
+DO UPDATE SET balance = EXCLUDED.balance
+WHERE token_balances.balance IS DISTINCT FROM EXCLUDED.balance
+RETURNING token_implementation_id
+"""
+
+UPSERT_RESERVE_BALANCES = """
+INSERT INTO reserve_balances (
+    date,
+    balance,
+    reserve_implementation_id,
+    reserve_network_id,
+    collateral_token_id,
+    derivative_token_id,
+    reserve_address
+)
+SELECT
+    date,
+    balance,
+    reserve_implementation_id,
+    reserve_network_id,
+    collateral_token_id,
+    derivative_token_id,
+    reserve_address
+FROM staged_reserve_balances s
+WHERE s.reserve_implementation_id IS NULL
+    OR EXISTS (SELECT 1 FROM reserve_implementations ri WHERE ri.id = s.reserve_implementation_id)
+ON CONFLICT (
+    date,
+    reserve_network_id,
+    reserve_address,
+    collateral_token_id,
+    derivative_token_id
+)
+DO UPDATE SET balance = EXCLUDED.balance
+WHERE reserve_balances.balance IS DISTINCT FROM EXCLUDED.balance
+RETURNING reserve_network_id, reserve_address, collateral_token_id, derivative_token_id
+"""
+
+# Recompute the materialized historical supply aggregates for the given dates, limited to the network and token
+# project totals the given implementations feed, see database/tables/historical_supplies_materialized.sql
+REFRESH_HISTORICAL_SUPPLIES = "SELECT refresh_historical_supplies(%s::date[], %s::int4[])"
+
+# Recompute the period changes read by the top gainers views as of a closed day for the given implementations,
+# see database/tables/top_gainers_snapshot.sql
+REFRESH_TOP_GAINERS_SNAPSHOT = "SELECT refresh_top_gainers_snapshot(%s::date, %s::int4[])"
+
+# Reconcile the given implementations' current supply against their reserves, or every implementation for NULL,
+# see database/tables/current_by_tokenimpl_materialized.sql
+REFRESH_CURRENT_BY_TOKENIMPL = "SELECT refresh_current_by_tokenimpl(%s::int4[])"
+
+# Re-rank networks and token projects by current supply, see database/tables/current_supply_ranks.sql
+REFRESH_CURRENT_SUPPLY_RANKS = "SELECT refresh_current_supply_ranks()"
+
+# Monthly partitions of token_balances and reserve_balances from a date's month through the months ahead,
+# see database/tables/balance_partitions.sql
+CREATE_BALANCE_PARTITIONS = "SELECT create_balance_partitions(%s::date)"
+
+# First days of the months this container has already created partitions for
+partition_months = set()
+
+# Balances as stored in numeric(20, 8) columns, so fetched values compare equal to the ones about to be written
+def to_numeric(balance):
+    if balance is None:
+        return None
+    return Decimal(str(balance)).quantize(BALANCE_SCALE, rounding=ROUND_HALF_UP)
+
+# Map each row's key to (known, last balance) with one query; key_size is the number of leading key columns returned
+def load_known_balances(cursor, query, keys, template, key_size):
+    rows = execute_values(cursor, query, keys, template=template, page_size=1000, fetch=True)
+    return {tuple(row[:key_size]): (row[key_size], row[key_size + 1]) for row in rows}
+
+# Drop rows whose balance matches the last known one, stage the rest with execute_values and apply one upsert.
+# rows maps each unique key, in the column order upsert_query returns it, to its staged row with the balance at balance_index.
+# Returns {'inserted', 'updated', 'skipped'} counts, where skipped rows were not written because nothing changed.
+def upsert(cursor, create_query, staged_table, rows, known_balances, balance_index, upsert_query):
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    changed = []
+    unknown = 0
+    for key, row in rows.items():
+        known, last_balance = known_balances.get(key, (False, None))
+        if not known:
+            unknown += 1
+        elif last_balance is not None and to_numeric(last_balance) == to_numeric(row[balance_index]):
+            counts['skipped'] += 1
+        else:
+            changed.append(row)
+
+    if unknown:
+        log.warning(f"Skipped {unknown} rows in {staged_table} for unknown implementations")
+    if not changed:
+        return counts
+
+    cursor.execute(create_query)
+    execute_values(cursor, f"INSERT INTO {staged_table} VALUES %s", changed, page_size=1000)
+
+    cursor.execute(upsert_query)
+    written = cursor.fetchall()
+    for key in written:
+        counts['inserted' if known_balances[key][1] is None else 'updated'] += 1
+
+    # Rows another writer brought up to date since the preload are filtered by the upsert itself
+    counts['skipped'] += len(changed) - len(written)
+    return counts
+
+# Refresh the historical supply aggregates for dates whose token balances changed, for the networks and token projects
+# of the implementations written. Runs after the write has committed; a failure is logged and left for the next
+# write of the same date and implementations or a full refresh to repair.
+def refresh_history(conn, days, implementation_ids):
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(REFRESH_HISTORICAL_SUPPLIES, (list(days), list(implementation_ids)))
+        log.info(f"Refreshed historical supplies for {', '.join(str(day) for day in days)}")
+    except psycopg2.Error as e:
+        log.error(f"Error refreshing historical supplies: {e}")
+
+# Refresh the top gainers snapshot after a final run has closed a day, for the implementations it wrote. Runs after
+# the write has committed; a failure is logged and the views keep the previous day's snapshot for those implementations.
+def refresh_top_gainers(conn, day, implementation_ids):
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(REFRESH_TOP_GAINERS_SNAPSHOT, (day, list(implementation_ids)))
+        log.info(f"Refreshed top gainers snapshot as of {day} for {len(implementation_ids)} implementations")
+    except psycopg2.Error as e:
+        log.error(f"Error refreshing top gainers snapshot: {e}")
+
+# Refresh the current supply and reserve reconciliation for the implementations written, or rebuild it for all of them
+# when implementation_ids is None, then the current supply ranks. Runs after the write has committed; a failure is
+# logged and the next run's refresh or final rebuild catches up.
+def refresh_current(conn, implementation_ids=None):
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    REFRESH_CURRENT_BY_TOKENIMPL,
+                    (None if implementation_ids is None else list(implementation_ids),)
+                )
+                cursor.execute(REFRESH_CURRENT_SUPPLY_RANKS)
+        scope = 'all' if implementation_ids is None else len(implementation_ids)
+        log.info(f"Refreshed current supply and reserve reconciliation for {scope} implementations and supply ranks")
+    except psycopg2.Error as e:
+        log.error(f"Error refreshing current supply and reserve reconciliation and supply ranks: {e}")
+
+# Make sure the partitions for a date exist before writing it, checked once per month per container. Runs in its
+# own short transaction so concurrent writers only wait on each other while a partition is actually being created.
+# A failure is logged; the write itself then fails if the partition is really missing.
+def ensure_partitions(conn, day):
+    # Some handlers pass a datetime; key by the month alone so its time of day never misses the cache
+    month = date(day.year, day.month, 1)
+    if month in partition_months:
+        return
+    try:
+        with conn:
+            with conn.cursor() as cursor:
+                cursor.execute(CREATE_BALANCE_PARTITIONS, (day,))
+                created = cursor.fetchone()[0]
+        if created:
+            log.info(f"Created {created} balance partitions from {month}")
+        partition_months.add(month)
+    except psycopg2.Error as e:
+        log.error(f"Error creating balance partitions: {e}")
+
+# Write a run's token supplies and reserve balances for a date (a date or datetime) in a single transaction.
+# token_values maps token implementation slug -> balance; reserve_values maps reserve implementation id ->
+# {'balance', 'reserve_network', 'collateral_token', 'derivative_token', 'reserve_address'}, as built by the handlers.
+# Slugs are resolved to ids with config_loader; rows naming an unknown network or implementation are skipped.
+# Returns per-table {'inserted', 'updated', 'skipped'} counts. Database errors propagate after rolling back.
+# The date's month partitions are created first if this container has not seen that month yet.
+# When token balances changed, the historical supply aggregates for the date are refreshed afterwards.
+# A final run writing the previous UTC day also refreshes the top gainers snapshot for its implementations.
+# Runs that changed balances end by refreshing the current supply and reserve reconciliation for the implementations
+# they wrote, and the supply ranks; final runs with balances rebuild the reconciliation for every implementation.
+def write_balances(conn, day, token_values=None, reserve_values=None):
+    # Some handlers pass a datetime; the date alone is what gets written and compared against the closed day below
+    if isinstance(day, datetime):
+        day = day.date()
+    token_values = token_values or {}
+    reserve_values = reserve_values or {}
+
+    # The tables are keyed by integer ids; resolve the slugs the handlers pass from the cached network config
+    token_ids, network_ids = config_loader.resolve_ids(
+        conn,
+        set(token_values) | {
+            balance_data[column] for balance_data in reserve_values.values()
+            for column in ('collateral_token', 'derivative_token')
+        },
+        {balance_data['reserve_network'] for balance_data in reserve_values.values()},
+    )
+
+    token_rows = {}
+    for token_slug, balance in token_values.items():
+        if token_slug not in token_ids:
+            log.warning(f"Skipped token balance for unknown implementation {token_slug}")
+            continue
+        token_rows[(token_ids[token_slug],)] = (token_ids[token_slug], day, balance)
+
+    # Later rows win on a duplicate unique key, as they did with row-by-row upserts
+    reserve_rows = {}
+    for reserve_implementation_id, balance_data in reserve_values.items():
+        reserve_network_id = network_ids.get(balance_data['reserve_network'])
+        collateral_token_id = token_ids.get(balance_data['collateral_token'])
+        derivative_token_id = token_ids.get(balance_data['derivative_token'])
+        if None in (reserve_network_id, collateral_token_id, derivative_token_id):
+            log.warning(f"Skipped reserve balance {reserve_implementation_id} with an unknown network or token implementation")
+            continue
+        key = (reserve_network_id, balance_data['reserve_address'], collateral_token_id, derivative_token_id)
+        reserve_rows[key] = (
+            day,
+            balance_data['balance'],
+            reserve_implementation_id,
+            reserve_network_id,
+            collateral_token_id,
+            derivative_token_id,
+            balance_data['reserve_address'],
+        )
+
+    ensure_partitions(conn, day)
+
+    with conn:
+        with conn.cursor() as cursor:
+            known_token_balances = load_known_balances(
+                cursor, KNOWN_TOKEN_BALANCES, [(token_id, day) for (token_id,) in token_rows],
+                '(%s::int4, %s::date)', 1
+            ) if token_rows else {}
+            known_reserve_balances = load_known_balances(
+                cursor, KNOWN_RESERVE_BALANCES,
+                [(day, row[2], row[3], row[6], row[4], row[5]) for row in reserve_rows.values()],
+                '(%s::date, %s::int4, %s::int4, %s, %s::int4, %s::int4)', 4
+            ) if reserve_rows else {}
+
+            counts = {
+                'token_balances': upsert(
+                    cursor, CREATE_STAGED_TOKEN_BALANCES, 'staged_token_balances', token_rows,
+                    known_token_balances, 2, UPSERT_TOKEN_BALANCES
+                ),
+                'reserve_balances': upsert(
+                    cursor, CREATE_STAGED_RESERVE_BALANCES, 'staged_reserve_balances', reserve_rows,
+                    known_reserve_balances, 1, UPSERT_RESERVE_BALANCES
+                ),
+            }
+
+    for table, table_counts in counts.items():
+        if any(table_counts.values()):
+            log.info(
+                f"{table} for {day}: {table_counts['inserted']} inserted, "
+                f"{table_counts['updated']} updated, {table_counts['skipped']} skipped as unchanged"
+            )
+
+    # Historical aggregates only need recomputing for a date whose balances changed
+    if counts['token_balances']['inserted'] or counts['token_balances']['updated']:
+        refresh_history(conn, [day], [token_id for (token_id,) in token_rows])
+
+    # Unchanged balances still move the snapshot's as-of day forward, so this does not depend on the counts
+    final_run = day == datetime.now(timezone.utc).date() - timedelta(days=1)
+    if token_rows and final_run:
+        refresh_top_gainers(conn, day, [token_id for (token_id,) in token_rows])
+
+    # A reserve balance feeds its derivative token's row; a full rebuild also picks up config changes
+    changed = any(table_counts['inserted'] or table_counts['updated'] for table_counts in counts.values())
+    if final_run and (token_rows or reserve_rows):
+        refresh_current(conn)
+    elif changed:
+        refresh_current(conn, {token_id for (token_id,) in token_rows} | {row[5] for row in reserve_rows.values()})
+    return counts
@@ -1,93 +1,29 @@
 from datetime import datetime, timedelta, timezone
 import logging
-from web3 import Web3
 import psycopg2
-import requests
-import helpers
-from alchemy import Alchemy, Network
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import evm_rpc
+import http_client
+import evm_blocks
 
 # Setup logging
 log = logging.getLogger()
 log.setLevel(logging.INFO)
 
 network_slug = 'Ethereum'
-alchemy_network = Network.ETH_MAINNET
-
-# Load totalSupply function selector
-total_supply_function_data = Web3.keccak(text="totalSupply()")[:4].hex()
-
-# Get block number based on timestamp using binary search
-def get_block_by_timestamp(timestamp, eth_rpc_url):
-    lower_bound = 0
-    upper_bound = int(requests.post(eth_rpc_url, json={
-        "jsonrpc": "2.0",
-        "method": "eth_blockNumber",
-        "params": [],
-        "id": 1
-    }).json().get('result', '0x0'), 16)
-
-    while lower_bound <= upper_bound:
-        mid_point = (lower_bound + upper_bound) // 2
-        response = requests.post(eth_rpc_url, json={
-            "jsonrpc": "2.0",
-            "method": "eth_getBlockByNumber",
-            "params": [hex(mid_point), False],
-            "id": 1
-        }).json()
-
-        block = response['result']
-        block_timestamp = int(block['timestamp'], 16)
-
-        if block_timestamp < timestamp:
-            lower_bound = mid_point + 1
-        elif block_timestamp > timestamp:
-            upper_bound = mid_point - 1
-        else:
-            return mid_point
-    return upper_bound
-
-# Fetch total supply for a given token and block
-def get_total_supply(token_address, block_identifier, decimals, eth_rpc_url):
-    log.info(f"Fetching total supply for token: {token_address} at block: {block_identifier}")
-
-    response = requests.post(eth_rpc_url, json={
-        "jsonrpc": "2.0",
-        "method": "eth_call",
-        "params": [{
-            "to": token_address,
-            "data": "0x" + total_supply_function_data
-        }, hex(block_identifier)],
-        "id": 1
-    }).json()
-
-    if 'result' not in response:
-        log.error(f"Error fetching total supply for {token_address}: {response}")
-        return None
-
-    total_supply = int(response['result'], 16)
-    return total_supply / (10 ** decimals)
-
-# Fetch total supply for a given reserve
-def get_reserve_supply(alchemy, reserve_slug, reserve_address, collateral_token_address, decimals):
-    try:
-        collateral_balance = alchemy.core.get_token_balances(address=reserve_address, data=[collateral_token_address])
-        total_supply = int(collateral_balance.get('token_balances')[0].token_balance, 16)
-        return total_supply / (10 ** int(decimals))
-    except Exception as e:
-        log.error(f"Error fetching total supply for {reserve_slug}: {e}")
 
 # Lambda handler function
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     eth_rpc_url = api_secret.get('RPC_ETHEREUM')
 
-    api_key = api_secret.get('API_KEY_ALCHEMY')
-    alchemy = Alchemy(api_key, alchemy_network, max_retries=3) 
-
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
     reserves = network_config.get('network_reserves')
 
@@ -101,14 +37,17 @@ def lambda_handler(event, context):
         day = datetime.now(timezone.utc).date() - timedelta(days=1)
         timestamp = int(datetime.combine(day, datetime.max.time(), tzinfo=timezone.utc).timestamp())  # 23:59:59 UTC
 
-    block_number = get_block_by_timestamp(timestamp, eth_rpc_url)
+    block_number = evm_blocks.get_block_by_timestamp(timestamp, eth_rpc_url, network_slug, pin=invocation_type != 'incremental', db_secret=db_secret)
 
     if not block_number:
         log.error(f"Could not fetch block for {day}")
         return
 
     token_values = {}
+    token_requests = {}
     reserve_values = {}
+    reserve_requests = {}
+    pending_reserves = {}
 
     for token in tokens:
         try:
@@ -122,14 +61,7 @@ def lambda_handler(event, context):
                 log.warning(f"No token_decimals for {token['slug']}")
                 continue
 
-            supply = get_total_supply(token_address, block_number, token_decimals, eth_rpc_url)
-
-            if not supply:
-                log.warning(f"Error fetching total supply for {token['slug']}")
-                continue
-
-            log.info(f"{token['slug']} Total Supply: {supply} tokens")
-            token_values[token['slug']] = supply
+            token_requests[token['slug']] = (token_address, token_decimals)
         except Exception as e:
             log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
@@ -156,84 +88,43 @@ def lambda_handler(event, context):
                 log.warning(f"No collateral_token_decimals for {reserve_slug}")
                 continue
 
-            supply = get_reserve_supply(alchemy, reserve_slug, reserve_address, collateral_token_address, collateral_token_decimals)
-
-            if not supply:
-                log.warning(f"Error fetching total supply for {reserve_slug}")
-                continue
-
-            reserve_values[reserve_implementation_id] = {
-                'balance': supply,
+            reserve_requests[reserve_slug] = (collateral_token_address, reserve_address, collateral_token_decimals)
+            pending_reserves[reserve_slug] = (reserve_implementation_id, {
                 'reserve_network': network_slug,
                 'collateral_token': collateral_token.get('slug'),
                 'derivative_token': derivative_token.get('slug'),
                 'reserve_address': reserve_address,
-            }
+            })
 
         except Exception as e:
             log.error(f"[RESERVE] Error fetching total supply for {reserve['slug']}: {e}")
 
+    # Read all supplies and reserve balances together so they are consistent at the same block
+    supplies, reserve_balances = evm_rpc.get_balances_at_block(token_requests, reserve_requests, block_number, eth_rpc_url)
+
+    for token_slug, supply in supplies.items():
+        if not supply:
+            log.warning(f"Error fetching total supply for {token_slug}")
+            continue
+
+        log.info(f"{token_slug} Total Supply: {supply} tokens")
+        token_values[token_slug] = supply
+
+    for reserve_slug, supply in reserve_balances.items():
+        if not supply:
+            log.warning(f"Error fetching total supply for {reserve_slug}")
+            continue
+
+        reserve_implementation_id, balance_data = pending_reserves[reserve_slug]
+        reserve_values[reserve_implementation_id] = {'balance': supply, **balance_data}
+
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     # Insert total supply values into database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day,
-                        supply
-                    ))
-                    conn.commit()
-
-                for reserve_implementation_id, balance_data in reserve_values.items():
-                    insert_query = """
-                    INSERT INTO reserve_balances (
-                        date, 
-                        balance, 
-                        reserve_implementation_id, 
-                        reserve_network, 
-                        collateral_token, 
-                        derivative_token, 
-                        reserve_address
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (
-                        date, 
-                        reserve_network, 
-                        reserve_address, 
-                        collateral_token, 
-                        derivative_token
-                    )
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        day,
-                        balance_data['balance'],
-                        reserve_implementation_id,
-                        balance_data['reserve_network'],
-                        balance_data['collateral_token'],
-                        balance_data['derivative_token'],
-                        balance_data['reserve_address']
-                    ))
-                    conn.commit()
+        db_writer.write_balances(conn, day, token_values, reserve_values)
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
-
-
-    finally:
-        conn.close()
-
@@ -0,0 +1,128 @@
+import logging
+import math
+import block_anchors
+import evm_rpc
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Number of blocks below the tip sampled to estimate a chain's average block time
+BLOCK_TIME_SAMPLE_SIZE = 10_000
+
+# Consecutive probes allowed to leave more than half of the search range before falling back to bisection
+MAX_SLOW_STEPS = 2
+
+# Find the last block with a timestamp at or before the given timestamp.
+# fetch_block(block_identifier) takes a block number or 'latest' and returns (block_number, block_timestamp).
+# The first guess is interpolated from the chain's observed average block time, then refined with
+# galloping and secant steps, so a resolution usually costs 4-6 fetches instead of ~25 for a bisection from block 0.
+# known_blocks is an optional iterable of (block_number, block_timestamp) pairs seen before; the search
+# starts from the tightest bracket they give, skipping the tip and sample fetches when it can.
+# Returns None if the timestamp is before the first block.
+def find_block_by_timestamp(timestamp, fetch_block, sample_size=BLOCK_TIME_SAMPLE_SIZE, known_blocks=()):
+    # lower is the latest known block at or before the timestamp, upper the earliest known block after it
+    lower, upper = None, None
+    for block in known_blocks:
+        if block[1] <= timestamp:
+            if lower is None or block[0] > lower[0]:
+                lower = block
+        elif upper is None or block[0] < upper[0]:
+            upper = block
+
+    # Without a known block after the timestamp the chain tip is the only upper bound
+    if upper is None:
+        latest = fetch_block('latest')
+        if latest[1] <= timestamp:
+            return latest[0]
+        upper = latest
+
+    if lower is None:
+        sample = fetch_block(max(upper[0] - sample_size, 0))
+        seconds_per_block = max(upper[1] - sample[1], 1) / max(upper[0] - sample[0], 1)
+        if sample[1] <= timestamp:
+            lower = sample
+        else:
+            upper = sample
+
+    # Gallop back from the earliest block seen, doubling the step each time it still lands after the timestamp
+    multiplier = 1
+    while lower is None:
+        if upper[0] == 0:
+            return None
+
+        step = math.ceil((upper[1] - timestamp) / seconds_per_block) * multiplier
+        block = fetch_block(max(upper[0] - step, 0))
+        if block[1] <= timestamp:
+            lower = block
+        else:
+            upper = block
+            multiplier *= 2
+
+    # Secant steps inside the bracket. Take a bisection step whenever interpolation stalls (e.g. around
+    # a halt in block production) or the bracket spans a single second, where sub-second chains have
+    # runs of blocks with equal timestamps
+    slow_steps = 0
+    while upper[0] - lower[0] > 1:
+        width = upper[0] - lower[0]
+        if slow_steps > MAX_SLOW_STEPS or upper[1] - lower[1] <= 1:
+            guess = lower[0] + width // 2
+        else:
+            # Aim just below where timestamp + 1 interpolates to, i.e. the last block before the next second
+            guess = lower[0] + math.ceil((timestamp + 1 - lower[1]) * width / (upper[1] - lower[1])) - 1
+        guess = min(max(guess, lower[0] + 1), upper[0] - 1)
+
+        block = fetch_block(guess)
+        if block[1] <= timestamp:
+            lower = block
+        else:
+            upper = block
+
+        slow_steps = slow_steps + 1 if upper[0] - lower[0] > width // 2 else 0
+
+    return lower[0]
+
+# Fetch a block's number and timestamp over JSON-RPC
+def fetch_block(block_identifier, rpc_url):
+    if block_identifier != 'latest':
+        block_identifier = hex(block_identifier)
+
+    response = evm_rpc.rpc_request(rpc_url, "eth_getBlockByNumber", [block_identifier, False])
+    block = response.get('result') if response else None
+    if not block:
+        raise ValueError(f"Error fetching block {block_identifier}: {response}")
+
+    return int(block['number'], 16), int(block['timestamp'], 16)
+
+# Get the last block at or before a timestamp on an EVM network, or None if it cannot be resolved.
+# With a network_slug, every block fetched is remembered in that network's anchor store and seeds later
+# resolutions. pin=True marks a day-boundary timestamp from a final run: its answer is stored permanently
+# in the block_anchors table (given db_secret), so backfills and re-runs resolve it without any lookups.
+def get_block_by_timestamp(timestamp, rpc_url, network_slug=None, pin=False, db_secret=None):
+    store = block_anchors.load(network_slug) if network_slug else None
+    if store and pin and db_secret and timestamp not in store.pinned:
+        block_anchors.load_pinned(store, db_secret)
+    if store and timestamp in store.pinned:
+        log.info(f"Using pinned block {store.pinned[timestamp]} for timestamp {timestamp}")
+        return store.pinned[timestamp]
+
+    def fetch_and_remember(block_identifier):
+        block = fetch_block(block_identifier, rpc_url)
+        if store:
+            store.add(*block)
+        return block
+
+    try:
+        block_number = find_block_by_timestamp(timestamp, fetch_and_remember, known_blocks=store.known_blocks() if store else ())
+    except Exception as e:
+        log.error(f"Error resolving block for timestamp {timestamp}: {e}")
+        return None
+    finally:
+        if store:
+            store.save()
+
+    if store and pin and db_secret and block_number is not None:
+        block_anchors.save_pinned(store, timestamp, block_number, db_secret)
+        store.save()
+
+    return block_number
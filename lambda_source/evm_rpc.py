@@ -0,0 +1,213 @@
+import logging
+from urllib.parse import urlparse
+from eth_abi import encode, decode
+from web3 import Web3
+import requests
+import rpc_endpoints
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Load totalSupply, balanceOf and Multicall3 aggregate3 function selectors
+total_supply_function_data = Web3.keccak(text="totalSupply()")[:4].hex()
+balance_of_function_data = Web3.keccak(text="balanceOf(address)")[:4].hex()
+aggregate3_function_data = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4].hex()
+
+# Canonical Multicall3 deployment, shared by most EVM networks
+MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+
+# Maximum number of reads packed into a single aggregate3 call, keeps each eth_call well under provider gas caps
+MAX_MULTICALL_SIZE = 500
+
+# Highest block found to have no Multicall3 deployed, keyed by (endpoints, multicall_address) and kept for the life
+# of the container. A contract missing at a block is missing at every earlier one too, so reads at or below it go
+# straight to plain eth_calls, while reads at later blocks, e.g. after a backfill from before its deployment, try again.
+multicall_missing_at = {}
+
+# Maximum number of calls packed into one JSON-RPC batch, keyed by provider host.
+# A host matches an entry if it equals it or is a subdomain of it.
+MAX_BATCH_SIZE_BY_PROVIDER = {
+    'alchemy.com': 50,
+    'infura.io': 50,
+    'quiknode.pro': 50,
+    'ankr.com': 50,
+    'blastapi.io': 20,
+    'drpc.org': 10,
+}
+DEFAULT_MAX_BATCH_SIZE = 20
+
+# Look up the maximum batch size for the providers behind an RPC setting; with several endpoints
+# the smallest limit applies, since any of them may serve a batch
+def get_max_batch_size(rpc_url):
+    max_batch_sizes = []
+    for endpoint in rpc_endpoints.get_endpoints(rpc_url):
+        host = urlparse(endpoint).hostname or ''
+        max_batch_sizes.append(next((
+            max_batch_size for provider, max_batch_size in MAX_BATCH_SIZE_BY_PROVIDER.items()
+            if host == provider or host.endswith('.' + provider)
+        ), DEFAULT_MAX_BATCH_SIZE))
+    return min(max_batch_sizes, default=DEFAULT_MAX_BATCH_SIZE)
+
+# Send a single JSON-RPC call and return the response object, or None on transport errors.
+# rpc_url may list several endpoints (see rpc_endpoints.get_endpoints); calls are hedged across them.
+def rpc_request(rpc_url, method, params):
+    try:
+        return rpc_endpoints.post_json(rpc_url, {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": 1
+        })
+    except (requests.exceptions.RequestException, ValueError) as e:
+        log.error(f"Error calling {method} on {rpc_endpoints.describe(rpc_url)}: {e}")
+        return None
+
+# Send JSON-RPC calls as array payloads of at most max_batch_size items.
+# calls is a list of (method, params); returns one response object per call, in order,
+# with None for calls that got no response. Per-item errors are left in the response object.
+def batch_request(rpc_url, calls, max_batch_size=None):
+    max_batch_size = max_batch_size or get_max_batch_size(rpc_url)
+    responses = [None] * len(calls)
+
+    for start in range(0, len(calls), max_batch_size):
+        chunk = calls[start:start + max_batch_size]
+        payload = [{
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": start + offset
+        } for offset, (method, params) in enumerate(chunk)]
+
+        try:
+            batch_response = rpc_endpoints.post_json(rpc_url, payload)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            log.error(f"Error sending batch of {len(chunk)} calls to {rpc_endpoints.describe(rpc_url)}: {e}")
+            continue
+
+        # Some providers reject batches outright and answer with a single error object
+        if not isinstance(batch_response, list):
+            log.warning(f"Batch rejected by {rpc_endpoints.describe(rpc_url)}, falling back to single calls: {batch_response}")
+            for offset, (method, params) in enumerate(chunk):
+                responses[start + offset] = rpc_request(rpc_url, method, params)
+            continue
+
+        # Responses may come back in any order, so map them back by id
+        for item in batch_response:
+            call_id = item.get('id') if isinstance(item, dict) else None
+            if isinstance(call_id, int) and start <= call_id < start + len(chunk):
+                responses[call_id] = item
+
+    return responses
+
+# Encode a list of (target, calldata) reads as Multicall3 aggregate3 calldata, allowing individual failures
+def encode_aggregate3(calls):
+    encoded_calls = encode(['(address,bool,bytes)[]'], [[
+        (target.lower(), True, bytes.fromhex(calldata[2:])) for target, calldata in calls
+    ]])
+    return "0x" + aggregate3_function_data + encoded_calls.hex()
+
+# Decode an aggregate3 response into a list of (success, return_data), or None if the call itself failed
+def decode_aggregate3(response):
+    if not response or not response.get('result') or response['result'] == '0x':
+        return None
+    try:
+        return decode(['(bool,bytes)[]'], bytes.fromhex(response['result'][2:]))[0]
+    except Exception as e:
+        log.error(f"Error decoding aggregate3 response: {e}")
+        return None
+
+# Run read-only contract calls at a single block and return the raw hex return data of each, in order,
+# with None for calls that failed. Calls are aggregated through Multicall3 so hundreds of reads cost one
+# or two eth_calls; networks without Multicall3 fall back to batched plain eth_calls.
+def read_contracts(calls, block_identifier, rpc_url, max_batch_size=None, multicall_address=MULTICALL3_ADDRESS):
+    results = [None] * len(calls)
+    pending = list(range(len(calls)))
+    multicall_key = (tuple(rpc_endpoints.get_endpoints(rpc_url)), multicall_address)
+
+    if calls and block_identifier > multicall_missing_at.get(multicall_key, -1):
+        chunks = [pending[start:start + MAX_MULTICALL_SIZE] for start in range(0, len(pending), MAX_MULTICALL_SIZE)]
+        aggregate_calls = [("eth_call", [{
+            "to": multicall_address,
+            "data": encode_aggregate3([calls[index] for index in chunk])
+        }, hex(block_identifier)]) for chunk in chunks]
+
+        pending = []
+        for chunk, response in zip(chunks, batch_request(rpc_url, aggregate_calls, max_batch_size)):
+            if response and response.get('result') == '0x':
+                log.warning(f"No Multicall3 at {multicall_address} on {rpc_endpoints.describe(rpc_url)} at block {block_identifier}, falling back to batched eth_calls")
+                multicall_missing_at[multicall_key] = max(multicall_missing_at.get(multicall_key, -1), block_identifier)
+
+            decoded = decode_aggregate3(response)
+            if decoded is None:
+                pending.extend(chunk)
+                continue
+
+            for index, (success, return_data) in zip(chunk, decoded):
+                if success and return_data:
+                    results[index] = "0x" + return_data.hex()
+                else:
+                    log.error(f"Multicall read of {calls[index][0]} failed at block {block_identifier}")
+
+    if pending:
+        responses = batch_request(rpc_url, [("eth_call", [{
+            "to": calls[index][0],
+            "data": calls[index][1]
+        }, hex(block_identifier)]) for index in pending], max_batch_size)
+
+        for index, response in zip(pending, responses):
+            if response and 'result' in response:
+                results[index] = response['result']
+            else:
+                log.error(f"eth_call to {calls[index][0]} failed at block {block_identifier}: {response}")
+
+    return results
+
+# Convert raw uint256 return data into a decimal-adjusted amount, or None if it is empty or malformed
+def to_amount(result, decimals):
+    try:
+        return int(result, 16) / (10 ** int(decimals))
+    except (TypeError, ValueError):
+        return None
+
+# Fetch token supplies and reserve balances for a network at the same block.
+# tokens maps token slug -> (token_address, decimals); reserves maps reserve slug ->
+# (collateral_token_address, reserve_address, decimals). Returns (supplies, reserve_balances)
+# keyed the same way, holding only the reads that succeeded. Failed reads are logged and left out.
+def get_balances_at_block(tokens, reserves, block_identifier, rpc_url, max_batch_size=None, multicall_address=MULTICALL3_ADDRESS):
+    log.info(f"Fetching {len(tokens)} total supplies and {len(reserves)} reserve balances at block: {block_identifier}")
+
+    token_slugs = list(tokens)
+    reserve_slugs = list(reserves)
+    calls = [(tokens[token_slug][0], "0x" + total_supply_function_data) for token_slug in token_slugs]
+    calls += [(
+        reserves[reserve_slug][0],
+        "0x" + balance_of_function_data + reserves[reserve_slug][1][2:].lower().zfill(64)
+    ) for reserve_slug in reserve_slugs]
+
+    results = read_contracts(calls, block_identifier, rpc_url, max_batch_size, multicall_address)
+
+    supplies = {}
+    for token_slug, result in zip(token_slugs, results[:len(token_slugs)]):
+        supply = to_amount(result, tokens[token_slug][1])
+        if supply is None:
+            log.error(f"Error fetching total supply for {token_slug}: {result}")
+            continue
+        supplies[token_slug] = supply
+
+    reserve_balances = {}
+    for reserve_slug, result in zip(reserve_slugs, results[len(token_slugs):]):
+        balance = to_amount(result, reserves[reserve_slug][2])
+        if balance is None:
+            log.error(f"Error fetching balance for {reserve_slug}: {result}")
+            continue
+        reserve_balances[reserve_slug] = balance
+
+    return supplies, reserve_balances
+
+# Fetch totalSupply for many tokens at the same block.
+# tokens maps token slug -> (token_address, decimals); returns token slug -> supply
+# for every read that succeeded.
+def get_total_supplies(tokens, block_identifier, rpc_url, max_batch_size=None, multicall_address=MULTICALL3_ADDRESS):
+    supplies, _ = get_balances_at_block(tokens, {}, block_identifier, rpc_url, max_batch_size, multicall_address)
+    return supplies
@@ -0,0 +1,48 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Concurrent fetches allowed per network unless overridden below or by the MAX_FETCH_CONCURRENCY env var
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Lower caps for networks whose API keys or public endpoints throttle aggressively
+MAX_CONCURRENCY_BY_NETWORK = {
+    'Tron': 4,
+    'Stacks': 4,
+    'Libre': 4,
+    'Mezo': 4,
+    'bitcoin': 4,
+}
+
+# Look up how many fetches may run at once for a network
+def get_max_concurrency(network_slug=None):
+    if os.environ.get('MAX_FETCH_CONCURRENCY'):
+        return max(int(os.environ['MAX_FETCH_CONCURRENCY']), 1)
+    return MAX_CONCURRENCY_BY_NETWORK.get(network_slug, DEFAULT_MAX_CONCURRENCY)
+
+# Call fetch(item) for every item on a bounded thread pool and return the results in input order.
+# fetch is expected to log and skip its own failures like the sequential loops it replaces;
+# anything it lets escape is logged here and gives None for that item.
+def fetch_all(fetch, items, network_slug=None, max_workers=None):
+    items = list(items)
+    if not items:
+        return []
+
+    max_workers = min(max_workers or get_max_concurrency(network_slug), len(items))
+
+    def run(item):
+        try:
+            return fetch(item)
+        except Exception as e:
+            log.error(f"Error fetching {item}: {e}")
+            return None
+
+    if max_workers == 1:
+        return [run(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
@@ -0,0 +1,164 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import rate_limit
+import secrets_cache
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# (connect, read) timeouts in seconds applied when a caller does not pass its own
+DEFAULT_TIMEOUT = (5, 15)
+
+# Seconds one request() call may take across all its attempts and backoff sleeps. Each attempt's timeouts are
+# cut to the time left and no retry starts once less than MIN_ATTEMPT_SECONDS remain.
+DEFAULT_DEADLINE = 45
+MIN_ATTEMPT_SECONDS = 1
+
+# Retries after the first attempt on connection errors, timeouts and retryable status codes
+MAX_RETRIES = 3
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Responses suggesting an API key in the cached API secret has been rotated or revoked, when the request carried one
+AUTH_FAILURE_STATUS_CODES = {401, 403}
+
+# Exponential backoff with full jitter: attempt n sleeps a random time up to min(BACKOFF_CAP, BACKOFF_BASE * 2^n)
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 10
+
+# Keep-alive connections kept open per host
+POOL_MAXSIZE = 32
+
+# One session per host, kept for the life of the container so warm invocations reuse open connections
+sessions = {}
+
+# Per-host request statistics since they were last logged
+stats = {}
+
+lock = threading.Lock()
+
+# Get or create the pooled session for a host
+def get_session(host):
+    with lock:
+        session = sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            sessions[host] = session
+        return session
+
+# Add one attempt's outcome to the host's statistics
+def record(host, elapsed, status_code=None, error=None, retried=False):
+    with lock:
+        host_stats = stats.setdefault(host, {
+            'requests': 0,
+            'retries': 0,
+            'errors': 0,
+            'status_codes': {},
+            'total_seconds': 0.0,
+            'max_seconds': 0.0,
+        })
+        host_stats['requests'] += 1
+        host_stats['total_seconds'] += elapsed
+        host_stats['max_seconds'] = max(host_stats['max_seconds'], elapsed)
+        if retried:
+            host_stats['retries'] += 1
+        if error is not None:
+            host_stats['errors'] += 1
+        if status_code is not None:
+            host_stats['status_codes'][status_code] = host_stats['status_codes'].get(status_code, 0) + 1
+
+# Seconds to wait before the next attempt, honouring a numeric Retry-After header when the server sends one
+def get_backoff(attempt, response=None):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0), BACKOFF_CAP)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+# Cut a requests timeout, either one number or a (connect, read) pair, down to the seconds left
+def cap_timeout(timeout, remaining):
+    if isinstance(timeout, tuple):
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+    return remaining if timeout is None else min(timeout, remaining)
+
+# Send an HTTP request through the host's pooled session and adaptive rate limiter, retrying connection
+# errors, timeouts and 429/5xx responses with jittered exponential backoff until max_retries or the deadline
+# (seconds for the whole call) runs out. Takes the same keyword arguments as requests.request and returns the
+# last response, or raises the last requests exception, like requests does.
+def request(method, url, max_retries=MAX_RETRIES, deadline=DEFAULT_DEADLINE, **kwargs):
+    timeout = kwargs.pop('timeout', DEFAULT_TIMEOUT)
+    host = urlparse(url).hostname or ''
+    session = get_session(host)
+    limiter = rate_limit.get_limiter(host)
+    expires = time.monotonic() + deadline
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        started = time.monotonic()
+        remaining = max(expires - started, MIN_ATTEMPT_SECONDS)
+        try:
+            response = session.request(method, url, timeout=cap_timeout(timeout, remaining), **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            limiter.release(time.monotonic() - started, failed=True)
+            delay = get_backoff(attempt)
+            last_attempt = attempt == max_retries or time.monotonic() + delay + MIN_ATTEMPT_SECONDS > expires
+            record(host, time.monotonic() - started, error=e, retried=not last_attempt)
+            if last_attempt:
+                raise
+            log.warning(f"{method} {host} failed ({e.__class__.__name__}), retrying in {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        except Exception:
+            limiter.release(time.monotonic() - started, failed=True)
+            raise
+
+        elapsed = time.monotonic() - started
+        limiter.release(elapsed, throttled=response.status_code == 429, failed=response.status_code >= 500)
+        delay = get_backoff(attempt, response)
+        last_attempt = attempt == max_retries or time.monotonic() + delay + MIN_ATTEMPT_SECONDS > expires
+        retry = response.status_code in RETRY_STATUS_CODES and not last_attempt
+        record(host, elapsed, status_code=response.status_code, retried=retry)
+        if response.status_code in AUTH_FAILURE_STATUS_CODES and secrets_cache.uses_api_secret(url, kwargs.get('headers')):
+            # Keys are baked into the URLs and headers of this invocation, so the next one refetches the secret
+            log.warning(f"{method} {host} returned {response.status_code}")
+            secrets_cache.invalidate('api')
+        if not retry:
+            return response
+
+        log.warning(f"{method} {host} returned {response.status_code}, retrying in {delay:.2f}s")
+        response.close()
+        time.sleep(delay)
+
+# Send a GET request, see request()
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+# Send a POST request, see request()
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+# Log per-host statistics gathered since the last call, then start counting again
+def log_stats():
+    with lock:
+        snapshot = dict(stats)
+        stats.clear()
+
+    for host, host_stats in sorted(snapshot.items()):
+        mean_seconds = host_stats['total_seconds'] / host_stats['requests']
+        limiter = rate_limit.get_limiter(host)
+        log.info(
+            f"HTTP {host}: {host_stats['requests']} requests, {host_stats['retries']} retried, "
+            f"{host_stats['errors']} errors, status codes {host_stats['status_codes']}, "
+            f"mean {mean_seconds:.3f}s, max {host_stats['max_seconds']:.3f}s, "
+            f"limits {limiter.rate:.1f} req/s and {int(limiter.concurrency)} concurrent"
+        )
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta, timezone
 import logging
-import psycopg2
-import requests
+import http_client
 import json
-import helpers
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
 from web3 import Web3
 
 log = logging.getLogger()
@@ -32,7 +34,7 @@ def get_circulating_ubtc(token_address, rpc_url):
             "id": 1
         }
 
-        response = requests.post(rpc_url, headers={'Content-Type': 'application/json'}, data=json.dumps(payload))
+        response = http_client.post(rpc_url, headers={'Content-Type': 'application/json'}, data=json.dumps(payload))
         result = response.json().get('result')
 
         if not result:
@@ -48,8 +50,8 @@ def get_circulating_ubtc(token_address, rpc_url):
 
 def lambda_handler(event, context):
     log.info("Hyperliquid Lambda execution started.")
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     rpc_url = api_secret.get('RPC_HYPERLIQUID')
     invocation_type = event.get('invocation_type', 'incremental')
 
@@ -61,41 +63,33 @@ def lambda_handler(event, context):
 
     log.info(f"UTC now: {utc_now.isoformat()} — inserting for: {now.isoformat()}")
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
 
-    with psycopg2.connect(
-        host=db_secret.get('host'),
-        database=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        port=db_secret.get('port')
-    ) as conn:
-        with conn.cursor() as cursor:
-            for token in tokens:
-                try:
-                    slug = token.get('slug')
-                    address = token.get('address')
-                    if slug != SPECIAL_TOKEN:
-                        log.warning(f"Skipping unsupported token: {slug}")
-                        continue
-
-                    supply = get_circulating_ubtc(address, rpc_url)
-                    if supply is not None:
-                        log.info(f"{slug} Total Supply: {supply}")
-                        cursor.execute("""
-                            INSERT INTO token_balances (token_implementation, date, balance)
-                            VALUES (%s, %s, %s)
-                            ON CONFLICT (token_implementation, date)
-                            DO UPDATE SET balance = EXCLUDED.balance
-                        """, (slug, now, supply))
-                    else:
-                        log.warning(f"No supply fetched for {slug}")
-
-                except Exception as e:
-                    log.error(f"Error processing {slug}: {e}")
-
-            conn.commit()
+    with db_connection.get_connection(db_secret) as conn:
+        token_values = {}
+        for token in tokens:
+            try:
+                slug = token.get('slug')
+                address = token.get('address')
+                if slug != SPECIAL_TOKEN:
+                    log.warning(f"Skipping unsupported token: {slug}")
+                    continue
+
+                supply = get_circulating_ubtc(address, rpc_url)
+                if supply is not None:
+                    log.info(f"{slug} Total Supply: {supply}")
+                    token_values[slug] = supply
+                else:
+                    log.warning(f"No supply fetched for {slug}")
+
+            except Exception as e:
+                log.error(f"Error processing {slug}: {e}")
+
+        db_writer.write_balances(conn, now, token_values)
+
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
 
     log.info("Hyperliquid Lambda completed.")
     return {"status": "success"}
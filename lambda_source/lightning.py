@@ -1,8 +1,12 @@
 from datetime import datetime, timedelta, timezone
 import logging
 import psycopg2
-import requests
-import helpers
+import http_client
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import fetch_pool
 
 # Setup logging
 log = logging.getLogger()
@@ -12,7 +16,7 @@ network_slug = 'Lightning'
 
 def get_1ml_capacity(lightning_rpc_url, lightning_rpc_url_txstats):
     try:
-        response = requests.get(lightning_rpc_url)
+        response = http_client.get(lightning_rpc_url)
         response.raise_for_status()
         return response.json()['networkcapacity'] / 1e8
     except Exception as e:
@@ -22,7 +26,7 @@ def get_1ml_capacity(lightning_rpc_url, lightning_rpc_url_txstats):
 
 def get_from_txstat(lightning_rpc_url_txstats):
     try:
-        response = requests.get(lightning_rpc_url_txstats)
+        response = http_client.get(lightning_rpc_url_txstats)
         response.raise_for_status()
         data = response.json()
         return data['results'][0]['series'][0]['values'][-1][1]
@@ -34,12 +38,12 @@ def get_from_txstat(lightning_rpc_url_txstats):
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     lightning_rpc_url = api_secret.get('RPC_LIGHTNING')
     lightning_rpc_url_txstats = api_secret.get('RPC_LIGHTNING_2')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
     reserves = network_config.get('network_reserves')
 
@@ -54,19 +58,23 @@ def lambda_handler(event, context):
     token_values = {}
     reserve_values = {}
 
-    for token in tokens:
+    # Fetch one token's supply, logging and skipping it on failure like the rest of the handler
+    def fetch_token(token):
         try:
             supply = get_1ml_capacity(lightning_rpc_url, lightning_rpc_url_txstats)
 
             if not supply:
                 log.warning(f"Error fetching total supply for {token['slug']}")
-                continue
+                return
 
             log.info(f"{token['slug']} Total Supply: {supply} tokens")
             token_values[token['slug']] = supply
         except Exception as e:
             log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
+    # Fetch all tokens concurrently, capped per network
+    fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
     for reserve in reserves:
         try:
             reserve_address = reserve.get('address')
@@ -113,49 +121,13 @@ def lambda_handler(event, context):
         except Exception as e:
             log.error(f"[RESERVE] Error fetching total supply for {reserve['slug']}: {e}")
 
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     # Insert total supply values into database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day,
-                        supply
-                    ))
-                    conn.commit()
-
-                # Uncomment when we implement reserve balance fetches
-                # for reserve_slug, supply in reserve_values.items():
-                #     insert_query = """
-                #     INSERT INTO reserve_balances (reserve_implementation, date, balance)
-                #     VALUES (%s, %s, %s)
-                #     ON CONFLICT (reserve_implementation, date)
-                #     DO UPDATE SET balance = EXCLUDED.balance
-                #     """
-                #     cursor.execute(insert_query, (
-                #         reserve_slug,
-                #         day,
-                #         supply
-                #     ))
-                #     conn.commit()
+        db_writer.write_balances(conn, day, token_values)
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
-
-
-    finally:
-        conn.close()
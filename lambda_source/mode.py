@@ -2,8 +2,12 @@ from datetime import datetime, timedelta, timezone
 import logging
 from web3 import Web3
 import psycopg2
-import requests
-import helpers
+import http_client
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import fetch_pool
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
@@ -12,7 +16,7 @@ network_slug = 'Mode'
 total_supply_function_data = Web3.keccak(text="totalSupply()")[:4].hex()
 
 def get_total_supply(token_address, decimals, rpc_url):
-    response = requests.post(rpc_url, json={
+    response = http_client.post(rpc_url, json={
         "jsonrpc": "2.0",
         "method": "eth_call",
         "params": [
@@ -32,11 +36,11 @@ def get_total_supply(token_address, decimals, rpc_url):
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     mode_rpc_url = api_secret.get('RPC_MODE')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
 
     if invocation_type == 'incremental':
@@ -46,42 +50,33 @@ def lambda_handler(event, context):
 
     token_values = {}
 
-    for token in tokens:
+    # Fetch one token's supply, logging and skipping it on failure like the rest of the handler
+    def fetch_token(token):
         try:
             token_address = token.get('address')
             token_decimals = int(token.get('decimals')) if token.get('decimals') else None
             if not token_address or not token_decimals:
                 log.warning(f"Missing config for {token.get('slug')}")
-                continue
+                return
 
             supply = get_total_supply(token_address, token_decimals, mode_rpc_url)
             if not supply:
                 log.warning(f"Failed fetching supply for {token.get('slug')}")
-                continue
+                return
 
             log.info(f"{token.get('slug')} Supply: {supply}")
             token_values[token.get('slug')] = supply
         except Exception as e:
             log.error(f"Error processing {token.get('slug')}: {e}")
 
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    # Fetch all tokens concurrently, capped per network
+    fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
+    conn = db_connection.get_connection(db_secret)
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    cursor.execute("""
-                        INSERT INTO token_balances (token_implementation, date, balance)
-                        VALUES (%s, %s, %s)
-                        ON CONFLICT (token_implementation, date)
-                        DO UPDATE SET balance = EXCLUDED.balance
-                    """, (token_slug, day, supply))
+        db_writer.write_balances(conn, day, token_values)
     except psycopg2.Error as e:
         log.error(f"Database error: {e}")
-    finally:
-        conn.close()
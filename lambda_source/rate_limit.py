@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Starting (requests per second, concurrent requests) per provider host. A host matches an entry if it
+# equals it or is a subdomain of it. Both adapt from here: they grow while requests succeed and halve on 429s.
+PROVIDER_LIMITS = {
+    'alchemy.com': (25, 8),
+    'ankr.com': (30, 8),
+    'infura.io': (10, 4),
+    'quiknode.pro': (25, 8),
+    'tronscanapi.com': (5, 2),
+    'blockstream.info': (5, 2),
+}
+DEFAULT_LIMITS = (10, 4)
+
+# Adapted limits never go above MAX_RATE_FACTOR times or below MIN_RATE_FACTOR times the starting rate
+MAX_RATE_FACTOR = 4
+MIN_RATE_FACTOR = 0.1
+MAX_CONCURRENCY = 32
+
+# A response slower than LATENCY_SPIKE_FACTOR times the running average counts as a latency spike
+LATENCY_SPIKE_FACTOR = 3
+LATENCY_SMOOTHING = 0.2
+MIN_SPIKE_SECONDS = 1
+
+# Minimum seconds between two decreases, so a burst of concurrent 429s halves the limits only once
+DECREASE_COOLDOWN = 1
+
+# Token bucket plus AIMD concurrency window for one host
+class HostLimiter:
+    def __init__(self, host, rate, concurrency):
+        self.host = host
+        self.base_rate = rate
+        self.rate = float(rate)
+        self.tokens = float(rate)
+        self.concurrency = float(concurrency)
+        self.in_flight = 0
+        self.mean_seconds = None
+        self.last_refill = time.monotonic()
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    # The bucket always holds at least one whole token, so a host adapted below 1 req/s still gets a request through
+    def refill(self, now):
+        self.tokens = min(max(self.rate, 1), self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    # Block until a concurrency slot and a token are both available, then take them
+    def acquire(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                self.refill(now)
+                if self.in_flight < max(int(self.concurrency), 1) and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+                wait = (1 - self.tokens) / self.rate if self.tokens < 1 else None
+                self.condition.wait(wait)
+
+    # Release the slot and adapt: additive increase on success, multiplicative decrease on 429s and latency spikes
+    def release(self, elapsed, throttled=False, failed=False):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            spike = (
+                not throttled and not failed and self.mean_seconds is not None
+                and elapsed > max(self.mean_seconds * LATENCY_SPIKE_FACTOR, MIN_SPIKE_SECONDS)
+            )
+            if not throttled and not failed:
+                self.mean_seconds = elapsed if self.mean_seconds is None else (
+                    (1 - LATENCY_SMOOTHING) * self.mean_seconds + LATENCY_SMOOTHING * elapsed
+                )
+
+            if throttled or spike:
+                if now - self.last_decrease >= DECREASE_COOLDOWN:
+                    self.last_decrease = now
+                    self.concurrency = max(self.concurrency / 2, 1)
+                    if throttled:
+                        self.rate = max(self.rate / 2, self.base_rate * MIN_RATE_FACTOR)
+                        self.tokens = min(self.tokens, 0)
+                    log.warning(
+                        f"{'Throttled' if throttled else 'Latency spike'} on {self.host}, "
+                        f"limits now {self.rate:.1f} req/s and {int(self.concurrency)} concurrent"
+                    )
+            elif not failed:
+                self.concurrency = min(self.concurrency + 1 / self.concurrency, MAX_CONCURRENCY)
+                self.rate = min(self.rate + 1 / self.rate, self.base_rate * MAX_RATE_FACTOR)
+
+            self.condition.notify_all()
+
+# Limiters by host, kept for the life of the container so warm invocations start from the limits they learned
+limiters = {}
+lock = threading.Lock()
+
+# Look up the starting limits for a host
+def get_provider_limits(host):
+    for provider, limits in PROVIDER_LIMITS.items():
+        if host == provider or host.endswith('.' + provider):
+            return limits
+    return DEFAULT_LIMITS
+
+# Get or create the limiter for a host
+def get_limiter(host):
+    with lock:
+        limiter = limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(host, *get_provider_limits(host))
+            limiters[host] = limiter
+        return limiter
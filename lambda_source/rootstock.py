@@ -1,9 +1,12 @@
 from datetime import datetime, timedelta, timezone
 import logging
-import psycopg2
-import requests
+import http_client
 import json
-import helpers
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import fetch_pool
 from web3 import Web3
 
 # Setup logging
@@ -32,7 +35,7 @@ def get_circulating_rbtc(token_address, rpc_url):
     }
 
     # Query balance
-    response = requests.post(rpc_url, headers=headers, data=json.dumps(data))
+    response = http_client.post(rpc_url, headers=headers, data=json.dumps(data))
     result = response.json().get('result')
 
     if not result:
@@ -50,11 +53,11 @@ def get_circulating_rbtc(token_address, rpc_url):
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     rpc_url = api_secret.get('RPC_ROOTSTOCK')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
     # reserves = network_config.get('network_reserves')
 
@@ -68,56 +71,47 @@ def lambda_handler(event, context):
 
 
     # Connect to database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
-    cursor = conn.cursor()
+    conn = db_connection.get_connection(db_secret)
+
+    # Fetch one token's supply, logging and skipping it on failure
+    def fetch_token(token):
+        try:
+            token_address = token.get('address')
+            if not token_address or not Web3.is_address(token_address):
+                log.error(f"Invalid token address for {token['slug']}")
+                return None
+
+            # Handle special token case for RBTC
+            if token['slug'] == SPECIAL_TOKEN:
+                supply = get_circulating_rbtc(token_address, rpc_url)
+            else:
+                # Generic ERC-20 tokens use totalSupply()
+                decimals = int(token.get('decimals', 18))  # Default 18 decimals
+                supply = get_erc20_supply(token_address, rpc_url, decimals)
+
+            if supply is None:
+                log.error(f"Failed to fetch supply for {token['slug']}")
+                return None
+
+            log.info(f"{token['slug']} Total Supply: {supply}")
+            return supply
+        except Exception as e:
+            log.error(f"Error processing {token['slug']}: {e}")
+            return None
 
     try:
-        # Process tokens
-        for token in tokens:
-            try:
-                token_address = token.get('address')
-                if not token_address or not Web3.is_address(token_address):
-                    log.error(f"Invalid token address for {token['slug']}")
-                    continue
-
-                # Handle special token case for RBTC
-                if token['slug'] == SPECIAL_TOKEN:
-                    supply = get_circulating_rbtc(token_address, rpc_url)
-                else:
-                    # Generic ERC-20 tokens use totalSupply()
-                    decimals = int(token.get('decimals', 18))  # Default 18 decimals
-                    supply = get_erc20_supply(token_address, rpc_url, decimals)
-
-                if supply is None:
-                    log.error(f"Failed to fetch supply for {token['slug']}")
-                    continue
-
-                log.info(f"{token['slug']} Total Supply: {supply}")
-
-                # Insert token balance into database
-                cursor.execute("""
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                """, (token['slug'], day, supply))
-
-            except Exception as e:
-                log.error(f"Error processing {token['slug']}: {e}")
-
-        conn.commit()
+        # Fetch all tokens concurrently, capped per network, then process them in order
+        supplies = fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+        token_values = {token['slug']: supply for token, supply in zip(tokens, supplies) if supply is not None}
+
+        # Log per-host HTTP statistics for this invocation
+        http_client.log_stats()
+
+        # Insert token balances into database
+        db_writer.write_balances(conn, day, token_values)
 
     except Exception as e:
         log.error(f"Database error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
 
 
 # Generic ERC-20 total supply fetch
@@ -132,7 +126,7 @@ def get_erc20_supply(token_address, rpc_url, decimals):
             "params": [data, "latest"],
             "id": 1
         }
-        response = requests.post(rpc_url, headers={'Content-Type': 'application/json'}, data=json.dumps(payload))
+        response = http_client.post(rpc_url, headers={'Content-Type': 'application/json'}, data=json.dumps(payload))
         result = response.json().get('result')
 
         if not result:
@@ -156,7 +150,7 @@ def fetch_balance(address, rpc_url, decimals):
             "params": [address, "latest"],
             "id": 0
         }
-        response = requests.post(rpc_url, headers={'Content-Type': 'application/json'}, data=json.dumps(data))
+        response = http_client.post(rpc_url, headers={'Content-Type': 'application/json'}, data=json.dumps(data))
         result = response.json().get('result')
 
         if not result:
@@ -0,0 +1,161 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlparse
+import requests
+import http_client
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# Hedge delay used until an endpoint has MIN_SAMPLES latencies, and the bounds of its p90-derived delay
+DEFAULT_HEDGE_DELAY = 1.0
+MIN_HEDGE_DELAY = 0.25
+MAX_HEDGE_DELAY = 5.0
+
+# Latencies and outcomes remembered per endpoint, and how many are needed before scoring it
+WINDOW_SIZE = 50
+MIN_SAMPLES = 10
+
+# An endpoint is demoted behind the others once its score is DEMOTE_FACTOR times the best one,
+# or once more than MAX_FAILURE_RATE of its recent requests failed
+DEMOTE_FACTOR = 2
+MAX_FAILURE_RATE = 0.5
+
+# Threads used to race hedged requests, shared by every network in the container
+executor = ThreadPoolExecutor(max_workers=16)
+
+# Recent latencies and failures of one RPC endpoint
+class EndpointHealth:
+    def __init__(self, url):
+        self.url = url
+        self.latencies = deque(maxlen=WINDOW_SIZE)
+        self.outcomes = deque(maxlen=WINDOW_SIZE)
+        self.lock = threading.Lock()
+
+    def record(self, elapsed, success):
+        with self.lock:
+            self.outcomes.append(success)
+            if success:
+                self.latencies.append(elapsed)
+
+    def percentile(self, fraction):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if len(latencies) < MIN_SAMPLES:
+            return None
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+    def failure_rate(self):
+        with self.lock:
+            return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0
+
+    # Lower is better: median latency, penalised by the recent failure rate
+    def score(self):
+        median = self.percentile(0.5)
+        return None if median is None else median * (1 + 4 * self.failure_rate())
+
+    def hedge_delay(self):
+        p90 = self.percentile(0.9)
+        if p90 is None:
+            return DEFAULT_HEDGE_DELAY
+        return min(max(p90, MIN_HEDGE_DELAY), MAX_HEDGE_DELAY)
+
+# Health by endpoint URL, kept for the life of the container
+health = {}
+lock = threading.Lock()
+
+def get_health(url):
+    with lock:
+        if url not in health:
+            health[url] = EndpointHealth(url)
+        return health[url]
+
+# Split an RPC setting from the secret into a list of endpoint URLs. Accepts a single URL, a list,
+# a JSON array string or a comma-separated string, keeping the configured order as the preference.
+def get_endpoints(rpc_url):
+    if isinstance(rpc_url, (list, tuple)):
+        endpoints = rpc_url
+    elif isinstance(rpc_url, str) and rpc_url.strip().startswith('['):
+        endpoints = json.loads(rpc_url)
+    elif isinstance(rpc_url, str):
+        endpoints = rpc_url.split(',')
+    else:
+        endpoints = []
+    return [endpoint.strip() for endpoint in endpoints if endpoint and endpoint.strip()]
+
+# Short description of an RPC setting for log lines, without leaking API keys in URL paths
+def describe(rpc_url):
+    return ','.join(urlparse(endpoint).hostname or '' for endpoint in get_endpoints(rpc_url))
+
+# Order endpoints by preference: healthy ones in configured order, then demoted ones from best to worst score
+def rank(endpoints):
+    scores = {endpoint: get_health(endpoint).score() for endpoint in endpoints}
+    known = [score for score in scores.values() if score is not None]
+    best = min(known) if known else None
+
+    def demoted(endpoint):
+        endpoint_health = get_health(endpoint)
+        if endpoint_health.failure_rate() > MAX_FAILURE_RATE and len(endpoint_health.outcomes) >= MIN_SAMPLES:
+            return True
+        return scores[endpoint] is not None and best is not None and scores[endpoint] > best * DEMOTE_FACTOR
+
+    healthy = [endpoint for endpoint in endpoints if not demoted(endpoint)]
+    slow = sorted((endpoint for endpoint in endpoints if demoted(endpoint)), key=lambda endpoint: scores[endpoint] or 0)
+    return healthy + slow
+
+# POST a JSON payload to one endpoint and return the decoded response, recording its health
+def post_json_once(endpoint, payload):
+    started = time.monotonic()
+    try:
+        response = http_client.post(endpoint, json=payload).json()
+    except (requests.exceptions.RequestException, ValueError):
+        get_health(endpoint).record(time.monotonic() - started, False)
+        raise
+    get_health(endpoint).record(time.monotonic() - started, True)
+    return response
+
+# POST a JSON payload to an RPC setting with one or more endpoints and return the decoded response.
+# The preferred endpoint gets the request first; if it has not answered within its p90-derived hedge delay,
+# or fails, the same request goes to the next endpoint, and the first answer to arrive wins.
+# Raises the last error if every endpoint fails.
+def post_json(rpc_url, payload):
+    endpoints = rank(get_endpoints(rpc_url))
+    if not endpoints:
+        raise ValueError("No RPC endpoint configured")
+    if len(endpoints) == 1:
+        return post_json_once(endpoints[0], payload)
+
+    pending = {}
+    remaining = list(endpoints)
+    last_error = None
+
+    while remaining or pending:
+        # Start the next endpoint when nothing is in flight, or hedge once the newest request is overdue
+        if remaining and not pending:
+            endpoint = remaining.pop(0)
+            pending[executor.submit(post_json_once, endpoint, payload)] = endpoint
+
+        newest = list(pending.values())[-1]
+        timeout = get_health(newest).hedge_delay() if remaining else None
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        if not done:
+            endpoint = remaining.pop(0)
+            log.info(f"No answer from {urlparse(newest).hostname} after {timeout:.2f}s, hedging to {urlparse(endpoint).hostname}")
+            pending[executor.submit(post_json_once, endpoint, payload)] = endpoint
+            continue
+
+        for future in done:
+            endpoint = pending.pop(future)
+            try:
+                return future.result()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                log.warning(f"RPC endpoint {urlparse(endpoint).hostname} failed: {e}")
+                last_error = e
+
+    raise last_error
@@ -0,0 +1,70 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Setup logging
+log = logging.getLogger()
+log.setLevel(logging.INFO)
+
+# How long a fetched secret is reused by a warm container before it is fetched again
+TTL_SECONDS = int(os.environ.get('SECRETS_TTL_SECONDS', 3600))
+
+# Local stand-in for the secrets service: a JSON file of the form {"api": {...}, "db": {...}}.
+# When set, secrets are read from it instead of through helpers, e.g. for local runs and tests.
+SECRETS_FILE = os.environ.get('SECRETS_FILE')
+
+# Secret values shorter than this, e.g. flags or chain ids, are too generic to tell which requests carry the secret
+MIN_SECRET_LENGTH = 8
+
+# Cached secrets by name ('api' or 'db'), each stored as (secret, fetched_at)
+secrets = {}
+lock = threading.Lock()
+
+def fetch(name):
+    if SECRETS_FILE:
+        with open(SECRETS_FILE) as f:
+            return json.load(f)[name]
+
+    # Imported here so the local stand-in works without the deployed helpers layer
+    import helpers
+    return helpers.get_api_secret() if name == 'api' else helpers.get_db_secret()
+
+# Get a secret from the cache, fetching it when missing, older than TTL_SECONDS or when force_refresh is set
+def get_secret(name, force_refresh=False):
+    with lock:
+        secret, fetched_at = secrets.get(name, (None, 0))
+        if secret is not None and not force_refresh and time.monotonic() - fetched_at < TTL_SECONDS:
+            return secret
+
+        log.info(f"Fetching {name} secret{' (forced refresh)' if force_refresh else ''}")
+        secret = fetch(name)
+        secrets[name] = (secret, time.monotonic())
+        return secret
+
+# Drop a cached secret so the next lookup fetches it again, e.g. after an authentication failure
+def invalidate(name):
+    with lock:
+        if secrets.pop(name, None) is not None:
+            log.warning(f"Invalidated cached {name} secret")
+
+# Check whether a request carries a value of the cached API secret (an RPC URL or API key) in its URL or headers,
+# so an authentication failure from a host that takes no key from it is not blamed on the secret
+def uses_api_secret(url, headers=None):
+    with lock:
+        secret, _ = secrets.get('api', (None, 0))
+    if not isinstance(secret, dict):
+        return False
+
+    sent = [url] + [str(value) for value in (headers or {}).values()]
+    for value in secret.values():
+        if isinstance(value, str) and len(value) >= MIN_SECRET_LENGTH and any(value in part for part in sent):
+            return True
+    return False
+
+def get_api_secret(force_refresh=False):
+    return get_secret('api', force_refresh)
+
+def get_db_secret(force_refresh=False):
+    return get_secret('db', force_refresh)
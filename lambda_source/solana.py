@@ -2,8 +2,12 @@ from datetime import datetime, timedelta, timezone
 import logging
 from web3 import Web3
 import psycopg2
-import requests
-import helpers
+import http_client
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import fetch_pool
 from alchemy import Alchemy, Network
 
 # Setup logging
@@ -16,7 +20,7 @@ alchemy_network = Network.SOLANA_MAINNET
 # Fetch total supply for a given token
 def get_total_supply(token_address, solana_rpc_url):
     try:
-        response = requests.post(solana_rpc_url, json={
+        response = http_client.post(solana_rpc_url, json={
             "jsonrpc": "2.0",
             "id": 1,
             "method": "getTokenSupply",
@@ -41,12 +45,12 @@ def get_total_supply(token_address, solana_rpc_url):
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     solana_rpc_url = api_secret.get('RPC_SOLANA')
 
     # Get tokens from network config
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
 
     # Incremental invocations -- run every 4 hours, update current date balance
@@ -58,49 +62,37 @@ def lambda_handler(event, context):
         day = datetime.now(timezone.utc).date() - timedelta(days=1)
 
     # Establish DB connection
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
         token_values = {}
 
-        # Fetch and process token supplies
-        for token in tokens:
+        # Fetch and process one token's supply
+        def fetch_token(token):
             try:
                 token_address = token.get('address')
                 if not token_address:
                     log.warning(f"No address for {token['slug']}")
-                    continue
+                    return
 
                 supply = get_total_supply(token_address, solana_rpc_url)
                 if supply is None:
                     log.error(f"Error fetching supply for {token['slug']}")
-                    continue
+                    return
 
                 log.info(f"{token['slug']} Total Supply: {supply} tokens")
                 token_values[token['slug']] = supply
             except Exception as e:
                 log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
+        # Fetch all tokens concurrently, capped per network
+        fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
+        # Log per-host HTTP statistics for this invocation
+        http_client.log_stats()
+
         # Insert data into DB
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (token_slug, day, supply))
-                    conn.commit()
+        db_writer.write_balances(conn, day, token_values)
 
     except psycopg2.Error as e:
         log.error(f"Database error: {e}")
-    finally:
-        conn.close()
@@ -1,8 +1,12 @@
 import os
-import requests
+import http_client
 import logging
 import psycopg2
-import helpers
+import secrets_cache
+import config_loader
+import db_writer
+import db_connection
+import fetch_pool
 from datetime import datetime, timedelta, timezone
 
 # Setup logging
@@ -20,7 +24,7 @@ def format_starknet_address(address):
     return "0x" + address.zfill(64)  # Zero-pad to ensure exactly 64 hex characters
 
 def get_latest_block_number(rpc_url):
-    response = requests.post(rpc_url, json={
+    response = http_client.post(rpc_url, json={
         "jsonrpc": "2.0",
         "method": "starknet_blockNumber",
         "params": [],
@@ -38,7 +42,7 @@ def get_total_supply(token_address, rpc_url, decimals):
     """Get total supply of a token at the latest block."""
     starknet_address = format_starknet_address(token_address)  # Fix address formatting
 
-    response = requests.post(rpc_url, json={
+    response = http_client.post(rpc_url, json={
         "jsonrpc": "2.0",
         "method": "starknet_call",
         "params": [{
@@ -66,11 +70,11 @@ def get_total_supply(token_address, rpc_url, decimals):
 def lambda_handler(event, context):
     invocation_type = event.get('invocation_type', 'incremental')
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     starknet_rpc_url = api_secret.get('RPC_STARKNET')
 
-    network_config = helpers.get_network_config(network_slug, db_secret)
+    network_config = config_loader.get_network_config(network_slug, db_connection.get_connection(db_secret))
     tokens = network_config.get('network_tokens')
 
     # Incremental invocations -- run every 4 hours, update current date balance
@@ -89,56 +93,40 @@ def lambda_handler(event, context):
 
     token_values = {}
 
-    for token in tokens:
+    # Fetch one token's supply, logging and skipping it on failure like the rest of the handler
+    def fetch_token(token):
         try:
             token_address = token.get('address')
             token_decimals = int(token.get('decimals')) if token.get('decimals') else None
             if not token_address:
                 log.warning(f"No token_address for {token['slug']}")
-                continue
+                return
 
             if not token_decimals:
                 log.warning(f"No token_decimals for {token['slug']}")
-                continue
+                return
 
             supply = get_total_supply(token_address, starknet_rpc_url, token_decimals)
 
             if not supply:
                 log.warning(f"Error fetching total supply for {token['slug']}")
-                continue
+                return
 
             log.info(f"{token['slug']} Total Supply: {supply} tokens")
             token_values[token['slug']] = supply
         except Exception as e:
             log.error(f"Error fetching total supply for {token['slug']}: {e}")
 
+    # Fetch all tokens concurrently, capped per network
+    fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     # Insert total supply values into database
-    conn = psycopg2.connect(
-        dbname=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        host=db_secret.get('host'),
-        port=db_secret.get('port')
-    )
+    conn = db_connection.get_connection(db_secret)
 
     try:
-        with conn:
-            with conn.cursor() as cursor:
-                for token_slug, supply in token_values.items():
-                    insert_query = """
-                    INSERT INTO token_balances (token_implementation, date, balance)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (token_implementation, date)
-                    DO UPDATE SET balance = EXCLUDED.balance
-                    """
-                    cursor.execute(insert_query, (
-                        token_slug,
-                        day,
-                        supply
-                    ))
-                    conn.commit()
+        db_writer.write_balances(conn, day, token_values)
     except psycopg2.Error as e:
         log.error(f"Error connecting to DB: {e}")
-
-    finally:
-        conn.close()
@@ -1,8 +1,13 @@
 import requests
 import psycopg2
+import http_client
 import logging
 from datetime import datetime, timezone, timedelta
-import helpers
+import secrets_cache
+import db_writer
+import db_connection
+import config_loader
+import fetch_pool
 import json
 
 # Setup logging
@@ -21,7 +26,7 @@ def get_total_supply(coin_type, rpc_url):
     }
 
     try:
-        response = requests.post(rpc_url, json=payload, timeout=10).json()
+        response = http_client.post(rpc_url, json=payload, timeout=10).json()
         if "result" in response and "value" in response["result"]:
             return int(response["result"]["value"])
         log.warning(f"⚠️ `suix_getTotalSupply` failed for {coin_type}. Trying TreasuryCap...")
@@ -41,7 +46,7 @@ def get_treasury_cap_supply(coin_type, rpc_url, fallback_ids=None):
     }
 
     try:
-        response = requests.post(rpc_url, json=payload, timeout=10).json()
+        response = http_client.post(rpc_url, json=payload, timeout=10).json()
         if "result" in response and "data" in response["result"]:
             obj_data = response["result"]["data"]
             if "content" in obj_data and "fields" in obj_data["content"]:
@@ -72,7 +77,7 @@ def get_treasury_cap_supply(coin_type, rpc_url, fallback_ids=None):
             }
 
             try:
-                response = requests.post(rpc_url, json=payload, timeout=10).json()
+                response = http_client.post(rpc_url, json=payload, timeout=10).json()
                 if "result" in response and "data" in response["result"]:
                     obj_data = response["result"]["data"]
                     treasury_cap = obj_data["content"]["fields"].get("treasury_cap", {})
@@ -99,22 +104,15 @@ def fetch_sui_current_data(api_secret, db_secret, invocation_type="incremental")
 
     log.info(f"UTC now: {utc_now.isoformat()} — inserting for: {now.isoformat()}")
 
-    conn = psycopg2.connect(
-        dbname=db_secret.get("dbname"),
-        user=db_secret.get("username"),
-        password=db_secret.get("password"),
-        host=db_secret.get("host"),
-        port=db_secret.get("port"),
-    )
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT slug, token_address, token_decimals, reserve_implementations FROM token_implementations WHERE network = %s",
-        (network_slug,)
-    )
-    tokens = cursor.fetchall()
-
-    for slug, token_address, decimals, reserve_implementations in tokens:
+    conn = db_connection.get_connection(db_secret)
+    tokens = [
+        (token['slug'], token['address'], token['decimals'], token['reserve_implementations'])
+        for token in config_loader.get_network_config(network_slug, conn)['network_tokens']
+    ]
+
+    # Fetch one token's raw supply, falling back to its TreasuryCap objects
+    def fetch_token(token):
+        slug, token_address, decimals, reserve_implementations = token
         try:
             supply_raw = get_total_supply(token_address, rpc_url)
 
@@ -123,6 +121,17 @@ def fetch_sui_current_data(api_secret, db_secret, invocation_type="incremental")
                 reserve_ids = json.loads(reserve_implementations) if isinstance(reserve_implementations, str) else reserve_implementations
                 supply_raw = get_treasury_cap_supply(token_address, rpc_url, fallback_ids=reserve_ids)
 
+            return supply_raw
+        except Exception as e:
+            log.error(f"❌ Error processing {slug}: {e}")
+            return None
+
+    # Fetch all tokens concurrently, capped per network, before writing any of them
+    supplies_raw = fetch_pool.fetch_all(fetch_token, tokens, network_slug)
+
+    token_values = {}
+    for (slug, token_address, decimals, reserve_implementations), supply_raw in zip(tokens, supplies_raw):
+        try:
             if supply_raw is None:
                 log.warning(f"Skipping {slug}: No supply data available.")
                 continue
@@ -130,33 +139,28 @@ def fetch_sui_current_data(api_secret, db_secret, invocation_type="incremental")
             supply = supply_raw / (10 ** int(decimals))
             log.info(f"{slug} Total Supply: {supply}")
 
-            cursor.execute(
-                """
-                INSERT INTO token_balances (token_implementation, date, balance)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (token_implementation, date)
-                DO UPDATE SET balance = EXCLUDED.balance
-                """,
-                (slug, now, supply),
-            )
+            token_values[slug] = supply
         except Exception as e:
             log.error(f"❌ Error processing {slug}: {e}")
 
-    conn.commit()
-    log.info("✅ Supply data updated successfully.")
-
-    cursor.close()
-    conn.close()
+    try:
+        db_writer.write_balances(conn, now, token_values)
+        log.info("✅ Supply data updated successfully.")
+    except psycopg2.Error as e:
+        log.error(f"❌ Error connecting to DB: {e}")
 
 def lambda_handler(event, context):
     """AWS Lambda entry point."""
     log.info("🚀 Lambda execution started.")
 
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     invocation_type = event.get("invocation_type", "incremental")
 
     fetch_sui_current_data(api_secret, db_secret, invocation_type=invocation_type)
 
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     log.info("✅ Lambda execution completed.")
     return {"status": "success", "message": "Sui total supply updated."}
@@ -1,8 +1,12 @@
 import logging
-import psycopg2
 import requests
+import http_client
 from datetime import datetime, timezone, timedelta
-import helpers
+import secrets_cache
+import db_writer
+import db_connection
+import config_loader
+import fetch_pool
 
 log = logging.getLogger()
 log.setLevel(logging.INFO)
@@ -14,7 +18,7 @@ def get_total_supply(token_address, api_key):
     headers = {"TRON-PRO-API-KEY": api_key}
 
     try:
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         response_data = response.json()
 
@@ -48,47 +52,43 @@ def fetch_tron_current_data(api_secret, db_secret, invocation_type="incremental"
 
     tron_api_key = api_secret.get('RPC_TRON_2')
 
-    with psycopg2.connect(
-        host=db_secret.get('host'),
-        database=db_secret.get('dbname'),
-        user=db_secret.get('username'),
-        password=db_secret.get('password'),
-        port=db_secret.get('port')
-    ) as conn:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT slug, token_address FROM token_implementations WHERE network = 'Tron'")
-            tokens = cursor.fetchall()
-
-            for slug, token_address in tokens:
-                try:
-                    supply = get_total_supply(token_address, tron_api_key)
-                    if supply is not None:
-                        log.info(f"{slug} Total Supply: {supply}")
-                        cursor.execute("""
-                            INSERT INTO token_balances (token_implementation, date, balance)
-                            VALUES (%s, %s, %s)
-                            ON CONFLICT (token_implementation, date)
-                            DO UPDATE SET balance = EXCLUDED.balance
-                        """, (slug, now, supply))
-                    else:
-                        log.warning(f"Skipping {slug}: No supply data available.")
-                except Exception as e:
-                    log.error(f"Error processing {slug}: {e}")
-
-            conn.commit()
+    with db_connection.get_connection(db_secret) as conn:
+        tokens = [
+            (token['slug'], token['address'])
+            for token in config_loader.get_network_config('Tron', conn)['network_tokens']
+        ]
+
+        # Fetch all supplies concurrently, capped per network, before writing any of them
+        supplies = fetch_pool.fetch_all(lambda token: get_total_supply(token[1], tron_api_key), tokens, 'Tron')
+
+        token_values = {}
+        for (slug, token_address), supply in zip(tokens, supplies):
+            try:
+                if supply is not None:
+                    log.info(f"{slug} Total Supply: {supply}")
+                    token_values[slug] = supply
+                else:
+                    log.warning(f"Skipping {slug}: No supply data available.")
+            except Exception as e:
+                log.error(f"Error processing {slug}: {e}")
+
+        db_writer.write_balances(conn, now, token_values)
 
     log.info("✅ Tron supply data updated successfully.")
 
 def lambda_handler(event, context):
     log.info("🚀 Tron Lambda execution started.")
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     invocation_type = event.get("invocation_type", "incremental")
     fetch_tron_current_data(api_secret, db_secret, invocation_type=invocation_type)
+    # Log per-host HTTP statistics for this invocation
+    http_client.log_stats()
+
     log.info("✅ Tron Lambda execution completed.")
     return {"status": "success"}
 
 if __name__ == "__main__":
-    api_secret = helpers.get_api_secret()
-    db_secret = helpers.get_db_secret()
+    api_secret = secrets_cache.get_api_secret()
+    db_secret = secrets_cache.get_db_secret()
     fetch_tron_current_data(api_secret, db_secret, invocation_type="incremental")